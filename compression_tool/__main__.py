@@ -0,0 +1,5 @@
+import sys
+
+from compression_tool.cli import main
+
+sys.exit(main())
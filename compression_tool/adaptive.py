@@ -0,0 +1,191 @@
+import argparse
+import os
+import numpy as np
+
+from PIL import Image
+
+from compression_tool.blocks import PADDING_MODES, blocks_to_image, forward_blocks
+
+# Variance of the error added by rounding the restored pixels, taken off the error budget of a PSNR target
+ROUNDING_MSE = 1 / 12
+
+# Bytes a kept coefficient is counted for when the budget is given in bytes, int16 being the usual stored type
+COEFFICIENT_BYTES = 2
+
+# Bisection steps of the Lagrange multiplier trading error against kept coefficients
+BISECTION_STEPS = 60
+
+
+def diagonal_energy(coeffs):
+    """
+    Function to sum the energy of the coefficients of every block along its k + l diagonals.
+    :param coeffs: coefficients of shape (..., F, F)
+    :return: array of shape (..., 2F - 1), entry s holding the energy of the coefficients with k + l = s
+    """
+    F = coeffs.shape[-1]
+    k = np.arange(F)
+    diagonals = np.equal.outer((k[:, None] + k[None, :]).ravel(), np.arange(2 * F - 1)).astype(coeffs.dtype)
+    return (coeffs.reshape(*coeffs.shape[:-2], F * F) ** 2) @ diagonals
+
+
+def cutoff_costs(coeffs):
+    """
+    Function to compute, for every block and every cutoff d from 1 to 2F - 1, the squared error it causes and the
+    coefficients it keeps. The transform is orthonormal, so the error of a cutoff is the energy of the diagonals it
+    drops.
+    :param coeffs: coefficients of shape (..., F, F)
+    :return: (errors of shape (..., 2F - 1), kept coefficients per block of shape (2F - 1,)), index i is d = i + 1
+    """
+    F = coeffs.shape[-1]
+    energy = diagonal_energy(coeffs)
+    kept_energy = np.cumsum(energy, axis=-1)
+    errors = kept_energy[..., -1:] - kept_energy
+
+    sizes = np.minimum(np.arange(1, 2 * F), np.arange(2 * F - 1, 0, -1))
+    return np.maximum(errors, 0), np.cumsum(sizes)
+
+
+def kept_coefficients(F, d_map):
+    """
+    Function to count the coefficients kept by a map of cutoffs.
+    :param F: block dimension
+    :param d_map: cutoff of every block, values between 1 and 2F - 1
+    :return: total number of kept coefficients
+    """
+    sizes = np.minimum(np.arange(1, 2 * F), np.arange(2 * F - 1, 0, -1))
+    return int(np.cumsum(sizes)[np.asarray(d_map) - 1].sum())
+
+
+def _pick(errors, counts, lagrange):
+    """
+    Function to pick the cutoff of every block minimizing error + lagrange * kept coefficients.
+    :return: index of the chosen cutoff of every block
+    """
+    return np.argmin(errors + lagrange * counts, axis=-1)
+
+
+def choose_cutoffs(coeffs, target_psnr=None, max_coefficients=None):
+    """
+    Function to choose a cutoff d for every block: as few kept coefficients as possible for a target PSNR, or the
+    lowest error for a budget of kept coefficients. Both are solved at once for all the blocks by bisecting the
+    Lagrange multiplier that prices a coefficient in squared error, so every block ends up at the same error/rate
+    slope.
+    :param coeffs: coefficients of shape (c, h_blocks, w_blocks, F, F)
+    :param target_psnr: PSNR to reach, in dB
+    :param max_coefficients: total number of coefficients that can be kept, used when target_psnr is None, at least
+    the DC coefficient of every block
+    :return: d map of shape (c, h_blocks, w_blocks), values between 1 and 2F - 1
+    """
+    if (target_psnr is None) == (max_coefficients is None):
+        raise ValueError("Give either a target PSNR or a coefficient budget.")
+    n_blocks = coeffs[..., 0, 0].size
+    if max_coefficients is not None and max_coefficients < n_blocks:
+        raise ValueError(f"A budget of {max_coefficients} coefficients cannot keep the DC coefficient of each of the "
+                         f"{n_blocks} blocks.")
+
+    errors, counts = cutoff_costs(coeffs)
+    low, high = 1e-12, float(errors[..., 0].max(initial=0)) + 1
+
+    if target_psnr is not None:
+        n_pixels = n_blocks * coeffs.shape[-1] ** 2
+        budget = max(n_pixels * (255 ** 2 / 10 ** (target_psnr / 10) - ROUNDING_MSE), 0)
+
+        def fits(lagrange):
+            choice = _pick(errors, counts, lagrange)
+            return np.take_along_axis(errors, choice[..., None], axis=-1).sum() <= budget
+
+        # The error grows with the multiplier: look for the largest one that still meets the target
+        for _ in range(BISECTION_STEPS):
+            middle = np.sqrt(low * high)
+            low, high = (middle, high) if fits(middle) else (low, middle)
+        lagrange = low
+    else:
+        def fits(lagrange):
+            return counts[_pick(errors, counts, lagrange)].sum() <= max_coefficients
+
+        # The kept coefficients shrink as the multiplier grows: look for the smallest one within the budget
+        for _ in range(BISECTION_STEPS):
+            middle = np.sqrt(low * high)
+            low, high = (low, middle) if fits(middle) else (middle, high)
+        lagrange = high
+
+    return (_pick(errors, counts, lagrange) + 1).astype(np.int16)
+
+
+def inverse_blocks_adaptive(coeffs, d_map):
+    """
+    Function to rebuild an image from its block coefficients, keeping the frequencies with k + l < d of each block.
+    :param coeffs: coefficients of shape (c, h_blocks, w_blocks, F, F), left untouched
+    :param d_map: cutoff of every block, of shape (c, h_blocks, w_blocks)
+    :return: compressed image in (h, w, c) uint8 array format
+    """
+    from scipy.fft import idctn
+
+    F = coeffs.shape[-1]
+    k = np.arange(F)
+    mask = (k[:, None] + k[None, :]) < d_map[..., None, None]
+
+    restored = idctn(np.where(mask, coeffs, 0), type=2, norm='ortho', axes=(-2, -1), overwrite_x=True)
+    np.round(restored, out=restored)
+    np.clip(restored, 0, 255, out=restored)
+    return blocks_to_image(restored).astype(np.uint8)
+
+
+def compress_image_adaptive(img_array, F, target_psnr=None, max_coefficients=None, max_bytes=None, padding="crop"):
+    """
+    Function to compress an image with a cutoff chosen for each block, from a quality target or a size budget
+    instead of one global d.
+    :param img_array: image to be compressed, in (h, w, c) array format
+    :param F: block dimension
+    :param target_psnr: PSNR to reach, in dB
+    :param max_coefficients: total number of coefficients that can be kept
+    :param max_bytes: budget in bytes of the kept coefficients, at COEFFICIENT_BYTES each
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :return: (compressed image in array format, d map of shape (c, h_blocks, w_blocks))
+    """
+    if max_bytes is not None:
+        max_coefficients = max_bytes // COEFFICIENT_BYTES
+
+    h, w, _ = img_array.shape
+    coeffs = forward_blocks(img_array, F, padding)
+    d_map = choose_cutoffs(coeffs, target_psnr, max_coefficients)
+    compressed = inverse_blocks_adaptive(coeffs, d_map)
+
+    return (compressed if padding == "crop" else compressed[:h, :w]), d_map
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress an image with a cutoff chosen for each block.")
+    parser.add_argument("input", help="input image")
+    parser.add_argument("output", help="output image")
+    parser.add_argument("-F", type=int, default=8, help="block dimension")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--psnr", type=float, help="target PSNR in dB")
+    target.add_argument("--coefficients", type=int, help="total number of kept coefficients")
+    target.add_argument("--bytes", type=int, help=f"budget of the kept coefficients, {COEFFICIENT_BYTES} bytes each")
+    parser.add_argument("--padding", choices=sorted(PADDING_MODES), default="crop",
+                        help="drop the pixels that do not fill a whole block, or pad the partial blocks")
+    parser.add_argument("--d-map", help="optional .npy file to save the chosen cutoffs to")
+    args = parser.parse_args()
+
+    img_array = np.array(Image.open(args.input))
+    grayscale = img_array.ndim == 2
+    if grayscale:
+        img_array = img_array[:, :, np.newaxis]
+
+    compressed_img, d_map = compress_image_adaptive(img_array, args.F, args.psnr, args.coefficients, args.bytes,
+                                                    args.padding)
+
+    original = img_array[:compressed_img.shape[0], :compressed_img.shape[1]].astype(np.float64)
+    mse = np.mean((original - compressed_img) ** 2)
+    psnr = 10 * np.log10(255 ** 2 / mse) if mse else float("inf")
+    kept = kept_coefficients(args.F, d_map)
+    print(f"PSNR: {psnr:.2f} dB, kept coefficients: {kept} ({kept / (d_map.size * args.F ** 2):.1%}), "
+          f"d from {d_map.min()} to {d_map.max()} (mean {d_map.mean():.2f})")
+
+    Image.fromarray(compressed_img[:, :, 0] if grayscale else compressed_img).save(args.output)
+    print(f"Image saved at: {os.path.abspath(args.output)}")
+
+    if args.d_map:
+        np.save(args.d_map, d_map)
+        print(f"d map saved at: {os.path.abspath(args.d_map)}")
@@ -0,0 +1,131 @@
+import threading
+import numpy as np
+
+from numpy.lib.stride_tricks import as_strided
+
+from compression_tool.transform import get_plan
+
+# Floating point types compress_array can compute in
+ARRAY_PRECISIONS = {"float32": np.float32, "float64": np.float64}
+
+# Workspace of the calls made without one, one per thread
+_local = threading.local()
+
+
+class Workspace:
+    """
+    Class holding the scratch buffers of compress_array. They are allocated on the first call and reused as long as
+    the frame shape, F and precision stay the same, so a stream of same-sized frames allocates nothing after the
+    first one. A workspace must not be shared by calls running at the same time.
+    """
+    def __init__(self):
+        """
+        Workspace constructor
+        """
+        self.key = None
+        self.blocks = None
+        self.scratch = None
+
+    def buffers(self, shape, dtype):
+        """
+        Method to get the two block buffers for a batch shape, reallocating them only when it changes.
+        :param shape: block batch shape, (h_blocks, w_blocks, F, F) or (c, h_blocks, w_blocks, F, F)
+        :param dtype: floating point type
+        :return: (blocks, scratch) C-contiguous arrays of that shape
+        """
+        key = (shape, np.dtype(dtype))
+        if key != self.key:
+            self.blocks = np.empty(shape, dtype=dtype)
+            self.scratch = np.empty(shape, dtype=dtype)
+            self.key = key
+        return self.blocks, self.scratch
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the buffers.
+        """
+        return 0 if self.key is None else self.blocks.nbytes + self.scratch.nbytes
+
+
+def default_workspace():
+    """
+    Function to get the workspace of the current thread, used by compress_array when none is given.
+    :return: Workspace
+    """
+    workspace = getattr(_local, "workspace", None)
+    if workspace is None:
+        workspace = _local.workspace = Workspace()
+    return workspace
+
+
+def as_image(data, shape=None):
+    """
+    Function to view any buffer as an image, without copying it.
+    :param data: uint8 NumPy array or object with the buffer protocol (bytes, bytearray, memoryview, PIL buffers...)
+    :param shape: (h, w) or (h, w, c) to give a flat buffer its image shape
+    :return: uint8 array of shape (h, w) or (h, w, c) sharing the memory of data
+    """
+    img = np.frombuffer(data, dtype=np.uint8).reshape(shape) if shape is not None else np.asarray(data)
+    if img.dtype != np.uint8:
+        raise TypeError(f"Images must be uint8, got {img.dtype}")
+    if img.ndim not in (2, 3):
+        raise ValueError(f"Images must be (h, w) or (h, w, c) arrays, got shape {img.shape}")
+    return img
+
+
+def block_view(img, F):
+    """
+    Function to view the whole F×F blocks of an image as a batch, without copying. Writing to the view writes the
+    image.
+    :param img: array of shape (h, w) or (h, w, c), with any strides
+    :param F: block dimension
+    :return: view of shape (h_blocks, w_blocks, F, F), or (c, h_blocks, w_blocks, F, F) for (h, w, c) images
+    """
+    h_blocks, w_blocks = img.shape[0] // F, img.shape[1] // F
+    row, col = img.strides[:2]
+    if img.ndim == 2:
+        return as_strided(img, (h_blocks, w_blocks, F, F), (row * F, col * F, row, col))
+    return as_strided(img, (img.shape[2], h_blocks, w_blocks, F, F), (img.strides[2], row * F, col * F, row, col))
+
+
+def compress_array(data, F, d, out=None, workspace=None, precision="float32", shape=None):
+    """
+    Function to compress an image held in memory, working on the caller buffers. The pixels are converted once into
+    a preallocated workspace, truncated and reconstructed there with matrix products writing into the workspace
+    buffers, then rounded and written to out. With out and a workspace of the right size, a call allocates no
+    array. As in compress_image, the pixels that do not fill a whole block are dropped.
+    :param data: uint8 image of shape (h, w) or (h, w, c), as a NumPy array or any object with the buffer protocol
+    (give shape for a flat buffer)
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param out: optional uint8 array of shape (h_blocks * F, w_blocks * F[, c]) receiving the result, with any
+    strides; it may be the input itself
+    :param workspace: optional Workspace to reuse, the one of the current thread by default
+    :param precision: "float32" or "float64"
+    :param shape: (h, w) or (h, w, c) of a flat buffer, see as_image
+    :return: out, or a new array if out is None
+    """
+    if precision not in ARRAY_PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+
+    img = as_image(data, shape)
+    h_blocks, w_blocks = img.shape[0] // F, img.shape[1] // F
+    out_shape = (h_blocks * F, w_blocks * F) + img.shape[2:]
+    if out is None:
+        out = np.empty(out_shape, dtype=np.uint8)
+    elif out.shape != out_shape or out.dtype != np.uint8:
+        raise ValueError(f"out must be a uint8 array of shape {out_shape}, got {out.dtype} {out.shape}")
+
+    source = block_view(img, F)
+    if source.size == 0:
+        return out
+
+    blocks, scratch = (workspace or default_workspace()).buffers(source.shape, ARRAY_PRECISIONS[precision])
+    np.copyto(blocks, source, casting="unsafe")
+
+    restored = get_plan(F, blocks.dtype).fused(d).apply_into(blocks, scratch)
+    np.rint(restored, out=restored)
+    np.clip(restored, 0, 255, out=restored)
+    np.copyto(block_view(out, F), restored, casting="unsafe")
+    return out
@@ -0,0 +1,450 @@
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+from compression_tool.transform import get_plan
+
+# Registered dct2 backends, by name
+BACKENDS = {}
+
+# Environment variable naming a JSON file that keeps the backend picked by "auto" for each block size, so the
+# micro-benchmark runs once per machine. Without it the choices only last as long as the process.
+AUTO_CACHE_ENV = "DCT2_BACKEND_CACHE"
+
+# Pixels per block batch and repetitions of the "auto" micro-benchmark
+AUTO_BENCHMARK_PIXELS = 256 * 256
+AUTO_BENCHMARK_REPEATS = 3
+
+
+class DCTBackend:
+    """
+    Base class of the dct2 backends. A backend transforms batches of blocks of shape (..., F, F) with the
+    orthonormal DCT-II and its inverse.
+    """
+    name = None
+
+    def supports(self, F):
+        """
+        Method to tell whether the backend can transform F×F blocks.
+        :param F: block dimension
+        :return: True if F is supported
+        """
+        return True
+
+    def forward(self, blocks):
+        """
+        Method to compute the dct2 of a batch of blocks.
+        :param blocks: float array of shape (..., F, F)
+        :return: coefficients, same shape as blocks
+        """
+        raise NotImplementedError
+
+    def inverse(self, coeffs):
+        """
+        Method to compute the idct2 of a batch of coefficient blocks.
+        :param coeffs: float array of shape (..., F, F)
+        :return: restored blocks, same shape as coeffs
+        """
+        raise NotImplementedError
+
+    def reconstruct(self, blocks, d):
+        """
+        Method to cut the frequencies with k + l >= d from a batch of blocks. The input batch may be overwritten.
+        :param blocks: float array of shape (..., F, F)
+        :param d: frequency cutoff threshold
+        :return: restored blocks, not yet rounded
+        """
+        coeffs = self.forward(blocks)
+        coeffs *= get_plan(blocks.shape[-1], coeffs.dtype).mask(d)
+        return self.inverse(coeffs)
+
+
+def register_backend(backend):
+    """
+    Function to make a backend available by name to compress_image and the benchmarks.
+    :param backend: DCTBackend instance
+    :return: the backend
+    """
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+class ScipyBackend(DCTBackend):
+    """
+    scipy.fft dctn/idctn, optionally spread over several threads.
+    """
+    def __init__(self, name, workers=None):
+        """
+        ScipyBackend constructor
+        :param name: registry name
+        :param workers: scipy.fft workers, -1 for all the cores
+        """
+        self.name = name
+        self.workers = workers
+
+    # scipy.fft is imported on first use, so that the other backends and the codec start without it
+    def forward(self, blocks):
+        from scipy.fft import dctn
+        return dctn(blocks, type=2, norm='ortho', axes=(-2, -1), workers=self.workers)
+
+    def inverse(self, coeffs):
+        from scipy.fft import idctn
+        return idctn(coeffs, type=2, norm='ortho', axes=(-2, -1), workers=self.workers)
+
+    def reconstruct(self, blocks, d):
+        from scipy.fft import dctn, idctn
+        coeffs = dctn(blocks, type=2, norm='ortho', axes=(-2, -1), overwrite_x=True, workers=self.workers)
+        coeffs *= get_plan(blocks.shape[-1], coeffs.dtype).mask(d)
+        return idctn(coeffs, type=2, norm='ortho', axes=(-2, -1), overwrite_x=True, workers=self.workers)
+
+
+class MatrixBackend(DCTBackend):
+    """
+    Two matrix products with the cached DCT-II matrix of the transform plan, C @ B @ C.T.
+    """
+    name = "matrix"
+
+    def forward(self, blocks):
+        return get_plan(blocks.shape[-1], blocks.dtype).forward(blocks)
+
+    def inverse(self, coeffs):
+        return get_plan(coeffs.shape[-1], coeffs.dtype).inverse(coeffs)
+
+
+class FusedBackend(MatrixBackend):
+    """
+    Matrix backend whose reconstruct applies the cached truncate-and-reconstruct operator in one product.
+    """
+    name = "fused"
+
+    def reconstruct(self, blocks, d):
+        return get_plan(blocks.shape[-1], blocks.dtype).fused(d).apply(blocks)
+
+
+@functools.lru_cache(maxsize=64)
+def _fft_twiddles(N, dtype):
+    """
+    Function to compute the twiddle factors of the FFT based orthonormal DCT-II of size N.
+    :param N: transform size
+    :param dtype: real floating point type of the transformed data
+    :return: (forward post-twiddle of length N, inverse pre-twiddle of length N // 2 + 1, inverse scale of length N)
+    """
+    complex_dtype = np.result_type(dtype, np.complex64)
+    scale = np.full(N, np.sqrt(2 / N))
+    scale[0] = np.sqrt(1 / N)
+    forward = np.exp(-1j * np.pi * np.arange(N) / (2 * N)) * scale
+    inverse = np.exp(1j * np.pi * np.arange(N // 2 + 1) / (2 * N))
+    return forward.astype(complex_dtype), inverse.astype(complex_dtype), (1 / scale).astype(dtype)
+
+
+class FFTBackend(DCTBackend):
+    """
+    O(N log N) DCT-II computed with a real FFT of the even/odd reordered input (Makhoul's algorithm): a
+    permutation before the rfft and a complex twiddle after it, and the reverse for the inverse.
+    """
+    name = "fft"
+
+    @staticmethod
+    def _dct_last_axis(x):
+        """
+        Method to compute the 1D DCT-II along the last axis.
+        :param x: float array
+        :return: coefficients, same shape as x
+        """
+        from scipy.fft import rfft
+        N = x.shape[-1]
+        forward, _, _ = _fft_twiddles(N, x.dtype)
+
+        v = np.concatenate((x[..., ::2], x[..., 1::2][..., ::-1]), axis=-1)
+        half = rfft(v, axis=-1)
+        # V[N - k] = conj(V[k]) for a real input, so the upper half of the spectrum is mirrored
+        spectrum = np.concatenate((half, np.conj(half[..., 1:(N + 1) // 2][..., ::-1])), axis=-1)
+        return (spectrum * forward).real
+
+    @staticmethod
+    def _idct_last_axis(X):
+        """
+        Method to compute the 1D inverse DCT-II along the last axis.
+        :param X: float array of coefficients
+        :return: restored values, same shape as X
+        """
+        from scipy.fft import irfft
+        N = X.shape[-1]
+        half = N // 2 + 1
+        _, inverse, unscale = _fft_twiddles(N, X.dtype)
+
+        y = X * unscale
+        # V[k] = exp(i pi k / 2N) (Y[k] - i Y[N - k]), with Y[N] = 0
+        mirrored = np.zeros(X.shape[:-1] + (half,), dtype=X.dtype)
+        mirrored[..., 1:] = y[..., N - 1:N - half:-1]
+        v = irfft(inverse * (y[..., :half] - 1j * mirrored), n=N, axis=-1)
+
+        x = np.empty_like(v)
+        x[..., ::2] = v[..., :(N + 1) // 2]
+        x[..., 1::2] = v[..., (N + 1) // 2:][..., ::-1]
+        return x
+
+    def forward(self, blocks):
+        rows = self._dct_last_axis(blocks)
+        return self._dct_last_axis(rows.swapaxes(-1, -2)).swapaxes(-1, -2)
+
+    def inverse(self, coeffs):
+        rows = self._idct_last_axis(coeffs)
+        return self._idct_last_axis(rows.swapaxes(-1, -2)).swapaxes(-1, -2)
+
+
+# Multipliers of the AAN 8 point butterflies (Arai, Agui and Nakajima, as in libjpeg's float DCTs), as Python
+# floats so that they keep the data type
+_R2 = float(np.sqrt(2))
+_C4 = float(np.cos(4 * np.pi / 16))
+_C6_S = float(np.cos(6 * np.pi / 16))
+_C2_MINUS_C6 = float(np.cos(2 * np.pi / 16) - np.cos(6 * np.pi / 16))
+_C2_PLUS_C6 = float(np.cos(2 * np.pi / 16) + np.cos(6 * np.pi / 16))
+_2C2 = float(2 * np.cos(2 * np.pi / 16))
+
+# The AAN transforms are orthonormal up to one factor per frequency, the inverse scale of each frequency
+_AAN_SCALE = np.cos(np.arange(8) * np.pi / 16) / 2
+_AAN_SCALE[0] = 1 / (2 * np.sqrt(2))
+
+
+@functools.lru_cache(maxsize=64)
+def _aan_scales(dtype, d=None):
+    """
+    Function to compute the per-coefficient factors completing the 2D AAN transforms.
+    :param dtype: real floating point type of the transformed data
+    :param d: frequency cutoff threshold, None for the separate forward and inverse factors
+    :return: (forward, inverse) (8, 8) arrays, or the single (8, 8) array of the forward factor, mask and inverse
+    factor when d is given
+    """
+    inverse = np.outer(_AAN_SCALE, _AAN_SCALE)
+    forward = 1 / (64 * inverse)
+    if d is None:
+        return forward.astype(dtype), inverse.astype(dtype)
+    return (forward * get_plan(8, np.float64).mask(d) * inverse).astype(dtype)
+
+
+class Butterfly8Backend(DCTBackend):
+    """
+    Fast 8×8 DCT of Arai, Agui and Nakajima (AAN): each 8 point transform is an even/odd butterfly network with 5
+    multiplications and 29 additions, whose output is off by one factor per frequency. Along two axes those factors
+    become a single elementwise product, which reconstruct merges with the frequency mask and the inverse factors.
+    Each butterfly step works on whole planes of the block batch, moved to the leading axes first. In NumPy every
+    step is still a pass over the batch, so the saved multiplications do not make it faster than scipy or fused.
+    """
+    name = "butterfly8"
+
+    def supports(self, F):
+        return F == 8
+
+    @staticmethod
+    def _aan_forward(x, out):
+        """
+        Method to compute the unscaled 8 point AAN DCT along the first axis.
+        :param x: float array of shape (8, ...)
+        :param out: array of the same shape receiving the coefficients
+        """
+        t0, t7 = x[0] + x[7], x[0] - x[7]
+        t1, t6 = x[1] + x[6], x[1] - x[6]
+        t2, t5 = x[2] + x[5], x[2] - x[5]
+        t3, t4 = x[3] + x[4], x[3] - x[4]
+
+        # Even part, a 4 point DCT of the sums
+        a0, a3 = t0 + t3, t0 - t3
+        a1, a2 = t1 + t2, t1 - t2
+        out[0] = a0 + a1
+        out[4] = a0 - a1
+        z1 = (a2 + a3) * _C4
+        out[2] = a3 + z1
+        out[6] = a3 - z1
+
+        # Odd part, the rotation of the differences factorized around z5
+        b0, b1, b2 = t4 + t5, t5 + t6, t6 + t7
+        z5 = (b0 - b2) * _C6_S
+        z2 = b0 * _C2_MINUS_C6 + z5
+        z4 = b2 * _C2_PLUS_C6 + z5
+        z3 = b1 * _C4
+        z11, z13 = t7 + z3, t7 - z3
+        out[5] = z13 + z2
+        out[3] = z13 - z2
+        out[1] = z11 + z4
+        out[7] = z11 - z4
+
+    @staticmethod
+    def _aan_inverse(X, out):
+        """
+        Method to compute the unscaled 8 point AAN inverse DCT along the first axis.
+        :param X: float array of shape (8, ...), coefficients already multiplied by the inverse factors
+        :param out: array of the same shape receiving the values
+        """
+        t10, t11 = X[0] + X[4], X[0] - X[4]
+        t13 = X[2] + X[6]
+        t12 = (X[2] - X[6]) * _R2 - t13
+        e0, e3 = t10 + t13, t10 - t13
+        e1, e2 = t11 + t12, t11 - t12
+
+        z13, z10 = X[5] + X[3], X[5] - X[3]
+        z11, z12 = X[1] + X[7], X[1] - X[7]
+        o7 = z11 + z13
+        o11 = (z11 - z13) * _R2
+        z5 = (z10 + z12) * _2C2
+        o6 = z5 - z10 * (2 * _C2_PLUS_C6) - o7
+        o5 = o11 - o6
+        o4 = z5 - z12 * (2 * _C2_MINUS_C6) - o5
+
+        out[0], out[7] = e0 + o7, e0 - o7
+        out[1], out[6] = e1 + o6, e1 - o6
+        out[2], out[5] = e2 + o5, e2 - o5
+        out[3], out[4] = e3 + o4, e3 - o4
+
+    def _separable(self, blocks, step):
+        """
+        Method to apply an 8 point step along both block axes, with the block axes moved in front.
+        :param blocks: float array of shape (..., 8, 8)
+        :param step: _aan_forward or _aan_inverse
+        :return: unscaled result of shape (8, 8, ...)
+        """
+        planes = np.moveaxis(blocks, (-2, -1), (0, 1))
+        rows = np.empty(planes.shape, dtype=planes.dtype)
+        step(planes.swapaxes(0, 1), rows.swapaxes(0, 1))
+        out = np.empty_like(rows)
+        step(rows, out)
+        return out
+
+    @staticmethod
+    def _block_axes(planes):
+        """
+        Method to move the block axes of an (8, 8, ...) array back to the end.
+        """
+        return np.moveaxis(planes, (0, 1), (-2, -1))
+
+    def forward(self, blocks):
+        forward, _ = _aan_scales(blocks.dtype)
+        coeffs = self._separable(blocks, self._aan_forward)
+        coeffs *= forward.reshape(forward.shape + (1,) * (coeffs.ndim - 2))
+        return self._block_axes(coeffs)
+
+    def inverse(self, coeffs):
+        _, inverse = _aan_scales(coeffs.dtype)
+        scaled = coeffs * inverse
+        return self._block_axes(self._separable(scaled, self._aan_inverse))
+
+    def reconstruct(self, blocks, d):
+        scales = _aan_scales(blocks.dtype, d)
+        coeffs = self._separable(blocks, self._aan_forward)
+        coeffs *= scales.reshape(scales.shape + (1,) * (coeffs.ndim - 2))
+        return self._block_axes(self._separable(self._block_axes(coeffs), self._aan_inverse))
+
+
+register_backend(ScipyBackend("scipy"))
+register_backend(ScipyBackend("scipy_threads", workers=-1))
+register_backend(MatrixBackend())
+register_backend(FusedBackend())
+register_backend(FFTBackend())
+register_backend(Butterfly8Backend())
+
+_auto_choices = {}
+_auto_lock = threading.Lock()
+
+
+def benchmark_backends(F, d=None):
+    """
+    Function to time the reconstruct step of every backend supporting F on a random block batch.
+    :param F: block dimension
+    :param d: frequency cutoff threshold, F by default
+    :return: dict mapping the backend names to their best time in seconds
+    """
+    d = F if d is None else d
+    rng = np.random.default_rng(0)
+    blocks = rng.random((max(1, AUTO_BENCHMARK_PIXELS // (F * F)), F, F)) * 255
+
+    timings = {}
+    for name, backend in BACKENDS.items():
+        if not backend.supports(F):
+            continue
+        backend.reconstruct(blocks.copy(), d)
+
+        best = float("inf")
+        for _ in range(AUTO_BENCHMARK_REPEATS):
+            batch = blocks.copy()
+            start = time.perf_counter()
+            backend.reconstruct(batch, d)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    return timings
+
+
+def _load_auto_choices(path):
+    """
+    Function to read the backends picked by earlier "auto" runs.
+    :param path: JSON file of the choices
+    :return: dict mapping F, as a string, to a backend name
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_auto_choices(path, choices):
+    """
+    Function to persist the backends picked by "auto". Failures are ignored, the choice is only an optimization.
+    :param path: JSON file of the choices
+    :param choices: dict mapping F, as a string, to a backend name
+    """
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(choices, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def select_backend(F):
+    """
+    Function to pick the fastest backend for a block size, by running the micro-benchmark the first time F is seen
+    in the process. The choices are only read from and written to a file when AUTO_CACHE_ENV names one.
+    :param F: block dimension
+    :return: backend name
+    """
+    with _auto_lock:
+        choice = _auto_choices.get(F)
+        if choice is not None:
+            return choice
+
+        path = os.environ.get(AUTO_CACHE_ENV)
+        choices = _load_auto_choices(path) if path else {}
+        choice = choices.get(str(F))
+        if choice not in BACKENDS or not BACKENDS[choice].supports(F):
+            timings = benchmark_backends(F)
+            choice = min(timings, key=timings.get)
+            if path:
+                choices[str(F)] = choice
+                _save_auto_choices(path, choices)
+
+        _auto_choices[F] = choice
+        return choice
+
+
+def get_backend(name, F):
+    """
+    Function to get a registered backend by name.
+    :param name: backend name, or "auto" to pick the fastest one for F
+    :param F: block dimension
+    :return: DCTBackend instance
+    """
+    if name == "auto":
+        name = select_backend(F)
+
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown dct2 backend: {name}")
+    if not backend.supports(F):
+        raise ValueError(f"The {name} dct2 backend does not support F = {F}.")
+    return backend
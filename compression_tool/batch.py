@@ -0,0 +1,184 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from compression_tool.blocks import PADDING_MODES, forward_blocks, inverse_blocks
+from compression_tool.metrics import image_metrics
+
+# Image extensions picked up when a directory is given as input
+IMAGE_EXTENSIONS = (".bmp",)
+
+# Manifest columns, in order
+MANIFEST_FIELDS = [
+    "input", "output", "F", "d", "height", "width", "channels", "decode_time", "forward_time", "inverse_time",
+    "save_time", "input_bytes", "output_bytes", "mse", "psnr", "ssim", "kept_ratio"
+]
+
+
+def find_images(inputs, extensions=IMAGE_EXTENSIONS):
+    """
+    Function to expand a list of directories, files and glob patterns into image paths.
+    :param inputs: directories, image paths or glob patterns
+    :param extensions: lowercase extensions of the images picked up in directories
+    :return: sorted list of unique image paths
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths.update(
+                os.path.join(entry, name) for name in os.listdir(entry) if name.lower().endswith(extensions)
+            )
+        else:
+            paths.update(p for p in glob.glob(entry) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def compress_sweep(input_file, grid, output_dir, padding="crop"):
+    """
+    Function to compress one image with every (F, d) pair of a grid. The image is decoded once and the
+    coefficients of each F are computed once and shared by all its d values.
+    :param input_file: path to the input image
+    :param grid: dict mapping each F to the list of d values to use with it
+    :param output_dir: folder to save the compressed images to
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :return: list of manifest rows, one per (F, d) pair
+    """
+    start = time.perf_counter()
+    img_array = np.array(Image.open(input_file))
+    decode_time = time.perf_counter() - start
+
+    grayscale = img_array.ndim == 2
+    if grayscale:
+        img_array = img_array[:, :, np.newaxis]
+    h, w, c = img_array.shape
+
+    img_name = os.path.splitext(os.path.basename(input_file))[0]
+    rows = []
+
+    for F, d_values in grid.items():
+        start = time.perf_counter()
+        coeffs = forward_blocks(img_array, F, padding)
+        forward_time = time.perf_counter() - start
+
+        for d in d_values:
+            start = time.perf_counter()
+            compressed_img = inverse_blocks(coeffs, d)[:h, :w]
+            inverse_time = time.perf_counter() - start
+
+            output_path = os.path.join(output_dir, f"{img_name}_compressed_F{F}_d{d}.bmp")
+            start = time.perf_counter()
+            Image.fromarray(compressed_img[:, :, 0] if grayscale else compressed_img).save(output_path)
+            save_time = time.perf_counter() - start
+
+            rows.append({
+                "input": os.path.abspath(input_file),
+                "output": os.path.abspath(output_path),
+                "F": F,
+                "d": d,
+                "height": h,
+                "width": w,
+                "channels": c,
+                "decode_time": decode_time,
+                "forward_time": forward_time,
+                "inverse_time": inverse_time,
+                "save_time": save_time,
+                "input_bytes": os.path.getsize(input_file),
+                "output_bytes": os.path.getsize(output_path),
+                **image_metrics(img_array, compressed_img, F, d),
+            })
+
+    return rows
+
+
+def build_grid(F_values, d_values):
+    """
+    Function to pair every block dimension with the cutoff thresholds that are valid for it.
+    :param F_values: block dimensions
+    :param d_values: frequency cutoff thresholds
+    :return: dict mapping each F to its sorted valid d values
+    """
+    grid = {}
+    for F in sorted(set(F_values)):
+        valid = sorted(d for d in set(d_values) if 0 <= d <= 2 * F - 2)
+        skipped = sorted(set(d_values) - set(valid))
+        if skipped:
+            print(f"Skipping d = {skipped} for F = {F}: d must be between 0 and {2 * F - 2}.")
+        if valid:
+            grid[F] = valid
+    return grid
+
+
+def write_manifest(rows, output_dir, fields=MANIFEST_FIELDS, name="manifest"):
+    """
+    Function to write the manifest of a batch run as both JSON and CSV.
+    :param rows: manifest rows
+    :param output_dir: folder to save the manifest to
+    :param fields: CSV columns, in order
+    :param name: file name of the manifest, without extension
+    :return: paths of the JSON and CSV manifests
+    """
+    json_path = os.path.join(output_dir, f"{name}.json")
+    csv_path = os.path.join(output_dir, f"{name}.csv")
+
+    with open(json_path, "w") as f:
+        json.dump(rows, f, indent=2)
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return json_path, csv_path
+
+
+def batch_compress(inputs, F_values, d_values, output_dir, workers=1, padding="crop"):
+    """
+    Function to compress a set of images over a grid of (F, d) values, spreading the images over a thread pool.
+    :param inputs: directories, image paths or glob patterns
+    :param F_values: block dimensions
+    :param d_values: frequency cutoff thresholds
+    :param output_dir: folder to save the compressed images and the manifest to
+    :param workers: number of images compressed at the same time
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :return: manifest rows
+    """
+    images = find_images(inputs)
+    if not images:
+        raise ValueError("No image found.")
+    grid = build_grid(F_values, d_values)
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Compressing {len(images)} images with {sum(map(len, grid.values()))} (F, d) pairs each...")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda path: compress_sweep(path, grid, output_dir, padding), images)
+        rows = [row for image_rows in results for row in image_rows]
+
+    json_path, csv_path = write_manifest(rows, output_dir)
+    print(f"Manifest saved at: {os.path.abspath(json_path)} and {os.path.abspath(csv_path)}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress a batch of images over a grid of (F, d) values.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-F", type=int, nargs="+", required=True, help="block dimensions")
+    parser.add_argument("-d", type=int, nargs="+", required=True, help="frequency cutoff thresholds")
+    parser.add_argument("-o", "--output", default="output/", help="output folder")
+    parser.add_argument("--workers", type=int, default=1, help="number of images compressed at the same time")
+    parser.add_argument("--padding", choices=sorted(PADDING_MODES), default="crop",
+                        help="drop the pixels that do not fill a whole block, or pad the partial blocks")
+    args = parser.parse_args()
+
+    try:
+        batch_compress(args.inputs, args.F, args.d, args.output, args.workers, args.padding)
+    except ValueError as e:
+        parser.error(str(e))
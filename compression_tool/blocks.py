@@ -0,0 +1,194 @@
+import numpy as np
+
+from compression_tool import instrument
+from compression_tool.arrays import block_view
+from compression_tool.backends import get_backend
+from compression_tool.transform import get_fixed_plan, get_plan
+
+# Supported arithmetic precisions: floating point types, or "int" for the fixed-point integer DCT
+PRECISIONS = {"float64": np.float64, "float32": np.float32, "int": np.int32}
+
+# Handling of the pixels that do not fill a whole block: "crop" drops them, the others pad the image up to whole
+# blocks with the matching np.pad mode
+PADDING_MODES = {"crop": None, "edge": "edge", "symmetric": "symmetric", "zero": "constant"}
+
+# Minimum number of bands when progress is reported or cancellation is possible
+PROGRESS_BANDS = 32
+
+
+class CompressionCancelled(Exception):
+    """
+    Raised when a compression is stopped through its cancellation token.
+    """
+
+
+def check_cancelled(cancel):
+    """
+    Function to stop a compression if its cancellation token is set.
+    :param cancel: cancellation token with an is_set method, like threading.Event, or None
+    """
+    if cancel is not None and cancel.is_set():
+        raise CompressionCancelled("Compression cancelled.")
+
+
+def image_to_blocks(img_array, F, dtype=np.float64):
+    """
+    Function to split an image into a batch of F×F blocks. Pixels that do not fill a whole block are cropped.
+    :param img_array: image in (h, w, c) array format
+    :param F: block dimension
+    :param dtype: type of the returned blocks, the pixels are converted once here
+    :return: array of shape (c, h_blocks, w_blocks, F, F)
+    """
+    h, w, c = img_array.shape
+    h_blocks = h // F
+    w_blocks = w // F
+
+    cropped = img_array[:h_blocks * F, :w_blocks * F, :]
+    blocks = cropped.reshape(h_blocks, F, w_blocks, F, c).transpose(4, 0, 2, 1, 3)
+    return blocks.astype(dtype)
+
+
+def pad_image(img_array, F, padding="crop"):
+    """
+    Function to bring the height and width of an image to whole blocks.
+    :param img_array: image in (h, w, c) array format
+    :param F: block dimension
+    :param padding: one of PADDING_MODES, "crop" to drop the partial blocks, otherwise how to fill them
+    :return: image whose height and width are multiples of F, the input itself when they already are
+    """
+    if padding not in PADDING_MODES:
+        raise ValueError(f"Unknown padding mode: {padding}")
+
+    h, w = img_array.shape[:2]
+    if padding == "crop":
+        return img_array[:h // F * F, :w // F * F]
+
+    pad_h = -h % F
+    pad_w = -w % F
+    if pad_h == 0 and pad_w == 0:
+        return img_array
+    return np.pad(img_array, ((0, pad_h), (0, pad_w), (0, 0)), mode=PADDING_MODES[padding])
+
+
+def blocks_to_image(blocks):
+    """
+    Function to reassemble a batch of blocks into an image.
+    :param blocks: array of shape (c, h_blocks, w_blocks, F, F)
+    :return: array of shape (h_blocks * F, w_blocks * F, c)
+    """
+    c, h_blocks, w_blocks, F, _ = blocks.shape
+    return blocks.transpose(1, 3, 2, 4, 0).reshape(h_blocks * F, w_blocks * F, c)
+
+
+def band_ranges(h_blocks, n_bands):
+    """
+    Function to split the block rows of an image into contiguous horizontal bands.
+    :param h_blocks: number of block rows
+    :param n_bands: number of bands wanted, capped at one block row per band
+    :return: list of (first, last + 1) block row ranges
+    """
+    n_bands = max(1, min(n_bands, h_blocks))
+    edges = np.linspace(0, h_blocks, n_bands + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def transform_blocks(blocks, F, d, backend="scipy"):
+    """
+    Function to cut the high frequencies of a batch of blocks. The input batch may be overwritten.
+    :param blocks: float array of shape (..., F, F)
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param backend: name of a backend registered in compression_tool.backends, or "auto" to pick the fastest one
+    for F
+    :return: restored blocks, not yet rounded
+    """
+    return get_backend(backend, F).reconstruct(blocks, d)
+
+
+def forward_blocks(img_array, F, padding="crop"):
+    """
+    Function to compute the dct2 coefficients of all the blocks of an image. They can be reused for every d.
+    :param img_array: image in (h, w, c) array format
+    :param F: block dimension
+    :param padding: handling of the partial blocks, see pad_image
+    :return: coefficients of shape (c, h_blocks, w_blocks, F, F)
+    """
+    from scipy.fft import dctn
+    return dctn(image_to_blocks(pad_image(img_array, F, padding), F), type=2, norm='ortho', axes=(-2, -1), overwrite_x=True)
+
+
+def inverse_blocks(coeffs, d):
+    """
+    Function to rebuild an image from its block coefficients, keeping only the frequencies with k + l < d.
+    :param coeffs: coefficients of shape (c, h_blocks, w_blocks, F, F), left untouched
+    :param d: frequency cutoff threshold
+    :return: compressed image in (h, w, c) uint8 array format
+    """
+    from scipy.fft import idctn
+    restored = idctn(coeffs * get_plan(coeffs.shape[-1]).mask(d), type=2, norm='ortho', axes=(-2, -1),
+                     overwrite_x=True)
+
+    np.round(restored, out=restored)
+    np.clip(restored, 0, 255, out=restored)
+    return blocks_to_image(restored).astype(np.uint8)
+
+
+def forward_region(img_array, F, out, backend="scipy", precision="float64"):
+    """
+    Function to compute the dct2 coefficients of the whole blocks of an image region into an output batch.
+    :param img_array: image region in (h, w, c) array format
+    :param F: block dimension
+    :param out: float array of shape (c, h // F, w // F, F, F) receiving the coefficients
+    :param backend: dct2 backend, see transform_blocks, not used by the "int" precision
+    :param precision: "float64", "float32" or "int", the type the blocks are transformed in
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+
+    blocks = image_to_blocks(img_array, F, PRECISIONS[precision])
+    instrument.count("blocks", blocks.shape[0] * blocks.shape[1] * blocks.shape[2])
+
+    with instrument.span("transform"):
+        if precision == "int":
+            blocks -= 128
+            coeffs = get_fixed_plan(F).forward(blocks)
+            # The level shift only moves the DC coefficient, by 128 * F
+            coeffs[..., 0, 0] += 128 * F
+        else:
+            coeffs = get_backend(backend, F).forward(blocks)
+    out[...] = coeffs
+
+
+def compress_region(img_array, F, d, out, backend="scipy", precision="float64"):
+    """
+    Function to compress the whole blocks of an image region and write the result into an output region.
+    :param img_array: image region in (h, w, c) array format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param out: uint8 array of shape (h // F * F, w // F * F, c) receiving the compressed pixels, with any strides:
+    the blocks are written straight into it, without an intermediate image
+    :param backend: dct2 backend, see transform_blocks, not used by the "int" precision
+    :param precision: "float64", "float32" or "int", the type the blocks are transformed in
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+
+    with instrument.span("split_blocks"):
+        blocks = image_to_blocks(img_array, F, PRECISIONS[precision])
+    instrument.count("blocks", blocks.shape[0] * blocks.shape[1] * blocks.shape[2])
+
+    with instrument.span("transform"):
+        if precision == "int":
+            blocks -= 128
+            restored = get_fixed_plan(F).reconstruct(blocks, d)
+            restored += 128
+        else:
+            restored = transform_blocks(blocks, F, d, backend)
+
+    with instrument.span("round_clip"):
+        if precision != "int":
+            np.round(restored, out=restored)
+        np.clip(restored, 0, 255, out=restored)
+
+    with instrument.span("merge_blocks"):
+        np.copyto(block_view(out, F), restored, casting="unsafe")
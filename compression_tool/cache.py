@@ -0,0 +1,281 @@
+import filecmp
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from compression_tool.blocks import PROGRESS_BANDS, band_ranges, check_cancelled, forward_blocks, inverse_blocks, \
+    pad_image
+from compression_tool.codec import encode_coefficients
+
+# Bump when a change to the compression changes its output, so that stale results are never served
+ALGORITHM_VERSION = 1
+
+# Default cache location and size
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dct2_compression")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Chunk size used to hash the input files
+HASH_CHUNK = 1024 * 1024
+
+
+def _padding_tag(padding):
+    """
+    Function to get the part of an entry name telling its padding mode. Cropped entries have none, so that the
+    entries written before padding existed stay valid.
+    :param padding: handling of the partial blocks
+    :return: name tag
+    """
+    return "" if padding == "crop" else f"_{padding}"
+
+
+class CompressionCache:
+    """
+    On-disk, content-addressed cache of compression results, with a second layer holding the forward dct2
+    coefficients of each image per F. Entries are evicted least recently used first once the cache grows past its
+    size bound.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        CompressionCache constructor
+        :param directory: folder holding the cache entries
+        :param max_bytes: size bound of the cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"result_hits": 0, "result_misses": 0, "coeff_hits": 0, "coeff_misses": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def stats(self):
+        """
+        Hit, miss and eviction counters of the cache.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def image_key(path):
+        """
+        Method to compute the content key of an image file.
+        :param path: path to the image
+        :return: hex sha256 digest of the file content
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_result(self, key, F, d, fmt, padding="crop"):
+        """
+        Method to look up a compression result.
+        :param key: image content key
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :param fmt: output format
+        :param padding: handling of the partial blocks
+        :return: path to the cached output file, None on a miss
+        """
+        return self._get(f"{key}_F{F}_d{d}{_padding_tag(padding)}_v{ALGORITHM_VERSION}.{fmt}", "result")
+
+    def put_result(self, key, F, d, fmt, path, padding="crop"):
+        """
+        Method to store a copy of a compression result.
+        :param key: image content key
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :param fmt: output format
+        :param path: path to the output file to store
+        :param padding: handling of the partial blocks
+        """
+        self._put(f"{key}_F{F}_d{d}{_padding_tag(padding)}_v{ALGORITHM_VERSION}.{fmt}",
+                  lambda tmp: shutil.copyfile(path, tmp))
+
+    def get_coefficients(self, key, F, padding="crop"):
+        """
+        Method to look up the forward dct2 coefficients of an image.
+        :param key: image content key
+        :param F: block dimension
+        :param padding: handling of the partial blocks
+        :return: coefficients of shape (c, h_blocks, w_blocks, F, F), None on a miss
+        """
+        path = self._get(f"{key}_F{F}{_padding_tag(padding)}_v{ALGORITHM_VERSION}.npy", "coeff")
+        return None if path is None else np.load(path)
+
+    def put_coefficients(self, key, F, coeffs, padding="crop"):
+        """
+        Method to store the forward dct2 coefficients of an image.
+        :param key: image content key
+        :param F: block dimension
+        :param coeffs: coefficients of shape (c, h_blocks, w_blocks, F, F)
+        :param padding: handling of the partial blocks
+        """
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, coeffs)
+
+        self._put(f"{key}_F{F}{_padding_tag(padding)}_v{ALGORITHM_VERSION}.npy", write)
+
+    def _get(self, name, layer):
+        """
+        Method to look up an entry and mark it as recently used.
+        :param name: entry file name
+        :param layer: "result" or "coeff", the counters to update
+        :return: path to the entry, None on a miss
+        """
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            path = None
+
+        with self._lock:
+            self._stats[f"{layer}_hits" if path else f"{layer}_misses"] += 1
+        return path
+
+    def _put(self, name, write):
+        """
+        Method to atomically add an entry, then evict old entries if the cache is too big.
+        :param name: entry file name
+        :param write: callable writing the entry to the temporary path it receives
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, os.path.join(self.directory, name))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Method to delete the least recently used entries until the cache fits in its size bound.
+        """
+        with self._lock:
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+            stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+            total = sum(size for _, size, _ in stats)
+
+            for _, size, path in sorted(stats):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._stats["evictions"] += 1
+
+
+def cached_compress(cache, input_file, F, d, output_path, fmt="bmp", padding="crop", progress=None, cancel=None,
+                    workers=1):
+    """
+    Function to compress an image through the cache: a result hit skips the compression entirely, a coefficient hit
+    only costs the mask and the inverse transform (or the encoding). The transforms run band by band, so that
+    progress is reported and cancellation checked as in compress_image.
+    :param cache: CompressionCache to use
+    :param input_file: path to the input image
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param output_path: path to save the compressed image to
+    :param fmt: "bmp" or "dct2", see dct2_compress
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :param progress: optional callable receiving (blocks done, total blocks) after each band, the blocks of the
+    forward and inverse transforms both counting when both run
+    :param cancel: optional cancellation token checked before each band, see compression_tool.main.compress_image
+    :param workers: number of threads the bands are spread over
+    :return: abs path to the saved image
+    """
+    output_abs_path = os.path.abspath(output_path)
+    key = cache.image_key(input_file)
+    cached = cache.get_result(key, F, d, fmt, padding)
+
+    if cached is not None:
+        if not (os.path.exists(output_abs_path) and filecmp.cmp(cached, output_abs_path, shallow=False)):
+            shutil.copyfile(cached, output_abs_path)
+        print(f"Image saved at: {output_abs_path} (cached)")
+        return output_abs_path
+
+    with Image.open(input_file) as img:
+        # Only reads the header
+        w, h = img.size
+    size = None if padding == "crop" else (h, w)
+
+    check_cancelled(cancel)
+    coeffs = cache.get_coefficients(key, F, padding)
+    if coeffs is None:
+        img_array = np.array(Image.open(input_file))
+        if img_array.ndim == 2:
+            img_array = img_array[:, :, np.newaxis]
+        img_array = pad_image(img_array, F, padding)
+        c, h_blocks, w_blocks = img_array.shape[2], img_array.shape[0] // F, img_array.shape[1] // F
+    else:
+        c, h_blocks, w_blocks = coeffs.shape[:3]
+
+    # Passes over the blocks: the forward transform on a coefficient miss, the inverse one for BMP results
+    passes = (coeffs is None) + (fmt != "dct2")
+    total_blocks = max(passes, 1) * c * h_blocks * w_blocks
+    done_blocks = 0
+    progress_lock = threading.Lock()
+
+    def report(band):
+        nonlocal done_blocks
+        with progress_lock:
+            done_blocks += (band[1] - band[0]) * w_blocks * c
+            if progress is not None:
+                progress(done_blocks, total_blocks)
+
+    def run_bands(work):
+        def run(band):
+            check_cancelled(cancel)
+            work(*band)
+            report(band)
+
+        bands = band_ranges(h_blocks, PROGRESS_BANDS)
+        if workers <= 1:
+            for band in bands:
+                run(band)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run, bands))
+
+    if coeffs is None:
+        coeffs = np.empty((c, h_blocks, w_blocks, F, F))
+
+        def forward(top, bottom):
+            coeffs[:, top:bottom] = forward_blocks(img_array[top * F:bottom * F], F)
+
+        run_bands(forward)
+        cache.put_coefficients(key, F, coeffs, padding)
+
+    if fmt == "dct2":
+        check_cancelled(cancel)
+        with open(output_abs_path, "wb") as f:
+            f.write(encode_coefficients(coeffs, d, size=size))
+        if passes == 0:
+            report((0, h_blocks))
+    else:
+        compressed_img = np.empty((h_blocks * F, w_blocks * F, c), dtype=np.uint8)
+
+        def inverse(top, bottom):
+            compressed_img[top * F:bottom * F] = inverse_blocks(coeffs[:, top:bottom], d)
+
+        run_bands(inverse)
+        compressed_img = compressed_img[:h, :w]
+        Image.fromarray(compressed_img[:, :, 0] if compressed_img.shape[2] == 1 else compressed_img).save(
+            output_abs_path)
+    print(f"Image saved at: {output_abs_path}")
+
+    cache.put_result(key, F, d, fmt, output_abs_path, padding)
+    return output_abs_path
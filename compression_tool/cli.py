@@ -0,0 +1,138 @@
+import argparse
+import sys
+
+from compression_tool import instrument
+from compression_tool.backends import BACKENDS
+from compression_tool.blocks import PADDING_MODES, PRECISIONS
+from compression_tool.color import SUBSAMPLING
+
+
+def build_parser():
+    """
+    Function to build the command line parser. Only the light modules holding the choices are imported for it, so
+    that --help and argument errors do not pay for PIL, scipy or Tk.
+    :return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m compression_tool",
+        description="Compress a BMP image with dct2. Missing arguments are asked for: the input through a file dialog, "
+                    "F and d on the terminal. Give all three to run without any interaction.")
+    parser.add_argument("input", nargs="?", help="input BMP image")
+    parser.add_argument("-o", "--output", default="output/", help="output folder")
+    parser.add_argument("-F", type=int, help="block dimension")
+    parser.add_argument("-d", type=int, help="frequency cutoff threshold, 0 <= d < 2F - 1")
+    adaptive = parser.add_mutually_exclusive_group()
+    adaptive.add_argument("--psnr", type=float, metavar="DB",
+                          help="choose a d for every block, keeping as few coefficients as possible for this PSNR")
+    adaptive.add_argument("--max-bytes", type=int, metavar="N",
+                          help="choose a d for every block, for the best quality within N bytes of coefficients")
+    parser.add_argument("--workers", type=int, default=1, help="number of threads used by the compression")
+    parser.add_argument("--format", choices=["bmp", "dct2"], default="bmp",
+                        help="save the reconstructed BMP or the compressed .dct2 container")
+    parser.add_argument("--stream", action="store_true",
+                        help="compress through memory-mapped files, for BMP images larger than RAM")
+    parser.add_argument("--backend", choices=sorted(BACKENDS) + ["auto"], default="scipy",
+                        help="dct2 backend, auto picks the fastest one for F")
+    parser.add_argument("--precision", choices=sorted(PRECISIONS), default="float64",
+                        help="arithmetic of the transform, int is a fixed-point DCT")
+    parser.add_argument("--padding", choices=sorted(PADDING_MODES), default="crop",
+                        help="drop the pixels that do not fill a whole block, or pad the partial blocks")
+    parser.add_argument("--cache-dir", help="folder of the result cache, results are not cached when missing")
+    parser.add_argument("--ycbcr", choices=sorted(SUBSAMPLING), metavar="SUBSAMPLING",
+                        help="compress color images in YCbCr with 4:2:0, 4:2:2 or 4:4:4 chroma subsampling")
+    parser.add_argument("--d-chroma", type=int, help="frequency cutoff of the chroma planes with --ycbcr, d by default")
+    parser.add_argument("--metrics", action="store_true", help="print the MSE, PSNR, SSIM and kept coefficient ratio")
+    parser.add_argument("--show", action="store_true",
+                        help="open the original and compressed images at the end, the default when the input is "
+                             "picked from the file dialog")
+    parser.add_argument("--profile", nargs="?", const="stdout", metavar="SINK",
+                        help="report timings, counters and peak memory to stdout, jsonl:PATH or csv:FOLDER "
+                             f"(also enabled by the {instrument.ENV_VAR} environment variable)")
+    parser.add_argument("--gui", action="store_true", help="start the graphical interface instead")
+    return parser
+
+
+def check_block_args(parser, F, d=None, d_chroma=None):
+    """
+    Function to stop with a usage error when F or the cutoffs are out of range.
+    :param parser: parser reporting the error
+    :param F: block dimension, at least 1
+    :param d: frequency cutoff threshold, 0 <= d < 2F - 1, not checked if None
+    :param d_chroma: chroma frequency cutoff threshold, same range as d, not checked if None
+    """
+    if F < 1:
+        parser.error(f"F must be at least 1, got {F}")
+    for name, value in (("d", d), ("--d-chroma", d_chroma)):
+        if value is not None and not 0 <= value < 2 * F - 1:
+            parser.error(f"{name} must satisfy 0 <= {name} < 2F - 1 = {2 * F - 1}, got {value}")
+
+
+def main(argv=None):
+    """
+    Main function of the compression command line.
+    :param argv: command line arguments, sys.argv by default
+    :return: exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.F is not None:
+        check_block_args(parser, args.F, args.d, args.d_chroma)
+
+    if args.gui:
+        from compression_tool.gui import main as gui_main
+        gui_main()
+        return 0
+
+    # The compression engine, with PIL, is only loaded once the arguments are valid
+    from compression_tool.main import dct2_compress, select_image
+
+    input_file = args.input
+    interactive = input_file is None
+    if interactive:
+        print("Select a .BMP image")
+        input_file = select_image()
+        if not input_file:
+            print("No image selected.")
+            return 1
+
+    F = args.F if args.F is not None else int(input("Insert block dimension F: "))
+    adaptive = args.psnr is not None or args.max_bytes is not None
+    check_block_args(parser, F)
+    d = args.d
+    if d is None and not adaptive:
+        d = int(input(f"Insert frequency cutoff threshold d (0 <= d < {2 * F - 1}): "))
+    check_block_args(parser, F, d, args.d_chroma)
+
+    if args.profile:
+        try:
+            instrument.enable(instrument.sink_from_spec(args.profile))
+        except ValueError as e:
+            parser.error(str(e))
+
+    cache = None
+    if args.cache_dir:
+        from compression_tool.cache import CompressionCache
+        cache = CompressionCache(args.cache_dir)
+
+    try:
+        result = dct2_compress(input_file, F, d, args.output, show_img=args.show or interactive,
+                               workers=args.workers, stream=args.stream, fmt=args.format, cache=cache,
+                               backend=args.backend, precision=args.precision, padding=args.padding,
+                               return_metrics=args.metrics, subsampling=args.ycbcr, d_chroma=args.d_chroma,
+                               target_psnr=args.psnr, max_bytes=args.max_bytes)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.metrics:
+        quality = result[1]
+        print(f"MSE: {quality['mse']:.3f}, PSNR: {quality['psnr']:.2f} dB, SSIM: {quality['ssim']:.4f}, "
+              f"kept coefficients: {quality['kept_ratio']:.1%}")
+
+    if args.profile:
+        instrument.disable()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import argparse
+import functools
+import os
+import struct
+import zlib
+import numpy as np
+
+from PIL import Image
+
+from compression_tool import instrument
+from compression_tool.blocks import PADDING_MODES, blocks_to_image, forward_blocks, inverse_blocks
+from compression_tool.transform import get_plan
+
+# File signature and format version of the compressed container. Version 2 stores the size of the image before
+# padding, version 1 files always cover whole blocks and decode the same way
+MAGIC = b"DCT2"
+VERSION = 2
+
+# Header: magic, version, height, width, channels, F, d, quantization step, coefficient size in bytes
+HEADER = struct.Struct("<4sBIIBHHfB")
+
+# Default quantization step of the kept coefficients
+QUANT_STEP = 1.0
+
+# zlib compression level of the coefficient payload
+ZLIB_LEVEL = 6
+
+
+@functools.lru_cache(maxsize=64)
+def zigzag_indices(F, d):
+    """
+    Function to list the kept coefficients of a block (k + l < d) in JPEG zigzag order.
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :return: (k, l) index arrays
+    """
+    k, l = np.nonzero(np.add.outer(np.arange(F), np.arange(F)) < d)
+    diagonal = k + l
+    order = np.lexsort((np.where(diagonal % 2 == 0, -k, k), diagonal))
+    return k[order], l[order]
+
+
+@functools.lru_cache(maxsize=64)
+def synthesis_basis(F, d):
+    """
+    Function to build the basis images of the kept coefficients, so that a block is rebuilt from its r kept
+    coefficients with a single r×F² product.
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :return: (r, F * F) array, one flattened basis image per coefficient in zigzag order
+    """
+    matrix = get_plan(F).matrix
+    k, l = zigzag_indices(F, d)
+    return (matrix[k][:, :, None] * matrix[l][:, None, :]).reshape(len(k), F * F)
+
+
+def _narrowest_int(values):
+    """
+    Function to pick the smallest little-endian signed integer type that holds all the values.
+    :param values: integer valued array
+    :return: numpy integer dtype
+    """
+    bound = np.abs(values).max(initial=0)
+    for size in (1, 2, 4):
+        dtype = np.dtype(f"<i{size}")
+        if bound <= np.iinfo(dtype).max:
+            return dtype
+    return np.dtype("<i8")
+
+
+def encode(img_array, F, d, step=QUANT_STEP, padding="crop"):
+    """
+    Function to encode an image into the compressed container format. Only the coefficients with k + l < d are
+    stored: quantized, grouped by frequency in zigzag order across all the blocks so that runs of zeros and similar
+    magnitudes sit next to each other, then deflated with zlib.
+    :param img_array: image to be compressed, in (h, w) or (h, w, c) array format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param step: quantization step of the coefficients
+    :param padding: handling of the partial blocks, see compression_tool.blocks.pad_image. When padded, the
+    decoded image has the size of the input
+    :return: encoded bytes
+    """
+    if img_array.ndim == 2:
+        img_array = img_array[:, :, np.newaxis]
+
+    size = None if padding == "crop" else img_array.shape[:2]
+    return encode_coefficients(forward_blocks(img_array, F, padding), d, step, size)
+
+
+def encode_coefficients(coeffs, d, step=QUANT_STEP, size=None):
+    """
+    Function to encode already computed block coefficients into the compressed container format.
+    :param coeffs: coefficients of shape (c, h_blocks, w_blocks, F, F)
+    :param d: frequency cutoff threshold
+    :param step: quantization step of the coefficients
+    :param size: (h, w) the decoded image is cropped to, for coefficients of a padded image; whole blocks if None
+    :return: encoded bytes
+    """
+    c, h_blocks, w_blocks, F, _ = coeffs.shape
+    h, w = size or (h_blocks * F, w_blocks * F)
+
+    k, l = zigzag_indices(F, d)
+    planes = np.rint(np.moveaxis(coeffs[..., k, l], -1, 0) / step)
+
+    dtype = _narrowest_int(planes)
+    payload = zlib.compress(planes.astype(dtype).tobytes(), ZLIB_LEVEL)
+    header = HEADER.pack(MAGIC, VERSION, h, w, c, F, d, step, dtype.itemsize)
+
+    return header + payload
+
+
+def decode(data):
+    """
+    Function to decode an image from the compressed container format. When few coefficients are kept, all the blocks
+    are synthesized at once from their basis images with one matrix product, otherwise the coefficients are
+    scattered back into full blocks for the batched inverse dct2.
+    :param data: encoded bytes
+    :return: decoded image, in (h, w) uint8 array format for one channel and (h, w, c) otherwise
+    """
+    magic, version, h, w, c, F, d, step, itemsize = HEADER.unpack_from(data)
+    if magic != MAGIC or not 1 <= version <= VERSION:
+        raise ValueError("Unsupported compressed image format.")
+
+    k, l = zigzag_indices(F, d)
+    h_blocks = -(-h // F)
+    w_blocks = -(-w // F)
+
+    raw = zlib.decompress(data[HEADER.size:])
+    planes = np.frombuffer(raw, dtype=f"<i{itemsize}").reshape(len(k), c, h_blocks, w_blocks)
+
+    if len(k) <= 4 * F:
+        # Explicit dimensions, since no coefficient is kept at all when d = 0
+        restored = (planes.reshape(len(k), c * h_blocks * w_blocks).T * step) @ synthesis_basis(F, d)
+        np.round(restored, out=restored)
+        np.clip(restored, 0, 255, out=restored)
+        compressed_img = blocks_to_image(restored.reshape(c, h_blocks, w_blocks, F, F)).astype(np.uint8)
+    else:
+        coeffs = np.zeros((c, h_blocks, w_blocks, F, F))
+        coeffs[..., k, l] = np.moveaxis(planes, 0, -1)
+        coeffs *= step
+        compressed_img = inverse_blocks(coeffs, d)
+
+    compressed_img = compressed_img[:h, :w]
+    return compressed_img[:, :, 0] if c == 1 else compressed_img
+
+
+def save_encoded_image(img_array, F, d, out_path, step=QUANT_STEP, padding="crop"):
+    """
+    Function to encode an image and save it in the compressed container format.
+    :param img_array: image to be compressed, in array format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param out_path: output path
+    :param step: quantization step of the coefficients
+    :param padding: handling of the partial blocks, see encode
+    :return: abs path to the saved file
+    """
+    with instrument.span("encode"):
+        data = encode(img_array, F, d, step, padding)
+    return save_encoded_data(data, out_path)
+
+
+def save_encoded_data(data, out_path):
+    """
+    Function to save already encoded bytes as a compressed container file.
+    :param data: encoded bytes, see encode
+    :param out_path: output path
+    :return: abs path to the saved file
+    """
+    output_abs_path = os.path.abspath(out_path)
+
+    with open(output_abs_path, "wb") as f:
+        f.write(data)
+    instrument.count("bytes_written", len(data))
+    print(f"Image saved at: {output_abs_path}")
+
+    return output_abs_path
+
+
+def load_encoded_image(path):
+    """
+    Function to load and decode a file in the compressed container format.
+    :param path: path to the compressed file
+    :return: decoded image in array format
+    """
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode images to, or decode them from, the .dct2 format.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser = subparsers.add_parser("encode", help="encode an image to .dct2")
+    encode_parser.add_argument("input", help="input image")
+    encode_parser.add_argument("output", help="output .dct2 file")
+    encode_parser.add_argument("-F", type=int, default=8, help="block dimension")
+    encode_parser.add_argument("-d", type=int, default=10, help="frequency cutoff threshold")
+    encode_parser.add_argument("--step", type=float, default=QUANT_STEP, help="coefficient quantization step")
+    encode_parser.add_argument("--padding", choices=sorted(PADDING_MODES), default="crop",
+                               help="drop the pixels that do not fill a whole block, or pad the partial blocks")
+
+    decode_parser = subparsers.add_parser("decode", help="decode a .dct2 file to an image")
+    decode_parser.add_argument("input", help="input .dct2 file")
+    decode_parser.add_argument("output", help="output image")
+
+    args = parser.parse_args()
+    if args.command == "encode":
+        save_encoded_image(np.array(Image.open(args.input)), args.F, args.d, args.output, args.step, args.padding)
+    else:
+        Image.fromarray(load_encoded_image(args.input)).save(args.output)
+        print(f"Image saved at: {os.path.abspath(args.output)}")
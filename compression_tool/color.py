@@ -0,0 +1,98 @@
+import numpy as np
+
+from compression_tool.metrics import kept_ratio
+
+# Full range BT.601 conversion, as in JFIF: YCbCr = RGB @ RGB_TO_YCBCR.T + YCBCR_OFFSET
+RGB_TO_YCBCR = np.array([
+    [0.299, 0.587, 0.114],
+    [-0.168736, -0.331264, 0.5],
+    [0.5, -0.418688, -0.081312],
+])
+YCBCR_TO_RGB = np.linalg.inv(RGB_TO_YCBCR)
+YCBCR_OFFSET = np.array([0.0, 128.0, 128.0])
+
+# Chroma subsampling schemes and their (vertical, horizontal) factors
+SUBSAMPLING = {"4:4:4": (1, 1), "4:2:2": (1, 2), "4:2:0": (2, 2)}
+
+
+def split_ycbcr(img_array, subsampling="4:2:0"):
+    """
+    Function to convert an RGB image to a full resolution luma plane and subsampled chroma planes. The conversion is
+    linear, so the chroma is converted from the RGB averages of each subsampling group: only the luma is computed
+    at full resolution.
+    :param img_array: RGB image in (h, w, 3) array format
+    :param subsampling: key of SUBSAMPLING
+    :return: (luma in (h, w, 1) uint8 array format, chroma in (ceil(h / fy), ceil(w / fx), 2) uint8 array format)
+    """
+    fy, fx = SUBSAMPLING[subsampling]
+    matrix = RGB_TO_YCBCR.astype(np.float32)
+
+    luma = _to_uint8(img_array @ matrix[:1].T)
+
+    chroma = _pool(img_array, fy, fx).astype(np.float32) @ (matrix[1:].T / (fy * fx))
+    chroma += YCBCR_OFFSET[1:].astype(np.float32)
+    return luma, _to_uint8(chroma)
+
+
+def merge_ycbcr(luma, chroma, subsampling="4:2:0"):
+    """
+    Function to convert a luma plane and subsampled chroma planes back to RGB. The chroma contribution to R, G and B
+    is computed at the chroma resolution, then upsampled and added to the luma.
+    :param luma: luma in (h, w, 1) array format
+    :param chroma: chroma in (h_chroma, w_chroma, 2) array format
+    :param subsampling: key of SUBSAMPLING
+    :return: RGB image in (h, w, 3) uint8 array format; missing chroma on the edges repeats the last sample
+    """
+    fy, fx = SUBSAMPLING[subsampling]
+    h, w, _ = luma.shape
+
+    offset = chroma.astype(np.float32) - YCBCR_OFFSET[1:].astype(np.float32)
+    contribution = np.rint(offset @ YCBCR_TO_RGB[:, 1:].T.astype(np.float32)).astype(np.int16)
+
+    rgb = contribution.repeat(fy, axis=0).repeat(fx, axis=1)
+    if rgb.shape[0] < h or rgb.shape[1] < w:
+        rgb = np.pad(rgb, ((0, max(h - rgb.shape[0], 0)), (0, max(w - rgb.shape[1], 0)), (0, 0)), mode="edge")
+    rgb = rgb[:h, :w]
+
+    rgb += luma
+    np.clip(rgb, 0, 255, out=rgb)
+    return rgb.astype(np.uint8)
+
+
+def chroma_kept_ratio(F, d, d_chroma, subsampling):
+    """
+    Function to get the fraction of the coefficients of a full RGB image kept by the YCbCr stage.
+    :param F: block dimension
+    :param d: luma frequency cutoff threshold
+    :param d_chroma: chroma frequency cutoff threshold
+    :param subsampling: key of SUBSAMPLING
+    :return: kept coefficients over 3 planes of full resolution coefficients
+    """
+    fy, fx = SUBSAMPLING[subsampling]
+    return (kept_ratio(F, d) + 2 * kept_ratio(F, d_chroma) / (fy * fx)) / 3
+
+
+def _pool(img_array, fy, fx):
+    """
+    Function to sum each fy×fx group of pixels, the partial groups on the edges repeating their last pixels.
+    :return: uint16 array of shape (ceil(h / fy), ceil(w / fx), c)
+    """
+    h, w, _ = img_array.shape
+    if (fy, fx) == (1, 1):
+        return img_array
+
+    padded = np.pad(img_array, ((0, -h % fy), (0, -w % fx), (0, 0)), mode="edge")
+    sums = np.zeros((padded.shape[0] // fy, padded.shape[1] // fx, padded.shape[2]), dtype=np.uint16)
+    for i in range(fy):
+        for j in range(fx):
+            sums += padded[i::fy, j::fx]
+    return sums
+
+
+def _to_uint8(values):
+    """
+    Function to round and clip float values to pixels, in place.
+    """
+    values += 0.5
+    np.clip(values, 0, 255, out=values)
+    return values.astype(np.uint8)
@@ -1,9 +1,23 @@
 import os
+import queue
+import threading
+import time
 import tkinter as tk
 
 from tkinter import filedialog, messagebox
 from tkinter import ttk
-from main import dct2_compress
+from PIL import Image, ImageTk
+
+from compression_tool.blocks import CompressionCancelled
+from compression_tool.cache import CompressionCache
+from compression_tool.main import dct2_compress
+from compression_tool.preview import PreviewRenderer
+
+# Interval between two checks of the worker thread messages, in milliseconds
+POLL_INTERVAL = 50
+
+# Delay after the last slider move before the preview is refreshed, in milliseconds
+PREVIEW_DEBOUNCE = 30
 
 
 class DCT2App:
@@ -17,14 +31,26 @@ class DCT2App:
         """
         self.root = root
         self.root.title("DCT2 Image Compression Tool")
-        self.root.geometry("500x500")
+        self.root.geometry("500x880")
         self.root.configure(bg="#2e2e2e")
 
         self.file_path = tk.StringVar()
         self.output_folder = tk.StringVar(value=os.getcwd() + "\\output\\")
         self.F = tk.IntVar(value=8)
         self.d = tk.IntVar(value=10)
-        self.show_img = tk.BooleanVar(value=True)
+        self.show_img = tk.BooleanVar(value=False)
+        self.cache = CompressionCache()
+
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
+        self.compressing = False
+        self.loading = 0
+        self.polling = False
+
+        self.preview = PreviewRenderer()
+        self.preview_job = None
+        self.preview_images = ()
 
         self.create_widgets()
 
@@ -98,15 +124,35 @@ class DCT2App:
 
         ttk.Label(self.root, text="Frequency cut-off (d):").pack(pady=(15, 0))
         self.d_slider = tk.Scale(self.root, from_=0, to=14, orient=tk.HORIZONTAL, variable=self.d, bg="#2e2e2e",
-                                 fg="white", troughcolor="#4caf50", highlightthickness=0)
+                                 fg="white", troughcolor="#4caf50", highlightthickness=0,
+                                 command=self.schedule_preview)
         self.d_slider.pack(padx=20, fill="x")
 
         confirm_frame = tk.Frame(self.root, bg="#2e2e2e")
         confirm_frame.pack(pady=20)
-        ttk.Button(confirm_frame, text="Confirm", command=self.submit).pack(side="left", padx=10)
+        self.confirm_button = ttk.Button(confirm_frame, text="Confirm", command=self.submit)
+        self.confirm_button.pack(side="left", padx=10)
+        self.cancel_button = ttk.Button(confirm_frame, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=10)
         ttk.Checkbutton(confirm_frame, text="Show image at end", variable=self.show_img, style="TCheckbutton").pack(
             side="left")
 
+        self.progress_bar = ttk.Progressbar(self.root, orient=tk.HORIZONTAL, mode="determinate", maximum=1.0)
+        self.progress_bar.pack(padx=20, fill="x")
+
+        self.result_label = ttk.Label(self.root, text="")
+        self.result_label.pack(pady=10)
+
+        preview_frame = tk.Frame(self.root, bg="#2e2e2e")
+        preview_frame.pack(pady=5)
+        self.original_preview = tk.Label(preview_frame, bg="#424242")
+        self.original_preview.pack(side="left", padx=5)
+        self.compressed_preview = tk.Label(preview_frame, bg="#424242")
+        self.compressed_preview.pack(side="left", padx=5)
+
+        self.preview_label = ttk.Label(self.root, text="")
+        self.preview_label.pack()
+
     def update_d_slider(self, val):
         """
         Method to update the d slider based on the value of F.
@@ -117,6 +163,42 @@ class DCT2App:
         self.d_slider.config(to=max_d)
         if self.d.get() > max_d:
             self.d.set(max_d)
+        self.schedule_preview()
+
+    def schedule_preview(self, _=None):
+        """
+        Method to refresh the preview once the sliders stop moving for PREVIEW_DEBOUNCE milliseconds.
+        """
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(PREVIEW_DEBOUNCE, self.update_preview)
+
+    def update_preview(self):
+        """
+        Method to render the side by side preview of the original and compressed tile.
+        """
+        self.preview_job = None
+        if self.preview.tile is None:
+            return
+
+        start = time.perf_counter()
+        original, compressed = self.preview.render(self.F.get(), self.d.get())
+        elapsed = time.perf_counter() - start
+
+        if compressed.size == 0:
+            self.original_preview.config(image="")
+            self.compressed_preview.config(image="")
+            self.preview_label.config(text="Blocks larger than the preview")
+            return
+
+        # Tk only draws images that are still referenced from Python
+        self.preview_images = (
+            ImageTk.PhotoImage(Image.fromarray(original)),
+            ImageTk.PhotoImage(Image.fromarray(compressed))
+        )
+        self.original_preview.config(image=self.preview_images[0])
+        self.compressed_preview.config(image=self.preview_images[1])
+        self.preview_label.config(text=f"Original / compressed preview ({elapsed * 1000:.0f} ms)")
 
     def browse_file(self):
         """
@@ -126,6 +208,22 @@ class DCT2App:
         if filename:
             self.file_path.set(filename)
             self.file_label.config(text=os.path.basename(filename))
+            self.preview_label.config(text="Loading preview...")
+
+            # Decoding a large image takes a while, so the tile is read on a worker thread like the compression
+            self.loading += 1
+            threading.Thread(target=self.load_preview, args=(filename,), daemon=True).start()
+            self.start_polling()
+
+    def load_preview(self, file_path):
+        """
+        Method run on a worker thread, reading the preview tile of an image and posting it to the message queue.
+        :param file_path: path to the image
+        """
+        try:
+            self.messages.put(("tile", (file_path, self.preview.read_tile(file_path))))
+        except Exception as e:
+            self.messages.put(("tile_error", (file_path, str(e))))
 
     def browse_output_folder(self):
         """
@@ -137,7 +235,7 @@ class DCT2App:
 
     def submit(self):
         """
-        Method to validate inputs and call the dct2_compress function with the provided parameters.
+        Method to validate inputs and run the dct2_compress function with the provided parameters on a worker thread.
         """
         try:
             f_value = self.F.get()
@@ -155,13 +253,124 @@ class DCT2App:
             if not (0 <= d_value <= 2 * f_value - 2):
                 raise ValueError(f"d must be between 0 and {2 * f_value - 2}.")
 
-            dct2_compress(file_path, f_value, d_value, output_folder, show_img)
-
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
 
+        self.cancel_event.clear()
+        self.progress_bar["value"] = 0
+        self.result_label.config(text="Compressing...")
+        self.confirm_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
 
-if __name__ == "__main__":
+        self.compressing = True
+        self.worker = threading.Thread(
+            target=self.run_compression,
+            args=(file_path, f_value, d_value, output_folder, show_img),
+            daemon=True
+        )
+        self.worker.start()
+        self.start_polling()
+
+    def run_compression(self, file_path, f_value, d_value, output_folder, show_img):
+        """
+        Method run on the worker thread. It only talks to the Tk main thread through the message queue.
+        :param file_path: path to the input image
+        :param f_value: block dimension
+        :param d_value: frequency cutoff threshold
+        :param output_folder: folder to save the compressed image to
+        :param show_img: to show an image comparison at the end
+        """
+        try:
+            with Image.open(file_path) as img:
+                width, height = img.size
+
+            start = time.perf_counter()
+            dct2_compress(
+                file_path, f_value, d_value, output_folder, show_img,
+                cache=self.cache,
+                progress=lambda done, total: self.messages.put(("progress", done / total if total else 1.0)),
+                cancel=self.cancel_event
+            )
+            elapsed = time.perf_counter() - start
+
+            self.messages.put(("done", (elapsed, width * height / 1e6 / elapsed)))
+        except CompressionCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", str(e)))
+
+    def start_polling(self):
+        """
+        Method to start polling the worker messages, unless it is already running.
+        """
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_INTERVAL, self.poll_messages)
+
+    def poll_messages(self):
+        """
+        Method to apply the messages of the worker threads to the widgets, polling again until the compression and
+        the preview loads are done.
+        """
+        finished = False
+        while not self.messages.empty():
+            kind, value = self.messages.get_nowait()
+            if kind == "progress":
+                self.progress_bar["value"] = value
+            elif kind == "done":
+                elapsed, throughput = value
+                self.progress_bar["value"] = 1.0
+                self.result_label.config(text=f"Done in {elapsed:.2f} s ({throughput:.1f} MP/s)")
+                finished = True
+            elif kind == "cancelled":
+                self.result_label.config(text="Compression cancelled.")
+                finished = True
+            elif kind == "error":
+                self.result_label.config(text="")
+                messagebox.showerror("Error", value)
+                finished = True
+            elif kind in ("tile", "tile_error"):
+                self.loading -= 1
+                file_path, result = value
+                # A tile of an image that is no longer selected is dropped
+                if file_path != self.file_path.get():
+                    continue
+                if kind == "tile":
+                    self.preview.set_tile(result)
+                    self.schedule_preview()
+                else:
+                    self.preview.set_tile(None)
+                    self.original_preview.config(image="")
+                    self.compressed_preview.config(image="")
+                    self.preview_label.config(text=f"No preview: {result}")
+
+        if finished:
+            self.compressing = False
+            self.confirm_button.config(state="normal")
+            self.cancel_button.config(state="disabled")
+
+        if self.compressing or self.loading:
+            self.root.after(POLL_INTERVAL, self.poll_messages)
+        else:
+            self.polling = False
+
+    def cancel(self):
+        """
+        Method to ask the running compression to stop at the next band.
+        """
+        self.cancel_event.set()
+        self.result_label.config(text="Cancelling...")
+
+
+def main():
+    """
+    Main function to start the application.
+    """
     root = tk.Tk()
-    app = DCT2App(root)
+    DCT2App(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+import tracemalloc
+import warnings
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Environment variable turning the instrumentation on, see sink_from_spec for its values
+ENV_VAR = "DCT2_PROFILE"
+
+# Columns of the summary rows written by RowSink and CSVSink
+ROW_FIELDS = ["kind", "name", "calls", "total", "max", "value"]
+
+# Shared no-op span returned while the instrumentation is off
+_NO_SPAN = nullcontext()
+
+# Active profiler and the sink it reports to, None while the instrumentation is off
+_profiler = None
+_sink = None
+
+
+class Profiler:
+    """
+    Class to collect timing spans, counters and the peak traced memory of the compression. It is thread safe, so
+    the bands compressed on a thread pool can all report to it.
+    """
+    def __init__(self, trace_memory=True):
+        """
+        Profiler constructor
+        :param trace_memory: to record the peak memory allocated through tracemalloc
+        """
+        self.events = []
+        self.spans = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._own_tracing = trace_memory and not tracemalloc.is_tracing()
+
+        if self._own_tracing:
+            tracemalloc.start()
+        self._trace_memory = trace_memory
+
+    @contextmanager
+    def span(self, name):
+        """
+        Method to time a block of code.
+        :param name: span name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.events.append({"span": name, "thread": threading.get_ident(), "start": start - self._start,
+                                    "duration": end - start})
+                stats = self.spans.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+                stats["calls"] += 1
+                stats["total"] += end - start
+                stats["max"] = max(stats["max"], end - start)
+
+    def count(self, name, n=1):
+        """
+        Method to increase a counter.
+        :param name: counter name
+        :param n: amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        Method to summarize what was collected.
+        :return: dict with the span statistics, the counters, the peak traced memory in bytes and the wall time
+        """
+        with self._lock:
+            summary = {
+                "wall_time": time.perf_counter() - self._start,
+                "spans": {name: dict(stats) for name, stats in self.spans.items()},
+                "counters": dict(self.counters),
+                "peak_memory": tracemalloc.get_traced_memory()[1] if self._trace_memory else None,
+            }
+        return summary
+
+    def close(self):
+        """
+        Method to stop the memory tracing started by the profiler.
+        """
+        if self._own_tracing:
+            tracemalloc.stop()
+
+
+class StdoutSink:
+    """
+    Sink printing a summary table.
+    """
+    def emit(self, events, summary):
+        """
+        Method to report a profile.
+        :param events: list of span events, in end order
+        :param summary: summary returned by Profiler.summary
+        """
+        print(f"Profile ({summary['wall_time']:.3f} s wall time):")
+        print(f"  {'span':<32}{'calls':>8}{'total [s]':>12}{'mean [ms]':>12}{'max [ms]':>12}")
+        for name, stats in sorted(summary["spans"].items(), key=lambda item: -item[1]["total"]):
+            print(f"  {name:<32}{stats['calls']:>8}{stats['total']:>12.4f}"
+                  f"{1000 * stats['total'] / stats['calls']:>12.3f}{1000 * stats['max']:>12.3f}")
+        for name, value in sorted(summary["counters"].items()):
+            print(f"  {name:<32}{value:>8}")
+        if summary["peak_memory"] is not None:
+            print(f"  peak traced memory: {summary['peak_memory'] / 1024 ** 2:.1f} MB")
+
+
+class JSONLinesSink:
+    """
+    Sink appending every span event, then the summary, as JSON lines to a file.
+    """
+    def __init__(self, path):
+        """
+        JSONLinesSink constructor
+        :param path: path to the .jsonl file
+        """
+        self.path = path
+
+    def emit(self, events, summary):
+        """
+        Method to report a profile.
+        :param events: list of span events, in end order
+        :param summary: summary returned by Profiler.summary
+        """
+        with open(self.path, "a") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.write(json.dumps({"summary": summary}) + "\n")
+
+
+class RowSink:
+    """
+    Sink writing the summary as rows to any logger with a write_row(dict) method, like the CSVLogger of the
+    benchmarks. Every row has the same columns: kind (span, counter or memory), name, calls, total, max and value.
+    """
+    def __init__(self, logger):
+        """
+        RowSink constructor
+        :param logger: object with a write_row(dict) method
+        """
+        self.logger = logger
+
+    def emit(self, events, summary):
+        """
+        Method to report a profile.
+        :param events: list of span events, in end order
+        :param summary: summary returned by Profiler.summary
+        """
+        for row in summary_rows(summary):
+            self.logger.write_row(row)
+
+        # Buffered loggers like CSVLogger only write their rows on close
+        close = getattr(self.logger, "close", None)
+        if close is not None:
+            close()
+
+
+class CSVSink:
+    """
+    Sink writing the summary rows, see RowSink, to a new profile_<timestamp>.csv file in a folder.
+    """
+    def __init__(self, folder="."):
+        """
+        CSVSink constructor
+        :param folder: folder of the .csv files, created if missing
+        """
+        self.folder = folder
+
+    def emit(self, events, summary):
+        """
+        Method to report a profile.
+        :param events: list of span events, in end order
+        :param summary: summary returned by Profiler.summary
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"profile_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=ROW_FIELDS)
+            writer.writeheader()
+            writer.writerows(summary_rows(summary))
+
+
+def summary_rows(summary):
+    """
+    Function to flatten a profile summary into rows of the ROW_FIELDS columns, the unused ones left empty.
+    :param summary: summary returned by Profiler.summary
+    :return: list of dicts, one per span, counter and the peak memory
+    """
+    empty = {"calls": "", "total": "", "max": "", "value": ""}
+    rows = [{"kind": "span", "name": name, **empty, **stats} for name, stats in summary["spans"].items()]
+    rows += [{"kind": "counter", "name": name, **empty, "value": value}
+             for name, value in summary["counters"].items()]
+    if summary["peak_memory"] is not None:
+        rows.append({"kind": "memory", "name": "peak_memory", **empty, "value": summary["peak_memory"]})
+    return rows
+
+
+def sink_from_spec(spec):
+    """
+    Function to build a sink from its text description, as given to the DCT2_PROFILE variable or the --profile flag.
+    :param spec: "stdout" (or "1"), "jsonl:PATH" or "csv:FOLDER"
+    :return: sink object
+    """
+    kind, _, target = spec.partition(":")
+    if kind in ("1", "stdout"):
+        return StdoutSink()
+    if kind == "jsonl" and target:
+        return JSONLinesSink(target)
+    if kind == "csv":
+        return CSVSink(target or ".")
+    raise ValueError(f"Unknown profile sink: {spec}")
+
+
+def enable(sink=None, trace_memory=True):
+    """
+    Function to turn the instrumentation on. A profile already running is reported first.
+    :param sink: object with an emit(events, summary) method, StdoutSink by default
+    :param trace_memory: to record the peak memory through tracemalloc, which slows allocations down
+    :return: the new Profiler
+    """
+    global _profiler, _sink
+    disable()
+    _sink = sink or StdoutSink()
+    _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def disable():
+    """
+    Function to turn the instrumentation off and report what was collected to the sink.
+    :return: summary of the profile, None if the instrumentation was off
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+
+    summary = profiler.summary()
+    profiler.close()
+    _sink.emit(profiler.events, summary)
+    return summary
+
+
+@contextmanager
+def profiling(sink=None, trace_memory=True):
+    """
+    Context manager to profile a block of code.
+    :param sink: see enable
+    :param trace_memory: see enable
+    :return: the Profiler, whose summary is reported to the sink on exit
+    """
+    profiler = enable(sink, trace_memory)
+    try:
+        yield profiler
+    finally:
+        disable()
+
+
+def span(name):
+    """
+    Function to time a block of code with `with span(name):`. It returns a shared no-op context while the
+    instrumentation is off.
+    :param name: span name
+    :return: context manager
+    """
+    return _NO_SPAN if _profiler is None else _profiler.span(name)
+
+
+def count(name, n=1):
+    """
+    Function to increase a counter, a no-op while the instrumentation is off.
+    :param name: counter name
+    :param n: amount to add
+    """
+    if _profiler is not None:
+        _profiler.count(name, n)
+
+
+if os.environ.get(ENV_VAR):
+    # A typo in the variable must not break every import of the package
+    try:
+        _env_sink = sink_from_spec(os.environ[ENV_VAR])
+    except ValueError as e:
+        warnings.warn(f"{e}, profiling left off. Use stdout, jsonl:PATH or csv:FOLDER in {ENV_VAR}.", RuntimeWarning)
+    else:
+        enable(_env_sink)
+        atexit.register(disable)
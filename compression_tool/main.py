@@ -1,17 +1,33 @@
 import os
 import platform
 import subprocess
+import sys
+import threading
 import numpy as np
 
-from scipy.fft import dctn, idctn
-from tkinter import filedialog, Tk
+from concurrent.futures import ThreadPoolExecutor
+
 from PIL import Image
 
+from compression_tool import instrument
+from compression_tool.adaptive import compress_image_adaptive, kept_coefficients
+from compression_tool.blocks import PROGRESS_BANDS, band_ranges, check_cancelled, compress_region, forward_region, \
+    pad_image
+from compression_tool.cache import cached_compress
+from compression_tool.codec import encode_coefficients, load_encoded_image, save_encoded_data
+from compression_tool.color import SUBSAMPLING, chroma_kept_ratio, merge_ycbcr, split_ycbcr
+from compression_tool.metrics import QualityMetrics, image_metrics
+from compression_tool.streaming import stream_compress
+
+# Number of bands each worker gets, so that uneven bands still keep all the workers busy
+BANDS_PER_WORKER = 4
+
 
 def dct2(block):
     """
     Wrapper of scipy dctn function.
     """
+    from scipy.fft import dctn
     return dctn(block, type=2, norm='ortho')
 
 
@@ -19,6 +35,7 @@ def idct2(block):
     """
     Wrapper of scipy idctn function.
     """
+    from scipy.fft import idctn
     return idctn(block, type=2, norm='ortho')
 
 
@@ -27,14 +44,182 @@ def select_image():
     Function to select an image.
     :return: path to the selected image
     """
+    # Tk is only needed on this interactive path, so scripted calls never load it
+    from tkinter import filedialog, Tk
     root = Tk()
     root.withdraw()
     return filedialog.askopenfilename(filetypes=[("Bitmap files", "*.bmp")])
 
 
-def compress_image(img_array, F, d):
+def run_bands(h_blocks, band_blocks, work, workers=1, progress=None, cancel=None):
+    """
+    Function to run a job over the block rows of an image in horizontal bands, spread over threads.
+    :param h_blocks: number of block rows
+    :param band_blocks: number of blocks in one block row, all channels included
+    :param work: callable receiving the (first, last + 1) block rows of a band
+    :param workers: number of threads the bands are spread over
+    :param progress: optional callable receiving (blocks done, total blocks) after each band
+    :param cancel: optional cancellation token checked before each band, raises CompressionCancelled once set
+    """
+    total_blocks = h_blocks * band_blocks
+    done_blocks = 0
+    progress_lock = threading.Lock()
+
+    def run_band(band):
+        nonlocal done_blocks
+        check_cancelled(cancel)
+        work(band)
+
+        if progress is not None:
+            with progress_lock:
+                done_blocks += (band[1] - band[0]) * band_blocks
+                progress(done_blocks, total_blocks)
+
+    n_bands = workers * BANDS_PER_WORKER if workers > 1 else 1
+    if progress is not None or cancel is not None:
+        n_bands = max(n_bands, PROGRESS_BANDS)
+    bands = band_ranges(h_blocks, n_bands)
+
+    if workers <= 1:
+        for band in bands:
+            run_band(band)
+    else:
+        # scipy.fft and BLAS release the GIL, so the bands run in parallel on threads
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run_band, bands))
+
+
+def compress_image(img_array, F, d, backend="scipy", workers=1, progress=None, cancel=None, precision="float64",
+                   padding="crop", metrics=None):
+    """
+    Function to compress an image using dct2. The image is split in horizontal bands of whole blocks; all the
+    blocks of a band are transformed in a single batched call and written straight into the output image.
+    :param img_array: image to be compressed, in array format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param backend: dct2 backend name or "auto", see compression_tool.blocks.transform_blocks
+    :param workers: number of threads the bands are spread over
+    :param progress: optional callable receiving (blocks done, total blocks) after each band
+    :param cancel: optional cancellation token (e.g. threading.Event) checked before each band, raises
+    CompressionCancelled once set
+    :param precision: "float64", "float32" or "int" (fixed-point), see compression_tool.blocks.compress_region
+    :param padding: "crop" to drop the pixels that do not fill a whole block, or "edge", "symmetric" or "zero" to pad
+    the partial blocks, compress them with the others and crop the result back to the size of the input
+    :param metrics: optional compression_tool.metrics.QualityMetrics, updated with each band as soon as it is done
+    :return: compressed image in array format
+    """
+    h, w, c = img_array.shape
+    original = img_array
+    img_array = pad_image(img_array, F, padding)
+    h_blocks = img_array.shape[0] // F
+    w_blocks = img_array.shape[1] // F
+    out_w = min(w, w_blocks * F)
+
+    compressed = np.empty((h_blocks * F, w_blocks * F, c), dtype=np.uint8)
+
+    def compress_band(band):
+        top, bottom = band[0] * F, band[1] * F
+        with instrument.span("band"):
+            compress_region(img_array[top:bottom], F, d, compressed[top:bottom], backend, precision)
+
+        if metrics is not None:
+            rows = slice(top, min(bottom, h))
+            metrics.update(original[rows, :out_w], compressed[rows, :out_w])
+
+    run_bands(h_blocks, w_blocks * c, compress_band, workers, progress, cancel)
+    return compressed if padding == "crop" else compressed[:h, :w]
+
+
+def encode_image(img_array, F, d, backend="scipy", workers=1, progress=None, cancel=None, precision="float64",
+                 padding="crop"):
+    """
+    Function to encode an image in the compressed container format, computing its coefficients band by band like
+    compress_image.
+    :param img_array: image to be compressed, in (h, w, c) array format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param backend: dct2 backend name or "auto", see compression_tool.blocks.transform_blocks
+    :param workers: number of threads the bands are spread over
+    :param progress: optional callable receiving (blocks done, total blocks) after each band
+    :param cancel: optional cancellation token, see compress_image
+    :param precision: "float64", "float32" or "int" (fixed-point), see compression_tool.blocks.forward_region
+    :param padding: handling of the partial blocks, see compression_tool.codec.encode
+    :return: encoded bytes
+    """
+    h, w, c = img_array.shape
+    img_array = pad_image(img_array, F, padding)
+    h_blocks = img_array.shape[0] // F
+    w_blocks = img_array.shape[1] // F
+
+    dtype = np.float32 if precision == "float32" else np.float64
+    coeffs = np.empty((c, h_blocks, w_blocks, F, F), dtype=dtype)
+
+    def forward_band(band):
+        with instrument.span("band"):
+            forward_region(img_array[band[0] * F:band[1] * F], F, coeffs[:, band[0]:band[1]], backend, precision)
+
+    run_bands(h_blocks, w_blocks * c, forward_band, workers, progress, cancel)
+    check_cancelled(cancel)
+    with instrument.span("encode"):
+        return encode_coefficients(coeffs, d, size=None if padding == "crop" else (h, w))
+
+
+def compress_image_ycbcr(img_array, F, d, d_chroma=None, subsampling="4:2:0", progress=None, **kwargs):
+    """
+    Function to compress a color image in YCbCr: the luma is compressed at full resolution with cutoff d and the
+    subsampled chroma with cutoff d_chroma, then the chroma is upsampled and the image converted back to RGB.
+    With 4:2:0 the transforms cover half the samples of the three RGB planes. The chroma planes are always padded to
+    whole blocks, so that they cover every luma pixel kept by the padding mode.
+    :param img_array: RGB image in (h, w, 3) array format
+    :param F: block dimension
+    :param d: luma frequency cutoff threshold
+    :param d_chroma: chroma frequency cutoff threshold, d by default
+    :param subsampling: "4:2:0", "4:2:2" or "4:4:4", see compression_tool.color.SUBSAMPLING
+    :param progress: optional callable(done_blocks, total_blocks), see compress_image
+    :param kwargs: other arguments of compress_image (backend, workers, cancel, precision, padding)
+    :return: compressed image in array format
+    """
+    if subsampling not in SUBSAMPLING:
+        raise ValueError(f"Unknown chroma subsampling: {subsampling}")
+    if img_array.ndim != 3 or img_array.shape[2] != 3:
+        raise ValueError(f"YCbCr compression needs an RGB image of shape (h, w, 3), got shape {img_array.shape}")
+    if d_chroma is None:
+        d_chroma = d
+
+    fy, fx = SUBSAMPLING[subsampling]
+    with instrument.span("to_ycbcr"):
+        luma, chroma = split_ycbcr(img_array, subsampling)
+
+    # Both planes report to the same progress, the luma blocks first
+    luma_progress = chroma_progress = None
+    if progress is not None:
+        luma_total = None
+
+        def luma_progress(done, total):
+            nonlocal luma_total
+            luma_total = total
+            progress(done, total + 2 * total // (fy * fx))
+
+        def chroma_progress(done, total):
+            progress(luma_total + done, luma_total + total)
+
+    luma = compress_image(luma, F, d, progress=luma_progress, **kwargs)
+
+    # Cropping the chroma to whole blocks would leave up to 2F - 2 luma pixels without chroma on the bottom and
+    # right edges, so the chroma is padded, then cropped to the pixels the luma kept
+    padding = kwargs.pop("padding", "crop")
+    chroma_padding = "edge" if padding == "crop" else padding
+    chroma = compress_image(chroma, F, d_chroma, progress=chroma_progress, padding=chroma_padding, **kwargs)
+    chroma = chroma[:-(-luma.shape[0] // fy), :-(-luma.shape[1] // fx)]
+
+    with instrument.span("to_rgb"):
+        return merge_ycbcr(luma, chroma, subsampling)
+
+
+def compress_image_blockwise(img_array, F, d):
     """
-    Function to compress an image using dct2.
+    Reference implementation of compress_image, processing one block and one coefficient at a time.
+    Kept to check the batched engine against and to measure its speedup.
     :param img_array: image to be compressed, in array format
     :param F: block dimension
     :param d: frequency cutoff threshold
@@ -74,7 +259,9 @@ def save_compressed_image(compressed_img, out_path):
     """
     output_abs_path = os.path.abspath(out_path)
 
-    Image.fromarray(compressed_img).save(output_abs_path)
+    with instrument.span("save_compressed_image"):
+        Image.fromarray(compressed_img).save(output_abs_path)
+    instrument.count("bytes_written", os.path.getsize(output_abs_path))
     print(f"Image saved at: {output_abs_path}")
 
     return output_abs_path
@@ -99,7 +286,9 @@ def open_image(path):
         print(f"Error opening the image: {e}")
 
 
-def dct2_compress(input_file, F, d, output_dir, show_img=True):
+def dct2_compress(input_file, F, d, output_dir, show_img=True, workers=1, stream=False, fmt="bmp", cache=None,
+                  progress=None, cancel=None, backend="scipy", precision="float64", padding="crop",
+                  return_metrics=False, subsampling=None, d_chroma=None, target_psnr=None, max_bytes=None):
     """
     Function to start the compression process
     :param input_file: path to the input image
@@ -107,40 +296,141 @@ def dct2_compress(input_file, F, d, output_dir, show_img=True):
     :param d: frequency cutoff threshold
     :param output_dir: folder to save the plot_benchmark to
     :param show_img: to show an image comparison at the end of the script
+    :param workers: number of threads used by the compression
+    :param stream: to compress an uncompressed BMP strip by strip through memory-mapped files instead of loading it,
+    only for BMP results
+    :param fmt: "bmp" to save the reconstructed pixels, "dct2" to save only the kept coefficients in the compressed
+    container format, see encode_image
+    :param cache: optional CompressionCache to reuse earlier results and coefficients from. Cached results are
+    computed with the scipy backend in float64, so the cache is bypassed when streaming or with another backend or
+    precision
+    :param progress: optional callable receiving (blocks done, total blocks), see compress_image
+    :param cancel: optional cancellation token, see compress_image
+    :param backend: dct2 backend name or "auto", see compression_tool.blocks.transform_blocks
+    :param precision: "float64", "float32" or "int" (fixed-point), see compression_tool.blocks.compress_region
+    :param padding: handling of the partial blocks, see compress_image
+    :param return_metrics: to also return the MSE, PSNR, SSIM and kept coefficient ratio of the result. They are
+    accumulated band by band (strip by strip when streaming) during the compression; cached and .dct2 results are
+    compared with the input once saved
+    :param subsampling: optional chroma subsampling ("4:2:0", "4:2:2" or "4:4:4") to compress color images in YCbCr,
+    see compress_image_ycbcr. Only for in-memory BMP results, without cache
+    :param d_chroma: chroma frequency cutoff threshold when subsampling is set, d by default
+    :param target_psnr: optional PSNR in dB to choose a cutoff for every block from instead of d, see
+    compression_tool.adaptive.compress_image_adaptive. Only for in-memory BMP results, without cache or subsampling
+    :param max_bytes: optional budget in bytes of the kept coefficients to choose the cutoffs from instead of d, like
+    target_psnr
+    :return: abs path to the saved image, and the dict of metrics if return_metrics is set
     """
-    img = Image.open(input_file)
-    img_array = np.array(img)
-
-    if len(img_array.shape) == 2:
-        # Grayscale
-        #img_array = img_array.astype(np.uint8)
-        compressed_img = compress_image(np.expand_dims(img_array, axis=2), F, d)
-        compressed_img = compressed_img[:, :, 0]
-    else:
-        # Color
-        compressed_img = compress_image(img_array, F, d)
+    adaptive = target_psnr is not None or max_bytes is not None
+    if adaptive:
+        if target_psnr is not None and max_bytes is not None:
+            raise ValueError("Give either a target PSNR or a byte budget.")
+        if stream or fmt != "bmp" or cache is not None or subsampling is not None:
+            raise ValueError("Adaptive cutoffs are only supported for in-memory BMP results, without cache or chroma "
+                             "subsampling.")
+    if stream and fmt != "bmp":
+        raise ValueError("Streaming only writes BMP results: the .dct2 container groups the coefficients of the whole "
+                         "image by frequency.")
+    if subsampling is not None:
+        if subsampling not in SUBSAMPLING:
+            raise ValueError(f"Unknown chroma subsampling: {subsampling}")
+        if stream or fmt != "bmp" or cache is not None:
+            raise ValueError("Chroma subsampling is only supported for in-memory BMP results, without cache.")
+        if d_chroma is None:
+            d_chroma = d
 
     img_name = os.path.splitext(os.path.basename(input_file))[0]
-    compressed_img_name = f"{img_name}_compressed_F{F}_d{d}.bmp"
+    compressed_img_name = f"{img_name}_compressed_F{F}_d{d}.{fmt}"
+    if subsampling is not None:
+        compressed_img_name = f"{img_name}_compressed_F{F}_d{d}_dc{d_chroma}_{subsampling.replace(':', '')}.{fmt}"
+    elif adaptive:
+        target = f"psnr{target_psnr:g}" if target_psnr is not None else f"bytes{max_bytes}"
+        compressed_img_name = f"{img_name}_compressed_F{F}_{target}.{fmt}"
 
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, compressed_img_name)
-    output_file = save_compressed_image(compressed_img, output_path)
+    quality = QualityMetrics(F, d) if return_metrics and not adaptive else None
+    measured = None
+
+    if cache is not None and (backend != "scipy" or precision != "float64"):
+        print("Cache not used: cached results are computed with the scipy backend in float64.")
+        cache = None
+
+    if cache is not None and not stream:
+        output_file = cached_compress(cache, input_file, F, d, output_path, fmt, padding, progress, cancel, workers)
+    elif stream:
+        output_file = stream_compress(input_file, output_path, F, d, backend, progress=progress, cancel=cancel,
+                                      precision=precision, padding=padding, metrics=quality)
+    else:
+        with instrument.span("open_image"):
+            img = Image.open(input_file)
+            img_array = np.array(img)
+        instrument.count("bytes_read", os.path.getsize(input_file))
+
+        if fmt == "dct2":
+            if img_array.ndim == 2:
+                img_array = img_array[:, :, np.newaxis]
+            data = encode_image(img_array, F, d, backend, workers, progress, cancel, precision, padding)
+            output_file = save_encoded_data(data, output_path)
+        elif adaptive:
+            grayscale = img_array.ndim == 2
+            color = img_array[:, :, np.newaxis] if grayscale else img_array
+            check_cancelled(cancel)
+            with instrument.span("compress_image"):
+                compressed_img, d_map = compress_image_adaptive(color, F, target_psnr, max_bytes=max_bytes,
+                                                                padding=padding)
+            if progress is not None:
+                progress(d_map.size, d_map.size)
+            if return_metrics:
+                measured = image_metrics(color, compressed_img, F, 0)
+                measured["kept_ratio"] = kept_coefficients(F, d_map) / (d_map.size * F * F)
+
+            output_file = save_compressed_image(compressed_img[:, :, 0] if grayscale else compressed_img, output_path)
+        else:
+            with instrument.span("compress_image"):
+                if len(img_array.shape) == 2:
+                    # Grayscale
+                    compressed_img = compress_image(np.expand_dims(img_array, axis=2), F, d, backend, workers,
+                                                    progress=progress, cancel=cancel, precision=precision,
+                                                    padding=padding, metrics=quality)
+                    compressed_img = compressed_img[:, :, 0]
+                elif subsampling is not None:
+                    # Color, through YCbCr with subsampled chroma
+                    compressed_img = compress_image_ycbcr(img_array, F, d, d_chroma, subsampling, progress=progress,
+                                                          backend=backend, workers=workers, cancel=cancel,
+                                                          precision=precision, padding=padding)
+                    if return_metrics:
+                        measured = image_metrics(img_array, compressed_img, F, d)
+                        measured["kept_ratio"] = chroma_kept_ratio(F, d, d_chroma, subsampling)
+                else:
+                    # Color
+                    compressed_img = compress_image(img_array, F, d, backend, workers, progress=progress,
+                                                    cancel=cancel, precision=precision, padding=padding,
+                                                    metrics=quality)
+
+            output_file = save_compressed_image(compressed_img, output_path)
 
     if show_img:
+        preview_file = output_file
+        if fmt == "dct2":
+            # Image viewers can't read the container, show a decoded copy instead
+            preview_file = os.path.join(output_dir, f"{img_name}_compressed_F{F}_d{d}_decoded.bmp")
+            Image.fromarray(load_encoded_image(output_path)).save(preview_file)
         open_image(input_file)
-        open_image(output_file)
+        open_image(preview_file)
 
+    if not return_metrics:
+        return output_file
+    if measured is not None:
+        return output_file, measured
+    if not (cache is not None and not stream or fmt == "dct2"):
+        return output_file, quality.result()
 
-if __name__ == "__main__":
-    print("Select a .BMP image")
-    input_file = select_image()
-
-    if not input_file:
-        print("No image selected.")
-        exit()
+    # The cached and .dct2 paths never hold the compressed pixels, compare the saved result instead
+    saved = load_encoded_image(output_file) if fmt == "dct2" else np.array(Image.open(output_file))
+    return output_file, image_metrics(np.array(Image.open(input_file)), saved, F, d)
 
-    F = int(input("Insert block dimension F: "))
-    d = int(input(f"Insert frequency cutoff threshold d (0 <= d < {2 * F - 1}): "))
 
-    dct2_compress(input_file, F, d, "output/")
+if __name__ == "__main__":
+    from compression_tool.cli import main
+    sys.exit(main())
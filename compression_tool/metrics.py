@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+
+from compression_tool.transform import zonal_mask
+
+# SSIM stabilizing constants for 8 bit images
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def kept_ratio(F, d):
+    """
+    Function to get the fraction of the coefficients of a block kept by a cutoff.
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :return: number of coefficients with k + l < d over F²
+    """
+    return float(zonal_mask(F, d).mean())
+
+
+def block_ssim(original, compressed, F):
+    """
+    Function to compute the SSIM of every whole F×F block of an image, all the blocks at once. The blocks are the
+    SSIM windows, instead of the usual sliding Gaussian ones, so that a strip of blocks can be scored on its own.
+    :param original: original pixels in (h, w, c) array format
+    :param compressed: compressed pixels, same shape
+    :param F: block dimension
+    :return: array of shape (h_blocks, w_blocks, c)
+    """
+    h, w, c = original.shape
+    h_blocks = h // F
+    w_blocks = w // F
+
+    x = original[:h_blocks * F, :w_blocks * F].reshape(h_blocks, F, w_blocks, F, c).astype(np.float64)
+    y = compressed[:h_blocks * F, :w_blocks * F].reshape(h_blocks, F, w_blocks, F, c).astype(np.float64)
+
+    mean_x = x.mean(axis=(1, 3))
+    mean_y = y.mean(axis=(1, 3))
+    var_x = x.var(axis=(1, 3))
+    var_y = y.var(axis=(1, 3))
+    cov = (x * y).mean(axis=(1, 3)) - mean_x * mean_y
+
+    return ((2 * mean_x * mean_y + SSIM_C1) * (2 * cov + SSIM_C2) /
+            ((mean_x ** 2 + mean_y ** 2 + SSIM_C1) * (var_x + var_y + SSIM_C2)))
+
+
+class QualityMetrics:
+    """
+    Class to accumulate the quality of a compression region by region, while it runs. Each band or strip adds its
+    squared error and block SSIM scores, so the whole image is never compared in a second pass. Updates from
+    several threads are safe.
+    """
+    def __init__(self, F, d):
+        """
+        QualityMetrics constructor
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        """
+        self.F = F
+        self.kept_ratio = kept_ratio(F, d)
+        self._sse = 0.0
+        self._samples = 0
+        self._ssim_sum = 0.0
+        self._ssim_count = 0
+        self._lock = threading.Lock()
+
+    def update(self, original, compressed):
+        """
+        Method to add a region of the image. Every pixel counts for the MSE, only the whole blocks for the SSIM.
+        :param original: original pixels in (h, w, c) array format
+        :param compressed: compressed pixels, same shape
+        """
+        diff = original.astype(np.float64) - compressed
+        sse = float(np.vdot(diff, diff))
+        ssim = block_ssim(original, compressed, self.F)
+
+        with self._lock:
+            self._sse += sse
+            self._samples += diff.size
+            self._ssim_sum += float(ssim.sum())
+            self._ssim_count += ssim.size
+
+    def result(self):
+        """
+        Method to get the metrics of the regions added so far.
+        :return: dict with mse, psnr (dB, inf for a lossless result), ssim and kept_ratio
+        """
+        with self._lock:
+            mse = self._sse / self._samples if self._samples else float("nan")
+            ssim = self._ssim_sum / self._ssim_count if self._ssim_count else float("nan")
+
+        psnr = float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+        return {"mse": mse, "psnr": float(psnr), "ssim": ssim, "kept_ratio": self.kept_ratio}
+
+
+def image_metrics(original, compressed, F, d):
+    """
+    Function to compute the metrics of a whole compressed image.
+    :param original: original image, in (h, w) or (h, w, c) array format, cropped to the size of the compressed one
+    :param compressed: compressed image, in the same format
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :return: dict with mse, psnr, ssim and kept_ratio, see QualityMetrics.result
+    """
+    if original.ndim == 2:
+        original = original[:, :, np.newaxis]
+    if compressed.ndim == 2:
+        compressed = compressed[:, :, np.newaxis]
+
+    metrics = QualityMetrics(F, d)
+    metrics.update(original[:compressed.shape[0], :compressed.shape[1]], compressed)
+    return metrics.result()
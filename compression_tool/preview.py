@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from PIL import Image
+
+from compression_tool.blocks import forward_blocks, inverse_blocks
+
+# Longest side of the downsampled preview tile, in pixels
+PREVIEW_SIZE = 200
+
+# Number of block sizes whose coefficients are kept for the current tile
+COEFF_CACHE_SIZE = 4
+
+
+class PreviewRenderer:
+    """
+    Class to quickly render low resolution compression previews. The forward coefficients of the tile are kept per
+    F, so changing d only costs the mask and the inverse transform.
+    """
+    def __init__(self, size=PREVIEW_SIZE):
+        """
+        PreviewRenderer constructor
+        :param size: longest side of the preview tile
+        """
+        self.size = size
+        self.tile = None
+        self._coeffs = OrderedDict()
+
+    def read_tile(self, path):
+        """
+        Method to decode and downsample an image to a tile, without changing the renderer, so that it can run on
+        another thread than render.
+        :param path: path to the image
+        :return: tile in (h, w, c) uint8 array format
+        """
+        with Image.open(path) as img:
+            img.draft(None, (self.size, self.size))
+            img.thumbnail((self.size, self.size))
+            tile = np.array(img)
+
+        return tile[:, :, np.newaxis] if tile.ndim == 2 else tile
+
+    def set_tile(self, tile):
+        """
+        Method to replace the tile rendered by the previews.
+        :param tile: tile in (h, w, c) uint8 array format, see read_tile
+        """
+        self.tile = tile
+        self._coeffs.clear()
+
+    def load(self, path):
+        """
+        Method to load the downsampled tile of an image.
+        :param path: path to the image
+        """
+        self.set_tile(self.read_tile(path))
+
+    def render(self, F, d):
+        """
+        Method to render the tile and its compressed version, both cropped to whole blocks.
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :return: (original, compressed) uint8 arrays, in (h, w) format for grayscale images
+        """
+        coeffs = self._coeffs.get(F)
+        if coeffs is None:
+            coeffs = forward_blocks(self.tile, F)
+            self._coeffs[F] = coeffs
+            if len(self._coeffs) > COEFF_CACHE_SIZE:
+                self._coeffs.popitem(last=False)
+        else:
+            self._coeffs.move_to_end(F)
+
+        compressed = inverse_blocks(coeffs, d)
+        original = self.tile[:compressed.shape[0], :compressed.shape[1]]
+
+        if original.shape[2] == 1:
+            return original[:, :, 0], compressed[:, :, 0]
+        return original, compressed
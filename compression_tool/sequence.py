@@ -0,0 +1,367 @@
+import argparse
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+from PIL import Image, ImageSequence
+
+from compression_tool import instrument
+from compression_tool.batch import find_images, write_manifest
+from compression_tool.blocks import PADDING_MODES, pad_image
+from compression_tool.codec import QUANT_STEP, encode_coefficients
+from compression_tool.transform import get_plan
+
+# Image extensions picked up when a directory is given as input, multi-frame TIFF stacks included
+SEQUENCE_EXTENSIONS = (".bmp", ".png", ".tif", ".tiff")
+
+# Output formats of the frames
+FORMATS = ("bmp", "png", "dct2")
+
+# Frames decoded ahead of the transform, and compressed frames waiting to be written
+QUEUE_SIZE = 4
+
+# Largest absolute pixel difference, in gray levels, under which a block keeps the coefficients of the previous frame
+DEFAULT_THRESHOLD = 2
+
+# Report columns, in order
+SEQUENCE_FIELDS = [
+    "frame", "input", "output", "keyframe", "blocks", "skipped_blocks", "skipped_ratio", "decode_time",
+    "transform_time", "write_time", "latency"
+]
+
+# Marks the end of the frames in the queues
+_END = object()
+
+
+class SequenceEncoder:
+    """
+    Class compressing the frames of a sequence one after the other. It keeps the block coefficients, the compressed
+    pixels and the reference pixels of the previous frames: the blocks whose pixels moved by at most threshold gray
+    levels since they were last transformed keep their coefficients and compressed pixels, only the others are
+    transformed again.
+    """
+    def __init__(self, F, d, threshold=DEFAULT_THRESHOLD, keyframe_interval=0, padding="crop"):
+        """
+        SequenceEncoder constructor
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :param threshold: largest absolute pixel difference of a skipped block, negative to transform every block
+        :param keyframe_interval: number of frames after which every block is transformed again, 0 for only the
+        first frame and the size changes
+        :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+        """
+        if padding not in PADDING_MODES:
+            raise ValueError(f"Unknown padding mode: {padding}")
+
+        self.F = F
+        self.d = d
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.padding = padding
+        self.frames = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Method to forget the previous frames, so that the next one is a keyframe.
+        """
+        self.reference = None
+        self.coeffs = None
+        self.compressed = None
+        self.since_keyframe = 0
+
+    def encode(self, img_array):
+        """
+        Method to compress the next frame of the sequence.
+        :param img_array: frame in (h, w, c) uint8 array format
+        :return: (compressed frame in (h, w, c) uint8 array format, shared with the encoder and overwritten by the
+        next frame, number of blocks, number of skipped blocks, True for a keyframe)
+        """
+        F = self.F
+        h, w = img_array.shape[:2]
+        padded = pad_image(img_array, F, self.padding)
+        h_blocks, w_blocks, c = padded.shape[0] // F, padded.shape[1] // F, padded.shape[2]
+
+        keyframe = (self.reference is None or self.reference.shape != padded.shape
+                    or 0 < self.keyframe_interval <= self.since_keyframe)
+        if keyframe:
+            self.reference = np.empty(padded.shape, dtype=np.uint8)
+            self.coeffs = np.empty((c, h_blocks, w_blocks, F, F))
+            self.compressed = np.empty(padded.shape, dtype=np.uint8)
+            self.since_keyframe = 0
+            changed = np.ones((h_blocks, w_blocks), dtype=bool)
+        else:
+            with instrument.span("block_difference"):
+                # Blocks are compared on all their channels at once: a block position is kept or transformed whole
+                difference = np.abs(padded.astype(np.int16) - self.reference)
+                changed = difference.reshape(h_blocks, F, w_blocks, F, c).max(axis=(1, 3, 4)) > self.threshold
+
+        with instrument.span("changed_blocks"):
+            self._update(padded, changed)
+
+        skipped = h_blocks * w_blocks - int(np.count_nonzero(changed))
+        self.frames += 1
+        self.since_keyframe += 1
+        instrument.count("skipped_blocks", skipped * c)
+
+        compressed = self.compressed if self.padding == "crop" else self.compressed[:h, :w]
+        return compressed, h_blocks * w_blocks, skipped, keyframe
+
+    def _update(self, padded, changed):
+        """
+        Method to transform the changed blocks of a frame in a single batch, updating the reference pixels, the
+        coefficients and the compressed pixels of those blocks.
+        :param padded: frame of the same size as the reference, in whole blocks
+        :param changed: (h_blocks, w_blocks) bool array of the blocks to transform
+        """
+        F = self.F
+        c, h_blocks, w_blocks = self.coeffs.shape[:3]
+        rows, cols = np.nonzero(changed)
+        if len(rows) == 0:
+            return
+
+        # Advanced indices on the block rows and columns gather the changed blocks as (n, F, F, c)
+        frame_blocks = padded.reshape(h_blocks, F, w_blocks, F, c)
+        changed_blocks = frame_blocks[rows, :, cols]
+        self.reference.reshape(h_blocks, F, w_blocks, F, c)[rows, :, cols] = changed_blocks
+
+        plan = get_plan(F)
+        coeffs = plan.forward(changed_blocks.transpose(3, 0, 1, 2).astype(np.float64))
+        self.coeffs[:, rows, cols] = coeffs
+
+        coeffs *= plan.mask(self.d)
+        restored = plan.inverse(coeffs)
+        np.round(restored, out=restored)
+        np.clip(restored, 0, 255, out=restored)
+        self.compressed.reshape(h_blocks, F, w_blocks, F, c)[rows, :, cols] = restored.transpose(1, 2, 3, 0)
+
+    def encoded_frame(self, size=None):
+        """
+        Method to encode the current coefficients into the compressed container format.
+        :param size: (h, w) of the frame, for padded frames
+        :return: encoded bytes
+        """
+        return encode_coefficients(self.coeffs, self.d, QUANT_STEP, None if self.padding == "crop" else size)
+
+
+def read_frames(inputs):
+    """
+    Function to iterate over the frames of a sequence: the images of the inputs in name order, every page of a
+    multi-frame file (e.g. a TIFF stack) being a frame.
+    :param inputs: directories, image paths or glob patterns
+    :return: generator of (input path, frame name, frame in (h, w, c) uint8 array format)
+    """
+    paths = find_images(inputs, SEQUENCE_EXTENSIONS)
+    if not paths:
+        raise ValueError("No image found.")
+
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with Image.open(path) as img:
+            n_frames = getattr(img, "n_frames", 1)
+            for index, frame in enumerate(ImageSequence.Iterator(img)):
+                frame = frame.convert("L" if frame.mode in ("1", "L", "I", "I;16", "F") else "RGB")
+                img_array = np.asarray(frame)
+                if img_array.ndim == 2:
+                    img_array = img_array[:, :, np.newaxis]
+                yield path, name if n_frames == 1 else f"{name}_{index:05d}", img_array
+
+
+def _put(q, item, stop):
+    """
+    Function to put an item in a bounded queue, giving up once the pipeline is stopped.
+    :param q: queue.Queue
+    :param item: item to put
+    :param stop: threading.Event set when a stage failed
+    :return: True if the item was put
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """
+    Function to get an item from a queue, giving up once the pipeline is stopped.
+    :param q: queue.Queue
+    :param stop: threading.Event set when a stage failed
+    :return: the item, or _END once stopped
+    """
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def compress_sequence(inputs, F, d, output_dir, fmt="bmp", threshold=DEFAULT_THRESHOLD, keyframe_interval=0,
+                      padding="crop", queue_size=QUEUE_SIZE, progress=None):
+    """
+    Function to compress a sequence of frames. Decoding, transform and writing run on three threads connected by
+    bounded queues, so that the next frames are read and the previous ones written while a frame is transformed,
+    with at most queue_size frames waiting between two stages. The blocks that did not change since the previous
+    frames are not transformed again, see SequenceEncoder.
+    :param inputs: directories, image paths or glob patterns, see read_frames
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param output_dir: folder to save the compressed frames and the report to
+    :param fmt: "bmp", "png" or "dct2"
+    :param threshold: largest absolute pixel difference of a skipped block, negative to transform every block
+    :param keyframe_interval: number of frames after which every block is transformed again, 0 for only the first
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :param queue_size: most frames waiting between two stages
+    :param progress: optional callable receiving the report row of each frame once it is written
+    :return: report rows, one per frame, with the time spent in each stage, the latency from the start of its decoding
+    to the end of its writing and the ratio of skipped blocks
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if not 0 <= d <= 2 * F - 2:
+        raise ValueError(f"d must be between 0 and {2 * F - 2}.")
+
+    encoder = SequenceEncoder(F, d, threshold, keyframe_interval, padding)
+    frames = read_frames(inputs)
+    os.makedirs(output_dir, exist_ok=True)
+
+    decoded = queue.Queue(maxsize=queue_size)
+    compressed = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    rows = []
+
+    def decode_stage():
+        try:
+            while True:
+                start = time.perf_counter()
+                with instrument.span("decode"):
+                    frame = next(frames, None)
+                if frame is None or not _put(decoded, (start, time.perf_counter() - start, *frame), stop):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        _put(decoded, _END, stop)
+
+    def write_stage():
+        try:
+            while (item := _get(compressed, stop)) is not _END:
+                row, data = item
+                start = time.perf_counter()
+                with instrument.span("write"):
+                    if fmt == "dct2":
+                        with open(row["output"], "wb") as f:
+                            f.write(data)
+                    else:
+                        Image.fromarray(data[:, :, 0] if data.shape[2] == 1 else data).save(row["output"])
+                end = time.perf_counter()
+                row["write_time"] = end - start
+                row["latency"] = end - row.pop("_start")
+                rows.append(row)
+                if progress is not None:
+                    progress(row)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=decode_stage, daemon=True), threading.Thread(target=write_stage, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while (item := _get(decoded, stop)) is not _END:
+            decode_start, decode_time, path, name, img_array = item
+
+            start = time.perf_counter()
+            with instrument.span("transform"):
+                frame, blocks, skipped, keyframe = encoder.encode(img_array)
+                # The encoder overwrites its buffers with the next frame, so the writer gets its own copy
+                data = encoder.encoded_frame(img_array.shape[:2]) if fmt == "dct2" else frame.copy()
+            transform_time = time.perf_counter() - start
+
+            row = {
+                "frame": encoder.frames - 1,
+                "input": os.path.abspath(path),
+                "output": os.path.abspath(os.path.join(output_dir, f"{name}_compressed_F{F}_d{d}.{fmt}")),
+                "keyframe": keyframe,
+                "blocks": blocks,
+                "skipped_blocks": skipped,
+                "skipped_ratio": skipped / blocks if blocks else 0.0,
+                "decode_time": decode_time,
+                "transform_time": transform_time,
+                "_start": decode_start,
+            }
+            if not _put(compressed, (row, data), stop):
+                break
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(compressed, _END, stop)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return rows
+
+
+def summarize(rows, wall_time):
+    """
+    Function to summarize the report of a sequence.
+    :param rows: report rows of compress_sequence
+    :param wall_time: time taken by the whole sequence, in seconds
+    :return: dict with the number of frames, frames per second, mean and p95 latency and skipped block ratio
+    """
+    latencies = np.array([row["latency"] for row in rows])
+    blocks = sum(row["blocks"] for row in rows)
+    return {
+        "frames": len(rows),
+        "fps": len(rows) / wall_time if wall_time > 0 else 0.0,
+        "mean_latency": float(latencies.mean()) if len(rows) else 0.0,
+        "p95_latency": float(np.percentile(latencies, 95)) if len(rows) else 0.0,
+        "skipped_ratio": sum(row["skipped_blocks"] for row in rows) / blocks if blocks else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compress an image sequence (frames in name order, TIFF stacks) reusing the unchanged blocks.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-F", type=int, required=True, help="block dimension")
+    parser.add_argument("-d", type=int, required=True, help="frequency cutoff threshold")
+    parser.add_argument("-o", "--output", default="output/", help="output folder")
+    parser.add_argument("--format", choices=FORMATS, default="bmp", help="format of the compressed frames")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="largest pixel difference of a block reused from the previous frame, -1 to transform "
+                             "every block")
+    parser.add_argument("--keyframe-interval", type=int, default=0,
+                        help="transform every block again after this many frames, 0 for only the first frame")
+    parser.add_argument("--padding", choices=sorted(PADDING_MODES), default="crop",
+                        help="drop the pixels that do not fill a whole block, or pad the partial blocks")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="most frames waiting between two stages")
+    args = parser.parse_args()
+
+    def print_frame(row):
+        print(f"frame {row['frame']}: {1000 * row['latency']:.1f} ms latency, "
+              f"{row['skipped_ratio']:.1%} blocks skipped{' (keyframe)' if row['keyframe'] else ''}")
+
+    start = time.perf_counter()
+    try:
+        report = compress_sequence(args.inputs, args.F, args.d, args.output, args.format, args.threshold,
+                                   args.keyframe_interval, args.padding, args.queue_size, print_frame)
+    except ValueError as e:
+        parser.error(str(e))
+    summary = summarize(report, time.perf_counter() - start)
+
+    json_path, csv_path = write_manifest(report, args.output, SEQUENCE_FIELDS, "sequence")
+    print(f"{summary['frames']} frames at {summary['fps']:.1f} frames/s, latency mean "
+          f"{1000 * summary['mean_latency']:.1f} ms, p95 {1000 * summary['p95_latency']:.1f} ms, "
+          f"{summary['skipped_ratio']:.1%} blocks skipped")
+    print(f"Report saved at: {os.path.abspath(json_path)} and {os.path.abspath(csv_path)}")
@@ -0,0 +1,678 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import numpy as np
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from compression_tool.blocks import PADDING_MODES, blocks_to_image, pad_image
+from compression_tool.codec import QUANT_STEP, encode_coefficients
+from compression_tool.transform import get_plan
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests waiting for a batch; when full, new requests are refused with 503 instead of piling up
+QUEUE_SIZE = 64
+
+# Most images transformed together, and how long the first request of a batch waits for others to join, in seconds
+MAX_BATCH = 16
+BATCH_WINDOW = 0.005
+
+# Largest accepted request body, in bytes
+MAX_BODY = 64 * 1024 ** 2
+
+# Largest accepted block dimension, so that a padded block stays small whatever the client asks for
+MAX_BLOCK = 64
+
+# Completed requests the latency and throughput metrics are computed over
+METRICS_WINDOW = 1024
+
+# Output formats and their content types
+FORMATS = {"bmp": "image/bmp", "png": "image/png", "dct2": "application/octet-stream"}
+
+# Reason phrases of the statuses the service answers with
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServiceError(Exception):
+    """
+    Raised for a request the service cannot handle, carrying the HTTP status to answer with.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CompressionJob:
+    """
+    Class holding one compression request until its batch is done.
+    """
+    def __init__(self, data, F, d, fmt, padding, future):
+        """
+        CompressionJob constructor
+        :param data: encoded input image
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :param fmt: output format, key of FORMATS
+        :param padding: handling of the partial blocks, see compression_tool.blocks.pad_image
+        :param future: asyncio future receiving the encoded output
+        """
+        self.data = data
+        self.F = F
+        self.d = d
+        self.fmt = fmt
+        self.padding = padding
+        self.future = future
+        self.arrival = time.perf_counter()
+        self.pixels = 0
+
+
+def decode_image(data):
+    """
+    Function to decode an image from memory.
+    :param data: bytes of any image format PIL reads
+    :return: image in (h, w, c) uint8 array format, c being 1 for grayscale and 3 for color images
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        img = img.convert("L" if img.mode in ("1", "L", "I", "I;16", "F") else "RGB")
+    except Exception as e:
+        raise ServiceError(400, f"Cannot decode the image: {e}") from None
+
+    img_array = np.asarray(img)
+    return img_array[:, :, np.newaxis] if img_array.ndim == 2 else img_array
+
+
+def image_size(data):
+    """
+    Function to read the size of an encoded image from its header, without decoding its pixels.
+    :param data: bytes of any image format PIL reads
+    :return: (h, w)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            w, h = img.size
+    except Exception as e:
+        raise ServiceError(400, f"Cannot decode the image: {e}") from None
+    return h, w
+
+
+def encode_image(img_array, fmt):
+    """
+    Function to encode an image in memory.
+    :param img_array: image in (h, w, c) uint8 array format
+    :param fmt: "bmp" or "png"
+    :return: encoded bytes
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(img_array[:, :, 0] if img_array.shape[2] == 1 else img_array).save(buffer, fmt.upper())
+    return buffer.getvalue()
+
+
+def compress_batch(images, F, ds, formats, padding="crop"):
+    """
+    Function to compress several images with the same F at once: the blocks of all the images are stacked in one
+    array and go through a single forward and a single inverse dctn, each image keeping the frequencies of its own
+    d. The stack holds the images decoded to pixels first, so that the .dct2 outputs skip the inverse transform.
+    :param images: list of images in (h, w, c) uint8 array format
+    :param F: block dimension
+    :param ds: frequency cutoff threshold of each image
+    :param formats: output format of each image, key of FORMATS
+    :param padding: handling of the partial blocks, see compression_tool.blocks.pad_image
+    :return: list of encoded outputs
+    """
+    from scipy.fft import dctn, idctn
+
+    order = sorted(range(len(images)), key=lambda i: formats[i] == "dct2")
+    padded = [pad_image(images[i], F, padding) for i in order]
+    shapes = [(img.shape[2], img.shape[0] // F, img.shape[1] // F, F, F) for img in padded]
+    offsets = np.concatenate(([0], np.cumsum([np.prod(shape[:3]) for shape in shapes])))
+
+    # The pixels are converted to float once, straight into the stack
+    stacked = np.empty((offsets[-1], F, F))
+    for img, shape, start, stop in zip(padded, shapes, offsets[:-1], offsets[1:]):
+        c, h_blocks, w_blocks = shape[:3]
+        stacked[start:stop].reshape(shape)[...] = img.reshape(h_blocks, F, w_blocks, F, c).transpose(4, 0, 2, 1, 3)
+
+    coeffs = dctn(stacked, type=2, norm='ortho', axes=(-2, -1), overwrite_x=True)
+
+    outputs = [None] * len(images)
+    pixel_end = 0
+    for i, shape, start, stop in zip(order, shapes, offsets[:-1], offsets[1:]):
+        if formats[i] == "dct2":
+            size = None if padding == "crop" else images[i].shape[:2]
+            outputs[i] = encode_coefficients(coeffs[start:stop].reshape(shape), ds[i], QUANT_STEP, size)
+        else:
+            coeffs[start:stop] *= get_plan(F).mask(ds[i])
+            pixel_end = stop
+
+    if all(fmt == "dct2" for fmt in formats):
+        return outputs
+
+    restored = idctn(coeffs[:pixel_end], type=2, norm='ortho', axes=(-2, -1), overwrite_x=True)
+    np.round(restored, out=restored)
+    np.clip(restored, 0, 255, out=restored)
+    restored = restored.astype(np.uint8)
+
+    for i, shape, start, stop in zip(order, shapes, offsets[:-1], offsets[1:]):
+        if formats[i] != "dct2":
+            h, w = images[i].shape[:2]
+            compressed = blocks_to_image(restored[start:stop].reshape(shape))
+            outputs[i] = encode_image(compressed if padding == "crop" else compressed[:h, :w], formats[i])
+    return outputs
+
+
+def _run_batch(jobs):
+    """
+    Function run on the executor: decode the images of a batch, compress them together and encode the results.
+    :param jobs: CompressionJob list sharing F and padding
+    :return: list with the encoded output, or the exception, of every job
+    """
+    results = [None] * len(jobs)
+    decoded = []
+    for i, job in enumerate(jobs):
+        try:
+            img_array = decode_image(job.data)
+            job.pixels = img_array.shape[0] * img_array.shape[1]
+            decoded.append((i, img_array))
+        except ServiceError as e:
+            results[i] = e
+
+    if not decoded:
+        return results
+
+    indexes, images = zip(*decoded)
+    try:
+        outputs = compress_batch(list(images), jobs[0].F, [jobs[i].d for i in indexes],
+                                 [jobs[i].fmt for i in indexes], jobs[0].padding)
+    except Exception:
+        # Compress the images one by one, so that a bad one only fails its own request
+        outputs = []
+        for i, img_array in decoded:
+            try:
+                outputs.append(compress_batch([img_array], jobs[i].F, [jobs[i].d], [jobs[i].fmt], jobs[i].padding)[0])
+            except Exception as e:
+                outputs.append(ServiceError(500, f"Compression failed: {e}"))
+
+    for i, output in zip(indexes, outputs):
+        results[i] = output
+    return results
+
+
+class ServiceMetrics:
+    """
+    Class to keep the counters of the service and the latency and throughput of its last completed requests.
+    It is only updated from the event loop.
+    """
+    def __init__(self, window=METRICS_WINDOW):
+        """
+        ServiceMetrics constructor
+        :param window: number of completed requests the latency and throughput are computed over
+        """
+        self.start = time.perf_counter()
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self._completions = deque(maxlen=window)
+
+    def record(self, job, ok):
+        """
+        Method to record a finished request.
+        :param job: the CompressionJob
+        :param ok: False if it ended with an error
+        """
+        now = time.perf_counter()
+        if ok:
+            self.completed += 1
+            self._completions.append((now, now - job.arrival, job.pixels))
+        else:
+            self.errors += 1
+
+    def snapshot(self, queue_depth=0, in_flight=0):
+        """
+        Method to get the current metrics.
+        :param queue_depth: requests waiting for a batch
+        :param in_flight: batches being computed
+        :return: dict, times in milliseconds and throughputs per second over the completion window
+        """
+        snapshot = {
+            "uptime": time.perf_counter() - self.start,
+            "requests": self.requests,
+            "completed": self.completed,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "queue_depth": queue_depth,
+            "in_flight": in_flight,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_jobs / self.batches if self.batches else 0.0,
+        }
+
+        if self._completions:
+            ends, latencies, pixels = (np.array(values, dtype=np.float64) for values in zip(*self._completions))
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            # The window starts when its first request arrived
+            elapsed = ends[-1] - (ends[0] - latencies[0])
+            snapshot.update({
+                "latency_mean_ms": float(latencies.mean() * 1000),
+                "latency_p50_ms": float(p50),
+                "latency_p95_ms": float(p95),
+                "latency_p99_ms": float(p99),
+                "requests_per_second": float(len(latencies) / elapsed) if elapsed > 0 else 0.0,
+                "megapixels_per_second": float(pixels.sum() / 1e6 / elapsed) if elapsed > 0 else 0.0,
+            })
+        return snapshot
+
+
+class CompressionService:
+    """
+    Class of the local HTTP compression service. POST /compress?F=8&d=10&format=bmp takes the image bytes as body
+    and answers with the compressed image bytes; GET /metrics answers with the metrics as JSON. Requests with the
+    same F (and padding) arriving within BATCH_WINDOW of each other are compressed as one batch on a thread pool, at
+    most `workers` batches at a time. Nothing is written to disk.
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, queue_size=QUEUE_SIZE,
+                 max_batch=MAX_BATCH, batch_window=BATCH_WINDOW, max_block=MAX_BLOCK):
+        """
+        CompressionService constructor
+        :param host: interface to listen on
+        :param port: port to listen on, 0 for any free one
+        :param workers: threads computing the batches, the number of CPUs by default
+        :param queue_size: requests that can wait for a batch before new ones are refused
+        :param max_batch: most requests compressed in one batch
+        :param batch_window: seconds the first request of a batch waits for others to join
+        :param max_block: largest F accepted, larger ones are refused with 400
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_block = max_block
+        self.metrics = ServiceMetrics()
+
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._in_flight = 0
+        self._executor = None
+        self._server = None
+        self._batcher = None
+        self._tasks = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """
+        Method to start listening. The port actually used is stored in self.port.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dct2-service")
+        self._batcher = asyncio.get_running_loop().create_task(self._collect_batches())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Method to start the service and run it until cancelled.
+        """
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Method to stop listening, let the running batches finish and release the threads.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(ServiceError(503, "The service is shutting down."))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def compress(self, data, F, d, fmt="bmp", padding="crop"):
+        """
+        Method to queue a compression and wait for its result.
+        :param data: encoded input image
+        :param F: block dimension
+        :param d: frequency cutoff threshold
+        :param fmt: output format, key of FORMATS
+        :param padding: handling of the partial blocks, see compression_tool.blocks.pad_image
+        :return: encoded output bytes
+        """
+        if not 1 <= F <= self.max_block:
+            raise ServiceError(400, f"F must be between 1 and {self.max_block}.")
+        if not 0 <= d <= 2 * F - 2:
+            raise ServiceError(400, f"d must be between 0 and 2F - 2 = {2 * F - 2}.")
+        if fmt not in FORMATS:
+            raise ServiceError(400, f"Unknown format: {fmt}")
+        if padding not in PADDING_MODES:
+            raise ServiceError(400, f"Unknown padding mode: {padding}")
+        h, w = image_size(data)
+        if min(h, w) == 0 or (padding == "crop" and F > min(h, w)):
+            raise ServiceError(400, f"The {w}x{h} image has no whole {F}x{F} block, use a smaller F or a padding.")
+
+        self.metrics.requests += 1
+        job = CompressionJob(data, F, d, fmt, padding, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise ServiceError(503, "Too many pending requests, retry later.") from None
+
+        try:
+            result = await job.future
+        except Exception:
+            self.metrics.record(job, ok=False)
+            raise
+        self.metrics.record(job, ok=True)
+        return result
+
+    async def _collect_batches(self):
+        """
+        Coroutine taking the queued requests, grouping them by F and padding and starting their batches. It waits
+        for a free worker before collecting a batch, so that the queue fills up when the workers cannot keep up.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            jobs = [await self._queue.get()]
+
+            # Take what is already queued, then give the others the rest of the window to arrive
+            self._drain(jobs)
+            if len(jobs) < self.max_batch and self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+                self._drain(jobs)
+
+            groups = {}
+            for job in jobs:
+                groups.setdefault((job.F, job.padding), []).append(job)
+
+            # The first group uses the slot taken above, the others wait for their own
+            for n, group in enumerate(groups.values()):
+                if n > 0:
+                    await self._slots.acquire()
+                task = loop.create_task(self._run(group))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def _drain(self, jobs):
+        """
+        Method to move queued requests to a batch being collected, up to max_batch.
+        :param jobs: CompressionJob list of the batch
+        """
+        while len(jobs) < self.max_batch and not self._queue.empty():
+            jobs.append(self._queue.get_nowait())
+
+    async def _run(self, jobs):
+        """
+        Coroutine computing a batch on the executor and handing each request its result.
+        :param jobs: CompressionJob list sharing F and padding
+        """
+        self._in_flight += 1
+        self.metrics.batches += 1
+        self.metrics.batched_jobs += len(jobs)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, _run_batch, jobs)
+        except Exception as e:
+            results = [ServiceError(500, f"Compression failed: {e}")] * len(jobs)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+        for job, result in zip(jobs, results):
+            if job.future.done():
+                continue
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Coroutine serving the HTTP/1.1 requests of a connection, kept alive until the client closes it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, close=True)
+                    break
+                body = await reader.readexactly(length)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    payload = await self._route(method, target, body)
+                    status = 200
+                except ServiceError as e:
+                    status, payload = e.status, {"error": str(e)}
+                await self._respond(writer, status, payload, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        """
+        Coroutine dispatching a request.
+        :return: (content type, bytes) of the answer, or a dict answered as JSON
+        """
+        url = urlsplit(target)
+        if url.path == "/metrics":
+            if method != "GET":
+                raise ServiceError(405, "Use GET.")
+            return self.metrics.snapshot(self._queue.qsize(), self._in_flight)
+
+        if url.path == "/compress":
+            if method != "POST":
+                raise ServiceError(405, "Use POST.")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                F = int(query["F"])
+                d = int(query["d"])
+            except (KeyError, ValueError):
+                raise ServiceError(400, "F and d must be given as integers.") from None
+            fmt = query.get("format", "bmp")
+            output = await self.compress(body, F, d, fmt, query.get("padding", "crop"))
+            return FORMATS[fmt], output
+
+        raise ServiceError(404, f"Unknown path: {url.path}")
+
+    @staticmethod
+    async def _respond(writer, status, payload, close=False):
+        """
+        Coroutine writing an HTTP response.
+        :param payload: (content type, bytes), or a dict sent as JSON
+        """
+        if isinstance(payload, dict):
+            payload = ("application/json", json.dumps(payload).encode())
+        content_type, body = payload
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+async def http_request(method, target, body=b"", host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Function to send one request to the service, on its own connection.
+    :param method: "GET" or "POST"
+    :param target: path and query
+    :param body: request body
+    :param host: service host
+    :param port: service port
+    :return: (status, response body)
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"{method} {target} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, await reader.readexactly(int(headers.get("content-length", 0)))
+    finally:
+        writer.close()
+
+
+async def compress_remote(data, F, d, fmt="bmp", padding="crop", host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Function to compress an image through the service.
+    :param data: encoded input image
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param fmt: output format, key of FORMATS
+    :param padding: handling of the partial blocks
+    :param host: service host
+    :param port: service port
+    :return: encoded output bytes
+    """
+    status, body = await http_request("POST", f"/compress?F={F}&d={d}&format={fmt}&padding={padding}", data,
+                                      host, port)
+    if status != 200:
+        raise ServiceError(status, json.loads(body).get("error", ""))
+    return body
+
+
+async def fetch_metrics(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Function to get the metrics of the service.
+    :return: dict, see ServiceMetrics.snapshot
+    """
+    status, body = await http_request("GET", "/metrics", host=host, port=port)
+    return json.loads(body)
+
+
+async def run_client(data, F, d, requests, concurrency, fmt="bmp", host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Function to load the service with concurrent requests for the same image, retrying refused ones.
+    :param data: encoded input image
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param requests: total number of requests
+    :param concurrency: requests in flight at the same time
+    :param fmt: output format, key of FORMATS
+    :param host: service host
+    :param port: service port
+    :return: (client side latencies in seconds, wall time in seconds, retries after a 503, last output)
+    """
+    latencies = []
+    retries = 0
+    output = None
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal retries, output
+        for _ in remaining:
+            start = time.perf_counter()
+            while True:
+                try:
+                    output = await compress_remote(data, F, d, fmt, host=host, port=port)
+                    break
+                except ServiceError as e:
+                    if e.status != 503:
+                        raise
+                    retries += 1
+                    await asyncio.sleep(0.01)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, retries, output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP dct2 compression service.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="run the service")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--workers", type=int, help="threads computing the batches, the number of CPUs by default")
+    serve.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="pending requests before 503 answers")
+    serve.add_argument("--max-batch", type=int, default=MAX_BATCH, help="most requests compressed together")
+    serve.add_argument("--batch-window", type=float, default=BATCH_WINDOW * 1000,
+                       help="milliseconds a request waits for others with the same F")
+    serve.add_argument("--max-block", type=int, default=MAX_BLOCK, help="largest F accepted")
+
+    client = subparsers.add_parser("client", help="load a running service with concurrent requests")
+    client.add_argument("input", help="image sent with every request")
+    client.add_argument("-F", type=int, default=8, help="block dimension")
+    client.add_argument("-d", type=int, default=10, help="frequency cutoff threshold")
+    client.add_argument("--format", choices=sorted(FORMATS), default="bmp", help="output format")
+    client.add_argument("--requests", type=int, default=64, help="total number of requests")
+    client.add_argument("--concurrency", type=int, default=16, help="requests in flight at the same time")
+    client.add_argument("--output", help="optional file to save the last answer to")
+    client.add_argument("--host", default=DEFAULT_HOST)
+    client.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        service = CompressionService(args.host, args.port, args.workers, args.queue_size, args.max_batch,
+                                     args.batch_window / 1000, args.max_block)
+        print(f"Serving on http://{args.host}:{args.port} with {service.workers} workers")
+        try:
+            asyncio.run(service.serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        with open(args.input, "rb") as f:
+            data = f.read()
+
+        latencies, wall_time, retries, output = asyncio.run(
+            run_client(data, args.F, args.d, args.requests, args.concurrency, args.format, args.host, args.port))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        print(f"{len(latencies)} requests in {wall_time:.2f} s: {len(latencies) / wall_time:.1f} req/s, "
+              f"latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, {retries} retries after 503")
+        print("Service metrics:", json.dumps(asyncio.run(fetch_metrics(args.host, args.port)), indent=2))
+
+        if args.output:
+            with open(args.output, "wb") as f:
+                f.write(output)
+            print(f"Image saved at: {os.path.abspath(args.output)}")
@@ -0,0 +1,205 @@
+import os
+import struct
+import numpy as np
+
+from compression_tool import instrument
+from compression_tool.blocks import PADDING_MODES, check_cancelled, compress_region
+
+# BMP file header: signature, file size, two reserved fields, pixel data offset
+BMP_FILE_HEADER = struct.Struct("<2sIHHI")
+
+# BITMAPINFOHEADER: size, width, height, planes, bits per pixel, compression, image size, x/y resolution,
+# used and important palette colors
+BMP_INFO_HEADER = struct.Struct("<IiiHHIIiiII")
+
+
+class BMPLayout:
+    """
+    Geometry of the pixel array of an uncompressed 8 or 24 bit BMP file.
+    """
+    def __init__(self, path):
+        """
+        BMPLayout constructor, reads the headers of a BMP file.
+        :param path: path to the BMP file
+        """
+        with open(path, "rb") as f:
+            signature, _, _, _, self.offset = BMP_FILE_HEADER.unpack(f.read(BMP_FILE_HEADER.size))
+            (header_size, self.width, height, _, self.bpp, compression, _, self.x_ppm, self.y_ppm,
+             colors, _) = BMP_INFO_HEADER.unpack(f.read(BMP_INFO_HEADER.size))
+
+            if signature != b"BM":
+                raise ValueError(f"{path} is not a BMP file.")
+            if compression != 0 or self.bpp not in (8, 24):
+                raise ValueError(f"{path} is not an uncompressed 8 or 24 bit BMP file.")
+
+            self.palette = b""
+            if self.bpp == 8:
+                f.seek(BMP_FILE_HEADER.size + header_size)
+                self.palette = f.read((colors or 256) * 4)
+                if not self._is_grayscale_palette(self.palette):
+                    raise ValueError(f"{path} uses a color palette, only grayscale 8 bit BMP files are supported.")
+
+        # A negative height marks a top-down pixel array
+        self.bottom_up = height > 0
+        self.height = abs(height)
+        self.channels = self.bpp // 8
+        self.stride = (self.width * self.channels + 3) & ~3
+
+    @staticmethod
+    def _is_grayscale_palette(palette):
+        """
+        Method to check that palette index i maps to the gray level (i, i, i).
+        :param palette: raw BGRX palette entries
+        :return: True if the palette is the identity grayscale one
+        """
+        entries = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 4)
+        return np.array_equal(entries[:, :3], np.repeat(np.arange(len(entries), dtype=np.uint8)[:, None], 3, axis=1))
+
+    def map_rows(self, path, mode="r"):
+        """
+        Method to memory-map the padded pixel rows of a BMP file with this layout.
+        :param path: path to the BMP file
+        :param mode: memmap mode
+        :return: (height, stride) memmap, in file order
+        """
+        return np.memmap(path, dtype=np.uint8, mode=mode, offset=self.offset, shape=(self.height, self.stride))
+
+    def pixels(self, rows):
+        """
+        Method to view the mapped rows as an image.
+        :param rows: memmap returned by map_rows
+        :return: (height, width, channels) view with the top row first
+        """
+        pixels = rows[:, :self.width * self.channels].reshape(self.height, self.width, self.channels)
+        return pixels[::-1] if self.bottom_up else pixels
+
+
+def create_bmp(path, width, height, like):
+    """
+    Function to create a bottom-up BMP file with the pixel format of another one, pixels are left zeroed.
+    :param path: path to the BMP file to create
+    :param width: image width
+    :param height: image height
+    :param like: BMPLayout to copy the pixel format, resolution and palette from
+    :return: BMPLayout of the new file
+    """
+    stride = (width * like.channels + 3) & ~3
+    offset = BMP_FILE_HEADER.size + BMP_INFO_HEADER.size + len(like.palette)
+    image_size = stride * height
+
+    with open(path, "wb") as f:
+        f.write(BMP_FILE_HEADER.pack(b"BM", offset + image_size, 0, 0, offset))
+        f.write(BMP_INFO_HEADER.pack(BMP_INFO_HEADER.size, width, height, 1, like.bpp, 0, image_size,
+                                     like.x_ppm, like.y_ppm, len(like.palette) // 4, 0))
+        f.write(like.palette)
+        f.truncate(offset + image_size)
+
+    return BMPLayout(path)
+
+
+def stream_compress(input_file, output_file, F, d, backend="scipy", progress=None, cancel=None, precision="float64",
+                    padding="crop", metrics=None):
+    """
+    Function to compress an uncompressed BMP file strip by strip, without loading it in memory. Each strip is one
+    row of F×F blocks, read from and written to memory-mapped files, so peak memory only depends on the image
+    width.
+    :param input_file: path to the input BMP image
+    :param output_file: path to the output BMP image
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param backend: dct2 backend, see compression_tool.blocks.transform_blocks
+    :param progress: optional callable receiving (blocks done, total blocks) after each strip
+    :param cancel: optional cancellation token checked before each strip, raises CompressionCancelled once set
+    :param precision: "float64", "float32" or "int" (fixed-point), see compression_tool.blocks.compress_region
+    :param padding: handling of the partial blocks, see compression_tool.main.compress_image
+    :param metrics: optional compression_tool.metrics.QualityMetrics, updated with each strip
+    :return: abs path to the saved image
+    """
+    if padding not in PADDING_MODES:
+        raise ValueError(f"Unknown padding mode: {padding}")
+
+    layout = BMPLayout(input_file)
+    if padding != "crop":
+        return _stream_compress_padded(layout, input_file, output_file, F, d, backend, progress, cancel, precision,
+                                       padding, metrics)
+
+    h_blocks = layout.height // F
+    w_blocks = layout.width // F
+    if h_blocks == 0 or w_blocks == 0:
+        raise ValueError(f"The image is smaller than a {F}x{F} block.")
+
+    output_abs_path = os.path.abspath(output_file)
+    out_layout = create_bmp(output_abs_path, w_blocks * F, h_blocks * F, layout)
+
+    src_rows = layout.map_rows(input_file)
+    dst_rows = out_layout.map_rows(output_abs_path, mode="r+")
+    src = layout.pixels(src_rows)
+    dst = out_layout.pixels(dst_rows)
+
+    strip_blocks = w_blocks * layout.channels
+    for i in range(h_blocks):
+        check_cancelled(cancel)
+        with instrument.span("strip"):
+            compress_region(src[i * F:(i + 1) * F], F, d, dst[i * F:(i + 1) * F], backend, precision)
+        if metrics is not None:
+            metrics.update(src[i * F:(i + 1) * F, :w_blocks * F], dst[i * F:(i + 1) * F])
+        if progress is not None:
+            progress((i + 1) * strip_blocks, h_blocks * strip_blocks)
+
+    dst_rows.flush()
+    del src, dst, src_rows, dst_rows
+    instrument.count("bytes_read", h_blocks * F * layout.stride)
+    instrument.count("bytes_written", os.path.getsize(output_abs_path))
+    print(f"Image saved at: {output_abs_path}")
+
+    return output_abs_path
+
+
+def _stream_compress_padded(layout, input_file, output_file, F, d, backend, progress, cancel, precision, padding,
+                            metrics):
+    """
+    Function to compress an uncompressed BMP file strip by strip like stream_compress, padding the partial blocks
+    and keeping the size of the input. The last strip is padded from the F rows above the image bottom, which holds
+    every row a symmetric padding mirrors.
+    :param layout: BMPLayout of the input image
+    :param padding: "edge", "symmetric" or "zero"
+    :return: abs path to the saved image
+    """
+    h, w = layout.height, layout.width
+    h_blocks = -(-h // F)
+    w_blocks = -(-w // F)
+    mode = PADDING_MODES[padding]
+
+    output_abs_path = os.path.abspath(output_file)
+    out_layout = create_bmp(output_abs_path, w, h, layout)
+
+    src_rows = layout.map_rows(input_file)
+    dst_rows = out_layout.map_rows(output_abs_path, mode="r+")
+    src = layout.pixels(src_rows)
+    dst = out_layout.pixels(dst_rows)
+
+    strip = np.empty((F, w_blocks * F, layout.channels), dtype=np.uint8)
+    strip_blocks = w_blocks * layout.channels
+    for i in range(h_blocks):
+        check_cancelled(cancel)
+        top = i * F
+        bottom = min(top + F, h)
+        region = src[max(0, bottom - F):bottom]
+        padded = np.pad(region, ((0, top + F - bottom), (0, w_blocks * F - w), (0, 0)), mode=mode)[-F:]
+
+        with instrument.span("strip"):
+            compress_region(padded, F, d, strip, backend, precision)
+        dst[top:bottom] = strip[:bottom - top, :w]
+        if metrics is not None:
+            metrics.update(src[top:bottom], strip[:bottom - top, :w])
+
+        if progress is not None:
+            progress((i + 1) * strip_blocks, h_blocks * strip_blocks)
+
+    dst_rows.flush()
+    del src, dst, src_rows, dst_rows
+    instrument.count("bytes_read", h * layout.stride)
+    instrument.count("bytes_written", os.path.getsize(output_abs_path))
+    print(f"Image saved at: {output_abs_path}")
+
+    return output_abs_path
@@ -0,0 +1,264 @@
+import functools
+import numpy as np
+
+# Maximum number of (F, dtype) transform plans kept in memory
+PLAN_CACHE_SIZE = 32
+
+# Largest block size for which the dense F²×F² projection is built
+FUSED_MAX_F = 16
+
+# Fixed-point precision of the integer DCT, as in the JPEG islow DCT: the basis matrix is scaled by 2^CONST_BITS and
+# the intermediate rows keep PASS1_BITS extra fractional bits between the two passes
+CONST_BITS = 13
+PASS1_BITS = 2
+
+# Largest block size whose integer DCT fits in int32 accumulators, larger blocks use int64
+FIXED_INT32_MAX_F = 64
+
+
+def dct_matrix(F, dtype=np.float64):
+    """
+    Function to build the orthonormal DCT-II matrix C, so that C @ x is the dct of the column vector x.
+    :param F: transform size
+    :param dtype: floating point type of the matrix
+    :return: F×F DCT-II matrix
+    """
+    n = np.arange(F)
+    matrix = np.sqrt(2 / F) * np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * F))
+    matrix[0, :] /= np.sqrt(2)
+    return matrix.astype(dtype)
+
+
+def zonal_mask(F, d, dtype=np.float64):
+    """
+    Function to build the frequency cutoff mask of a block.
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param dtype: type of the mask
+    :return: F×F array, 1 where k + l < d and 0 elsewhere
+    """
+    k = np.arange(F)
+    return (k[:, None] + k[None, :] < d).astype(dtype)
+
+
+class FusedOperator:
+    """
+    Linear operator equivalent to idct2(mask * dct2(B)) for a fixed (F, d), applied to a whole batch of blocks
+    with a single matrix product.
+    """
+    def __init__(self, plan, d):
+        """
+        FusedOperator constructor. Picks the cheapest form for the number r of kept coefficients: the low-rank
+        factorization U.T @ U (U is r×F²) when r is small, the dense F²×F² projection when F is small, otherwise
+        the separable transform of the plan.
+        :param plan: TransformPlan of the block size
+        :param d: frequency cutoff threshold
+        """
+        F = plan.F
+        self.plan = plan
+        self.d = d
+
+        k, l = np.divmod(np.flatnonzero(plan.mask(d)), F)
+        basis = (plan.matrix[k][:, :, None] * plan.matrix[l][:, None, :]).reshape(len(k), F * F)
+        self.rank = len(k)
+
+        self.basis = None
+        self.projection = None
+        if 2 * self.rank <= min(F * F, 8 * F):
+            self.basis = basis
+            self.basis_t = np.ascontiguousarray(basis.T)
+        elif F <= FUSED_MAX_F:
+            self.projection = basis.T @ basis
+
+    def apply(self, blocks):
+        """
+        Method to truncate and reconstruct a batch of blocks.
+        :param blocks: array of shape (..., F, F)
+        :return: restored blocks, same shape as blocks
+        """
+        F = self.plan.F
+        if self.basis is not None:
+            flat = blocks.reshape(-1, F * F)
+            return ((flat @ self.basis_t) @ self.basis).reshape(blocks.shape)
+        if self.projection is not None:
+            flat = blocks.reshape(-1, F * F)
+            return (flat @ self.projection).reshape(blocks.shape)
+
+        coeffs = self.plan.forward(blocks)
+        coeffs *= self.plan.mask(self.d)
+        return self.plan.inverse(coeffs)
+
+    def apply_into(self, blocks, scratch):
+        """
+        Method to truncate and reconstruct a batch of blocks without allocating any array, every product writing
+        into one of the two given buffers.
+        :param blocks: C-contiguous array of shape (..., F, F) in the plan type, overwritten
+        :param scratch: C-contiguous array of the same shape and type, overwritten
+        :return: blocks or scratch, whichever holds the restored blocks
+        """
+        F = self.plan.F
+        flat = blocks.reshape(-1, F * F)
+        if self.rank == 0:
+            blocks.fill(0)
+            return blocks
+        if self.basis is not None:
+            kept = scratch.reshape(-1)[:flat.shape[0] * self.rank].reshape(-1, self.rank)
+            np.matmul(flat, self.basis_t, out=kept)
+            np.matmul(kept, self.basis, out=flat)
+            return blocks
+        if self.projection is not None:
+            np.matmul(flat, self.projection, out=scratch.reshape(-1, F * F))
+            return scratch
+
+        matrix, matrix_t = self.plan.matrix, self.plan.matrix_t
+        np.matmul(matrix, blocks, out=scratch)
+        np.matmul(scratch, matrix_t, out=blocks)
+        # The cut triangle is zeroed row by row: multiplying by the broadcast mask would make NumPy buffer
+        for k in range(F):
+            blocks[..., k, max(self.d - k, 0):] = 0
+        np.matmul(matrix_t, blocks, out=scratch)
+        np.matmul(scratch, matrix, out=blocks)
+        return blocks
+
+
+class TransformPlan:
+    """
+    Reusable transform state for F×F blocks: the DCT-II basis matrix and the zonal masks built on it.
+    """
+    def __init__(self, F, dtype=np.float64):
+        """
+        TransformPlan constructor
+        :param F: block dimension
+        :param dtype: floating point type the plan computes in
+        """
+        self.F = F
+        self.dtype = np.dtype(dtype)
+        self.matrix = dct_matrix(F, self.dtype)
+        self.matrix.setflags(write=False)
+        self.matrix_t = np.ascontiguousarray(self.matrix.T)
+        self.matrix_t.setflags(write=False)
+        self._masks = {}
+        self._fused = {}
+
+    def mask(self, d):
+        """
+        Method to get the cached zonal mask for a cutoff threshold.
+        :param d: frequency cutoff threshold
+        :return: read-only F×F mask
+        """
+        mask = self._masks.get(d)
+        if mask is None:
+            mask = zonal_mask(self.F, d, self.dtype)
+            mask.setflags(write=False)
+            self._masks[d] = mask
+        return mask
+
+    def fused(self, d):
+        """
+        Method to get the cached truncate-and-reconstruct operator for a cutoff threshold.
+        :param d: frequency cutoff threshold
+        :return: FusedOperator for (F, d)
+        """
+        operator = self._fused.get(d)
+        if operator is None:
+            operator = FusedOperator(self, d)
+            self._fused[d] = operator
+        return operator
+
+    def forward(self, blocks):
+        """
+        Method to compute the dct2 of a batch of blocks as C @ B @ C.T.
+        :param blocks: array of shape (..., F, F)
+        :return: dct2 coefficients, same shape as blocks
+        """
+        return self.matrix @ blocks @ self.matrix.T
+
+    def inverse(self, coeffs):
+        """
+        Method to compute the idct2 of a batch of coefficient blocks as C.T @ X @ C.
+        :param coeffs: array of shape (..., F, F)
+        :return: restored blocks, same shape as coeffs
+        """
+        return self.matrix.T @ coeffs @ self.matrix
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _cached_plan(F, dtype):
+    return TransformPlan(F, dtype)
+
+
+def get_plan(F, dtype=np.float64):
+    """
+    Function to get the transform plan for a block size, building it only on the first request.
+    :param F: block dimension
+    :param dtype: floating point type the plan computes in
+    :return: shared TransformPlan instance
+    """
+    return _cached_plan(F, np.dtype(dtype))
+
+
+def _descale(x, bits):
+    """
+    Function to divide an integer array by 2^bits, rounding to the nearest integer, in place.
+    :param x: integer array
+    :param bits: number of bits to drop
+    :return: x
+    """
+    x += 1 << (bits - 1)
+    x >>= bits
+    return x
+
+
+class FixedPointPlan:
+    """
+    Integer fixed-point DCT of F×F blocks in the style of the JPEG islow DCT: the pixels are level shifted to
+    [-128, 127] and both passes are integer matrix products with the DCT-II matrix scaled by 2^CONST_BITS.
+    """
+    def __init__(self, F):
+        """
+        FixedPointPlan constructor
+        :param F: block dimension
+        """
+        self.F = F
+        self.dtype = np.dtype(np.int32 if F <= FIXED_INT32_MAX_F else np.int64)
+        self.matrix = np.round(dct_matrix(F) * (1 << CONST_BITS)).astype(self.dtype)
+        self.matrix.setflags(write=False)
+
+    def forward(self, blocks):
+        """
+        Method to compute the integer dct2 of a batch of level shifted blocks.
+        :param blocks: integer array of shape (..., F, F), pixels minus 128
+        :return: integer dct2 coefficients, same shape as blocks
+        """
+        rows = _descale(blocks.astype(self.dtype, copy=False) @ self.matrix.T, CONST_BITS - PASS1_BITS)
+        return _descale(self.matrix @ rows, CONST_BITS + PASS1_BITS)
+
+    def inverse(self, coeffs):
+        """
+        Method to compute the integer idct2 of a batch of coefficient blocks.
+        :param coeffs: integer array of shape (..., F, F)
+        :return: restored level shifted blocks, same shape as coeffs
+        """
+        columns = _descale(self.matrix.T @ coeffs.astype(self.dtype, copy=False), CONST_BITS - PASS1_BITS)
+        return _descale(columns @ self.matrix, CONST_BITS + PASS1_BITS)
+
+    def reconstruct(self, blocks, d):
+        """
+        Method to cut the frequencies with k + l >= d from a batch of level shifted blocks.
+        :param blocks: integer array of shape (..., F, F), pixels minus 128
+        :param d: frequency cutoff threshold
+        :return: restored level shifted blocks, already integer
+        """
+        coeffs = self.forward(blocks)
+        coeffs *= get_plan(self.F).mask(d).astype(self.dtype)
+        return self.inverse(coeffs)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def get_fixed_plan(F):
+    """
+    Function to get the fixed-point plan for a block size, building it only on the first request.
+    :param F: block dimension
+    :return: shared FixedPointPlan instance
+    """
+    return FixedPointPlan(F)
@@ -0,0 +1,82 @@
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from compression_tool.arrays import Workspace, compress_array
+from compression_tool.main import compress_image
+from dct2_performance.codec_benchmark import test_image
+from dct2_performance.utils.CSVLogger import CSVLogger
+
+# Frame shapes compressed repeatedly, grayscale and color
+SHAPES = [(240, 320), (480, 640, 3), (1080, 1920, 3)]
+
+# (F, d) pairs, covering the low-rank, dense projection and separable forms of the fused operator
+PARAMETERS = [(8, 3), (8, 10), (16, 12), (32, 20)]
+
+# Calls measured after the warm-up one
+CALLS: int = 10
+
+# Bytes a steady-state call may allocate at its peak (Python objects, never a frame sized array)
+ALLOCATION_LIMIT: int = 16 * 1024
+
+
+def measure(function, calls: int = CALLS) -> tuple:
+    """
+    Function to measure what repeated calls allocate, after a warm-up call.
+    :param function: callable without arguments
+    :param calls: number of measured calls
+    :return: (peak bytes allocated during one call at worst, bytes still allocated after all the calls, mean time)
+    """
+    function()
+    tracemalloc.start()
+    peak = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    elapsed = (time.perf_counter() - start) / calls
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return peak, retained, elapsed
+
+
+def main() -> int:
+    """
+    Main function to check that compress_array allocates nothing frame sized once its workspace and output exist,
+    next to what compress_image allocates for the same frames.
+    :return: exit code, 1 if a steady-state call went over ALLOCATION_LIMIT
+    """
+    print("Starting allocation check...")
+    with CSVLogger("allocations", "benchmark/") as logger:
+        failures = 0
+
+        for shape in SHAPES:
+            img = test_image(max(shape[:2]))[:shape[0], :shape[1]]
+            img = np.ascontiguousarray(img if len(shape) == 3 else img[:, :, 0])
+            color = img if img.ndim == 3 else img[:, :, None]
+            for F, d in PARAMETERS:
+                workspace = Workspace()
+                out = np.empty_like(img[:img.shape[0] // F * F, :img.shape[1] // F * F])
+                peak, retained, elapsed = measure(lambda: compress_array(img, F, d, out=out, workspace=workspace))
+                base_peak, _, base_elapsed = measure(lambda: compress_image(color, F, d))
+
+                passed = peak <= ALLOCATION_LIMIT and retained <= ALLOCATION_LIMIT
+                failures += not passed
+                logger.write_row({"shape": "x".join(map(str, shape)), "F": F, "d": d, "peak_bytes": peak,
+                                  "retained_bytes": retained, "time": elapsed, "compress_image_peak_bytes": base_peak,
+                                  "compress_image_time": base_elapsed, "workspace_bytes": workspace.nbytes,
+                                  "passed": passed})
+                print(f"{'ok' if passed else 'FAIL':>4}  {shape} F={F} d={d}: {peak} B peak per call, {retained} B "
+                      f"retained, {1000 * elapsed:.2f} ms (compress_image: {base_peak / 2 ** 20:.1f} MiB, "
+                      f"{1000 * base_elapsed:.2f} ms)")
+
+    print(f"{failures} configurations over {ALLOCATION_LIMIT} bytes.")
+    print(f"Results saved at: {logger.log_file}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import time
+import numpy as np
+
+from compression_tool.codec import decode, encode
+from dct2_performance.utils.CSVLogger import CSVLogger
+
+# Sides of the square RGB test images
+IMAGE_SIZES = [256, 512, 1024, 2048]
+
+# (F, d) pairs to encode with
+PARAMETERS = [(8, 3), (8, 6), (8, 10), (16, 5), (16, 12), (32, 8)]
+
+
+def test_image(size: int) -> np.ndarray:
+    """
+    Function to build a smooth RGB test image with mild noise, closer to a photo than uniform noise.
+    :param size: image side
+    :return: (size, size, 3) uint8 image
+    """
+    y, x = np.mgrid[0:size, 0:size] / size
+    channels = [
+        128 + 100 * np.sin(8 * x) * np.cos(6 * y),
+        255 * (x + y) / 2,
+        255 * (1 - x) * y,
+    ]
+    noise = np.random.default_rng(0).normal(0, 3, size=(size, size, 3))
+    return np.clip(np.stack(channels, axis=-1) + noise, 0, 255).astype(np.uint8)
+
+
+def main():
+    """
+    Main function to measure the compression ratio and the encode/decode throughput of the .dct2 format.
+    """
+    print("Starting codec benchmark...")
+    with CSVLogger("codec", "benchmark/") as logger:
+        for size in IMAGE_SIZES:
+            img = test_image(size)
+            megapixels = size * size / 1e6
+
+            for F, d in PARAMETERS:
+                print(f"Encoding {size}x{size} image with F={F}, d={d}")
+
+                start = time.perf_counter()
+                data = encode(img, F, d)
+                encode_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                decode(data)
+                decode_time = time.perf_counter() - start
+
+                logger.write_row({
+                    "size": size,
+                    "F": F,
+                    "d": d,
+                    "encoded_bytes": len(data),
+                    "ratio": img.nbytes / len(data),
+                    "encode_time": encode_time,
+                    "decode_time": decode_time,
+                    "decode_mps": megapixels / decode_time,
+                })
+
+    print("Benchmark completed.")
+    print(f"Results saved at: {logger.log_file}")
+
+
+if __name__ == "__main__":
+    main()
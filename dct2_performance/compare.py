@@ -0,0 +1,59 @@
+import argparse
+import sys
+
+from dct2_performance.utils.CSVLogger import CSVLogger
+from dct2_performance.utils.constants import RESULTS_PATH
+from dct2_performance.utils.plotter import PerformancePlotter
+from dct2_performance.utils.results import ResultsStore, compare_runs
+
+
+def main(argv=None) -> int:
+    """
+    Main function to compare a candidate benchmark run with a baseline one.
+    :param argv: command line arguments, sys.argv by default
+    :return: exit code, 1 if any configuration regressed
+    """
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs and fail on performance regressions.")
+    parser.add_argument("baseline", help="baseline run: a run id, a CSV log path, or latest/previous")
+    parser.add_argument("candidate", help="candidate run: a run id, a CSV log path, or latest/previous")
+    parser.add_argument("--suite", default=None, help="suite used to resolve latest/previous and to name old logs")
+    parser.add_argument("--store", default=RESULTS_PATH, help="results store folder")
+    parser.add_argument("--threshold", type=float, default=0.05, help="smallest relative change that is flagged")
+    parser.add_argument("--noise-factor", type=float, default=3.0,
+                        help="combined relative standard errors a change must exceed to be flagged")
+    parser.add_argument("--plot", action="store_true", help="save the diff plot and the trend plot of the suite")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.store)
+    try:
+        baseline = store.load(args.baseline, args.suite)
+        candidate = store.load(args.candidate, args.suite)
+    except ValueError as e:
+        parser.error(str(e))
+
+    comparison = compare_runs(baseline, candidate, args.threshold, args.noise_factor)
+    if comparison.empty:
+        parser.error("The two runs have no configuration in common.")
+
+    with CSVLogger("compare", "benchmark/") as logger:
+        for row in comparison.to_dict("records"):
+            logger.write_row(row)
+            print(f"{row['status']:>11}  {row['function']} size={row['size']} {row['params']}  "
+                  f"{row['median_baseline']:.3e}s -> {row['median_candidate']:.3e}s  "
+                  f"x{row['speedup']:.2f} (threshold {row['threshold']:.1%})")
+
+    if args.plot:
+        plotter = PerformancePlotter(logger.log_file)
+        plotter.save_diff_plot()
+        suite = args.suite or candidate["suite"].iloc[0]
+        plotter.save_trend_plot([store.load(run) for run in store.list_runs(suite)] or [baseline, candidate])
+
+    regressions = (comparison["status"] == "regression").sum()
+    print(f"{regressions} regressions out of {len(comparison)} configurations.")
+    print(f"Comparison saved at: {logger.log_file}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import numpy as np
+
+from compression_tool.main import compress_image, compress_image_blockwise
+from dct2_performance.utils.constants import RESULTS_PATH, THREADS
+from dct2_performance.utils.plotter import PerformancePlotter
+from dct2_performance.utils.results import ResultsStore
+from dct2_performance.utils.runner import DCTRunner
+
+# Compression parameters used for the benchmark
+F: int = 8
+D: int = 10
+
+
+def compress_blockwise(matrix: np.ndarray) -> np.ndarray:
+    """
+    Block by block compression of a single channel matrix.
+    :param matrix: Input matrix (2D array)
+    :return: Compressed matrix (3D array)
+    """
+    return compress_image_blockwise(matrix[:, :, np.newaxis], F, D)
+
+
+def compress_batched(matrix: np.ndarray) -> np.ndarray:
+    """
+    Batched compression of a single channel matrix.
+    :param matrix: Input matrix (2D array)
+    :return: Compressed matrix (3D array)
+    """
+    return compress_image(matrix[:, :, np.newaxis], F, D)
+
+
+def compress_matrix(matrix: np.ndarray) -> np.ndarray:
+    """
+    Batched compression of a single channel matrix using the cached DCT matrix backend.
+    :param matrix: Input matrix (2D array)
+    :return: Compressed matrix (3D array)
+    """
+    return compress_image(matrix[:, :, np.newaxis], F, D, backend="matrix")
+
+
+def compress_fused(matrix: np.ndarray) -> np.ndarray:
+    """
+    Batched compression of a single channel matrix using the fused truncate-and-reconstruct operator.
+    :param matrix: Input matrix (2D array)
+    :return: Compressed matrix (3D array)
+    """
+    return compress_image(matrix[:, :, np.newaxis], F, D, backend="fused")
+
+
+def test_correctness_compression() -> None:
+    """
+    Test to verify that the batched compression engine matches the block by block one bit for bit.
+    """
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(203, 307, 3), dtype=np.uint8)
+
+    for f, d in [(1, 1), (7, 4), (8, 3), (8, 10), (16, 5), (32, 20)]:
+        expected = compress_image_blockwise(img, f, d)
+        actual = compress_image(img, f, d)
+        assert np.array_equal(expected, actual), f"Batched compression differs for F={f}, d={d}"
+
+    print("Correctness test passed for the batched compression engine.\n")
+
+
+def main():
+    """
+    Main function to compare the batched compression engine against the block by block one.
+    """
+    test_correctness_compression()
+
+    runner = DCTRunner(
+        [compress_blockwise, compress_batched, compress_matrix, compress_fused],
+        [64, 128, 256, 512, 1024, 2048],
+        "benchmark/",
+        THREADS,
+        ResultsStore(RESULTS_PATH),
+        "compression"
+    )
+    log_file = runner.run()
+    plotter = PerformancePlotter(log_file)
+    plotter.save_performance_plot(compress_batched.__name__)
+
+
+if __name__ == "__main__":
+    main()
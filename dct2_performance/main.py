@@ -1,5 +1,7 @@
 from dct2_performance.utils.functions import dct2_separable, dct2_scipy, test_correctness_scipy
+from dct2_performance.utils.constants import RESULTS_PATH, THREADS
 from dct2_performance.utils.plotter import PerformancePlotter
+from dct2_performance.utils.results import ResultsStore
 from dct2_performance.utils.runner import DCTRunner
 
 
@@ -10,9 +12,12 @@ def main():
     #test_correctness_scipy()
 
     runner = DCTRunner(
-        [dct2_separable, dct2_scipy],
+        [dct2_separable, dct2_scipy, "matrix", "fft", "butterfly8"],
         [8, 16, 32, 64, 128, 256, 512],
-        "benchmark/"
+        "benchmark/",
+        THREADS,
+        ResultsStore(RESULTS_PATH),
+        "dct2"
     )
     log_file = runner.run()
     plotter = PerformancePlotter(log_file)
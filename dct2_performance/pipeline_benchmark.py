@@ -0,0 +1,152 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from scipy.fft import dctn, idctn
+
+from compression_tool.blocks import blocks_to_image, image_to_blocks
+from compression_tool.main import compress_image, dct2_compress
+from compression_tool.transform import get_plan
+from dct2_performance.codec_benchmark import test_image
+from dct2_performance.utils.CSVLogger import CSVLogger
+from dct2_performance.utils.plotter import PerformancePlotter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Sides of the square test images
+IMAGE_SIZES = [256, 512, 1024, 2048]
+
+# Channel counts of the test images: grayscale and RGB
+CHANNELS = [1, 3]
+
+# (F, d) pairs to compress with
+PARAMETERS = [(8, 3), (8, 10), (16, 5), (16, 20), (32, 8), (32, 40)]
+
+# Timed runs of every stage, the median is kept
+REPEATS: int = 5
+
+# Pipeline stages, in order, as logged
+STAGES = ["decode_time", "forward_time", "mask_time", "inverse_time", "round_clip_time", "save_time"]
+
+
+def median_time(func, repeats: int = REPEATS):
+    """
+    Function to time a call several times.
+    :param func: callable without arguments
+    :param repeats: number of timed calls
+    :return: (median time, result of the last call)
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def peak_rss_mb() -> float:
+    """
+    Function to get the peak resident set size of the current process.
+    :return: peak RSS in MB, NaN where the resource module is not available
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_configuration(input_file: str, F: int, d: int, output_dir: str) -> dict:
+    """
+    Function to time every stage of the compression pipeline of one image, then compress_image and dct2_compress as
+    a whole. It runs in a fresh process so that its peak RSS is not inflated by the previous configurations.
+    :param input_file: path to the BMP test image
+    :param F: block dimension
+    :param d: frequency cutoff threshold
+    :param output_dir: folder for the compressed images
+    :return: log row
+    """
+    baseline_rss = peak_rss_mb()
+    output_file = os.path.join(output_dir, f"F{F}_d{d}.bmp")
+    mask = get_plan(F).mask(d)
+
+    decode_time, img_array = median_time(lambda: np.array(Image.open(input_file)))
+    grayscale = img_array.ndim == 2
+    if grayscale:
+        img_array = img_array[:, :, np.newaxis]
+
+    forward_time, coeffs = median_time(lambda: dctn(image_to_blocks(img_array, F), axes=(-2, -1), norm="ortho"))
+    mask_time, masked = median_time(lambda: coeffs * mask)
+    inverse_time, restored = median_time(lambda: idctn(masked, axes=(-2, -1), norm="ortho"))
+    round_clip_time, compressed = median_time(
+        lambda: blocks_to_image(np.clip(np.round(restored), 0, 255).astype(np.uint8)))
+    save_time, _ = median_time(
+        lambda: Image.fromarray(compressed[:, :, 0] if grayscale else compressed).save(output_file))
+
+    compress_time, _ = median_time(lambda: compress_image(img_array, F, d))
+    end_to_end_time, _ = median_time(lambda: dct2_compress(input_file, F, d, output_dir, show_img=False))
+
+    h, w, c = img_array.shape
+    megapixels = h * w / 1e6
+    stages_time = decode_time + forward_time + mask_time + inverse_time + round_clip_time + save_time
+
+    return {
+        "size": h,
+        "channels": c,
+        "megapixels": megapixels,
+        "F": F,
+        "d": d,
+        "decode_time": decode_time,
+        "forward_time": forward_time,
+        "mask_time": mask_time,
+        "inverse_time": inverse_time,
+        "round_clip_time": round_clip_time,
+        "save_time": save_time,
+        "stages_time": stages_time,
+        "stages_mps": megapixels / stages_time,
+        "compress_image_time": compress_time,
+        "compress_image_mps": megapixels / compress_time,
+        "dct2_compress_time": end_to_end_time,
+        "dct2_compress_mps": megapixels / end_to_end_time,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    """
+    Main function to measure every stage of the compression pipeline on real BMP files over a grid of image sizes,
+    channel counts and (F, d) pairs.
+    """
+    print("Starting pipeline benchmark...")
+    with (CSVLogger("pipeline", "benchmark/") as logger, tempfile.TemporaryDirectory() as workdir,
+          ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool):
+        for size in IMAGE_SIZES:
+            for channels in CHANNELS:
+                img = test_image(size)
+                input_file = os.path.join(workdir, f"test_{size}_{channels}.bmp")
+                Image.fromarray(img[:, :, 0] if channels == 1 else img).save(input_file)
+
+                for F, d in PARAMETERS:
+                    print(f"Running pipeline on {size}x{size}x{channels} image with F={F}, d={d}")
+                    logger.write_row(pool.submit(run_configuration, input_file, F, d, workdir).result())
+
+                os.remove(input_file)
+
+    print("Benchmark completed.")
+    print(f"Results saved at: {logger.log_file}")
+
+    plotter = PerformancePlotter(logger.log_file)
+    plotter.save_stage_plot(STAGES)
+    plotter.save_throughput_plot("compress_image_mps")
+
+
+if __name__ == "__main__":
+    main()
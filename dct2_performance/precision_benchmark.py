@@ -0,0 +1,64 @@
+import numpy as np
+
+from compression_tool.main import compress_image
+from dct2_performance.codec_benchmark import test_image
+from dct2_performance.utils.CSVLogger import CSVLogger
+from dct2_performance.utils.runner import time_call
+
+# Side of the square RGB test image
+IMAGE_SIZE: int = 2048
+
+# (F, d) pairs to compress with
+PARAMETERS = [(8, 3), (8, 10), (16, 5), (32, 20)]
+
+# Precisions compared against float64
+PRECISIONS = ["float64", "float32", "int"]
+
+
+def psnr(reference: np.ndarray, image: np.ndarray) -> float:
+    """
+    Function to compute the peak signal to noise ratio between two 8 bit images.
+    :param reference: reference image
+    :param image: image to compare
+    :return: PSNR in dB, inf for identical images
+    """
+    mse = np.mean((reference.astype(np.float64) - image) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def main():
+    """
+    Main function to compare the speed and quality of the float32 and fixed-point precisions with float64. Each
+    configuration is timed with time_call, warmed up and repeated like the DCTRunner functions.
+    """
+    print("Starting precision benchmark...")
+    img = test_image(IMAGE_SIZE)
+    with CSVLogger("precision", "benchmark/") as logger:
+        for F, d in PARAMETERS:
+            reference = compress_image(img, F, d)
+            cropped = img[:reference.shape[0], :reference.shape[1]]
+            reference_psnr = psnr(cropped, reference)
+
+            for precision in PRECISIONS:
+                print(f"Running compress_image with F={F}, d={d} in {precision}")
+                compressed = compress_image(img, F, d, precision=precision)
+                timing = time_call(lambda: compress_image(img, F, d, precision=precision))
+
+                compressed_psnr = psnr(cropped, compressed)
+                logger.write_row({
+                    "F": F,
+                    "d": d,
+                    "precision": precision,
+                    "time": timing["median"],
+                    "psnr": compressed_psnr,
+                    "psnr_delta": compressed_psnr - reference_psnr,
+                    "max_diff_vs_float64": int(np.abs(compressed.astype(np.int16) - reference).max()),
+                    **timing,
+                })
+
+    print("Benchmark completed.")
+    print(f"Results saved at: {logger.log_file}")
+
+
+if __name__ == "__main__":
+    main()
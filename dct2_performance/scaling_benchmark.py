@@ -0,0 +1,48 @@
+import os
+import numpy as np
+
+from compression_tool.main import compress_image
+from dct2_performance.utils.CSVLogger import CSVLogger
+from dct2_performance.utils.plotter import PerformancePlotter
+from dct2_performance.utils.runner import time_call
+
+# Compression parameters used for the benchmark
+F: int = 8
+D: int = 10
+
+# Side of the square RGB test image
+IMAGE_SIZE: int = 4096
+
+# Thread counts to measure
+WORKERS = [1, 2, 4, 8, 16]
+
+
+def main():
+    """
+    Main function to measure how compress_image scales with the number of worker threads. Each worker count is
+    warmed up and timed repeatedly like the DCTRunner functions, and the speedups compare the median times.
+    """
+    print(f"Starting scaling benchmark on {os.cpu_count()} cores...")
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+    with CSVLogger("scaling", "benchmark/") as logger:
+        base_time = None
+        for workers in WORKERS:
+            print(f"Running compress_image with {workers} workers")
+
+            timing = time_call(lambda: compress_image(img, F, D, workers=workers))
+            elapsed = timing["median"]
+
+            if base_time is None:
+                base_time = elapsed
+            logger.write_row({"workers": workers, "time": elapsed, "speedup": base_time / elapsed, **timing})
+
+    print("Benchmark completed.")
+
+    plotter = PerformancePlotter(logger.log_file)
+    plotter.save_scaling_plot()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from PIL import Image
+
+from dct2_performance.codec_benchmark import test_image
+from dct2_performance.utils.CSVLogger import CSVLogger
+
+# Entry points whose import is measured
+MODULES = ["compression_tool.cli", "compression_tool.main", "compression_tool.codec", "compression_tool.batch",
+           "compression_tool.gui"]
+
+# Heavy dependencies reported as loaded or not by each import
+HEAVY_MODULES = ["numpy", "scipy.fft", "PIL.Image", "tkinter"]
+
+# Runs of every command, the median is kept
+REPEATS: int = 7
+
+# Side of the test image compressed by the end to end runs
+IMAGE_SIZE: int = 256
+
+
+def import_times(module: str) -> dict:
+    """
+    Function to import a module in a fresh interpreter with -X importtime.
+    :param module: module name
+    :return: dict of cumulative import time in seconds by imported module name
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True, env=_environment())
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def median_wall_time(command: list, repeats: int = REPEATS) -> float:
+    """
+    Function to time a command, interpreter startup included.
+    :param command: arguments given to the Python interpreter
+    :param repeats: number of timed runs
+    :return: median wall time in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], capture_output=True, check=True, env=_environment())
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def _environment() -> dict:
+    """
+    Function to get the environment of the measured interpreters, with the repository on their path and the
+    profiling off.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {key: value for key, value in os.environ.items() if key != "DCT2_PROFILE"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    return env
+
+
+def main():
+    """
+    Main function to measure the startup cost of the compression entry points: the import time of each module
+    with the heavy dependencies it loads, and the wall time of short-lived command line calls.
+    """
+    print("Starting startup benchmark...")
+    with CSVLogger("startup", "benchmark/") as logger:
+        for module in MODULES:
+            times = import_times(module)
+            row = {"kind": "import", "target": module, "time": times[module]}
+            row.update({f"{name}_time": times.get(name, 0.0) for name in HEAVY_MODULES})
+            logger.write_row(row)
+            loaded = ", ".join(name for name in HEAVY_MODULES if name in times) or "none"
+            print(f"import {module}: {1000 * times[module]:.1f} ms (loads {loaded})")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            input_file = os.path.join(workdir, "test.bmp")
+            Image.fromarray(test_image(IMAGE_SIZE)).save(input_file)
+
+            commands = {
+                "interpreter": ["-c", "pass"],
+                "help": ["-m", "compression_tool", "--help"],
+                "compress": ["-m", "compression_tool", input_file, "-F", "8", "-d", "10", "-o", workdir],
+                "compress_dct2": ["-m", "compression_tool", input_file, "-F", "8", "-d", "10", "-o", workdir,
+                                  "--format", "dct2"],
+            }
+            for name, command in commands.items():
+                wall_time = median_wall_time(command)
+                logger.write_row({"kind": "command", "target": name, "time": wall_time,
+                                  **{f"{module}_time": "" for module in HEAVY_MODULES}})
+                print(f"{name}: {1000 * wall_time:.1f} ms")
+
+    print("Benchmark completed.")
+    print(f"Results saved at: {logger.log_file}")
+
+
+if __name__ == "__main__":
+    main()
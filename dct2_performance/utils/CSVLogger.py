@@ -1,24 +1,80 @@
+import atexit
 import csv
 import os
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Number of rows buffered before they are written to a CSV log
+BUFFER_SIZE: int = 256
+
+# Seconds after which the buffered rows of a CSV log are written even if the buffer is not full
+FLUSH_INTERVAL: float = 5.0
+
+# Supported log formats and their file extensions. npz and parquet are columnar and written once, on close
+FORMATS = {"csv": ".csv", "npz": ".npz", "parquet": ".parquet"}
 
 
 class CSVLogger:
     """
-    Class to simplify logging the runs data to .csv files.
+    Class to simplify logging the runs data to .csv files. Rows are buffered and written in batches through a file
+    handle kept open until close, optionally from a background thread. A batch is written when the buffer is full or
+    FLUSH_INTERVAL seconds after the previous one, so a long run loses at most the last few rows if it dies. For large
+    result sets the rows can instead be saved as columns to a .npz or .parquet file. Use it as a context manager, or
+    call close; loggers left open are closed at interpreter exit, after an exception or Ctrl-C included.
     """
-    def __init__(self, filename: str = None, path: str = "") -> None:
+    def __init__(self, filename: str = None, path: str = "", buffer_size: int = BUFFER_SIZE,
+                 background: bool = False, fmt: str = "csv", fieldnames: Optional[Iterable[str]] = None,
+                 flush_interval: float = FLUSH_INTERVAL) -> None:
         """
         CSVLogger constructor.
         :param filename: Log file name
         :param path: Path to save the file to
+        :param buffer_size: Number of rows written at once to a CSV log
+        :param background: To write the CSV batches from a background thread
+        :param fmt: "csv", or "npz"/"parquet" for a columnar file
+        :param fieldnames: Header of the log, the keys of the first row by default
+        :param flush_interval: Seconds after which buffered CSV rows are written even if the buffer is not full
         """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown log format: {fmt}")
+
+        self._fmt = fmt
         self._log_file = self._create_log_file_path(filename, path)
+        self._fieldnames = list(fieldnames) if fieldnames is not None else None
+        self._buffer_size = max(1, buffer_size)
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._rows = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+        if background and fmt == "csv":
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._write_batches, daemon=True)
+            self._thread.start()
+
+        atexit.register(self.close)
 
     @property
     def log_file(self) -> str:
         return self._log_file
 
+    def __enter__(self) -> "CSVLogger":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     def _create_log_file_path(self, filename: str, path: str) -> str:
         """
         Method to create the logs file path.
@@ -29,7 +85,7 @@ class CSVLogger:
         if filename is None:
             filename = 'dct2_benchmark'
 
-        filename += "_" + datetime.now().strftime("%Y_%m_%d_%H%M%S") + ".csv"
+        filename += "_" + datetime.now().strftime("%Y_%m_%d_%H%M%S") + FORMATS[self._fmt]
         log_file = os.path.join(path, filename)
 
         os.makedirs(path, exist_ok=True)
@@ -37,11 +93,120 @@ class CSVLogger:
 
     def write_row(self, data: dict) -> None:
         """
-        Method to write a row to the logs file. If the file is empty, it writes the header first
+        Method to add a row to the log. Every row must have the keys of the header
         :param data: dict of data to write
         """
-        with open(self._log_file, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=data.keys())
-            if os.stat(self._log_file).st_size == 0:
-                writer.writeheader()
-            writer.writerow(data)
+        with self._lock:
+            if self._fieldnames is None:
+                self._fieldnames = list(data)
+            elif len(data) != len(self._fieldnames) or any(key not in data for key in self._fieldnames):
+                raise ValueError(f"Row keys {list(data)} do not match the log header {self._fieldnames}")
+
+            self._rows.append([data[key] for key in self._fieldnames])
+            full = self._fmt == "csv" and (len(self._rows) >= self._buffer_size
+                                           or time.monotonic() - self._last_flush >= self._flush_interval)
+
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Method to write the buffered rows of a CSV log. Columnar logs are only written on close
+        """
+        if self._fmt != "csv":
+            return
+
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._last_flush = time.monotonic()
+
+        if self._queue is not None:
+            self._raise_background_error()
+            if rows:
+                self._queue.put(rows)
+        elif rows:
+            self._write(rows)
+
+    def close(self) -> None:
+        """
+        Method to write the remaining rows and release the file. Closing twice does nothing
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        self.flush()
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._raise_background_error()
+
+        if self._fmt != "csv":
+            self._write_columns()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, rows: list) -> None:
+        """
+        Method to write a batch of rows, opening the file and checking its header on the first batch
+        :param rows: rows as lists of values in header order
+        """
+        if self._file is None:
+            self._file = open(self._log_file, 'a', newline='')
+            self._writer = csv.writer(self._file)
+
+            if self._file.tell() == 0:
+                self._writer.writerow(self._fieldnames)
+            else:
+                with open(self._log_file, newline='') as f:
+                    header = next(csv.reader(f), [])
+                if header != self._fieldnames:
+                    raise ValueError(f"{self._log_file} already has a different header: {header}")
+
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _write_batches(self) -> None:
+        """
+        Method run by the background thread, writing the batches it receives until it gets None
+        """
+        while (rows := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    self._error = e
+
+    def _raise_background_error(self) -> None:
+        """
+        Method to raise, in the caller thread, an error met by the background thread
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_columns(self) -> None:
+        """
+        Method to write all the rows to a columnar file
+        """
+        if self._fieldnames is None:
+            return
+
+        columns = {}
+        for name, values in zip(self._fieldnames, zip(*self._rows) if self._rows else [()] * len(self._fieldnames)):
+            column = np.asarray(values)
+            columns[name] = column.astype(str) if column.dtype == object else column
+
+        if self._fmt == "npz":
+            np.savez(self._log_file, **columns)
+        else:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet logs need pyarrow: pip install pyarrow") from None
+            pyarrow.parquet.write_table(pyarrow.table(columns), self._log_file)
@@ -32,6 +32,27 @@ EXPECTED_DCT1D = np.array([401.0, 6.6, 109.0, -112.0, 65.4, 121.0, 116.0, 28.8])
 
 # Paths for saving results
 PLOT_PATH: str = "plot_benchmark/"
+RESULTS_PATH: str = "results/"
 
-# Number of iterations for benchmarks
-ITERATIONS: int = 1
+# Untimed calls made before measuring, to exclude plan creation and cold caches
+WARMUP_RUNS: int = 3
+
+# Bounds on the number of timed samples per function and size
+MIN_REPEATS: int = 5
+MAX_REPEATS: int = 200
+
+# Minimum duration of a sample, fast calls are looped until a sample lasts at least this long
+MIN_SAMPLE_TIME: float = 1e-3
+
+# Time budget for the samples of one function and size, in seconds
+MAX_TIME: float = 5.0
+
+# Confidence level and target relative half width of the confidence interval of the mean time
+CONFIDENCE: float = 0.95
+TARGET_CI: float = 0.02
+
+# BLAS and OpenMP threads the benchmarks are pinned to, None to leave the libraries defaults
+THREADS = None
+
+# Seed of the benchmark input matrices
+SEED: int = 0
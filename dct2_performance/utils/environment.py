@@ -0,0 +1,115 @@
+import json
+import os
+import platform
+import sys
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import scipy
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+except ImportError:
+    threadpool_info = threadpool_limits = None
+
+# Environment variables read by the common BLAS and OpenMP runtimes
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def cpu_model() -> str:
+    """
+    Function to get a readable name of the CPU.
+    :return: CPU model name, the platform processor string if it is not available
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def blas_info() -> dict:
+    """
+    Function to get the BLAS library numpy is built against.
+    :return: dict with the library name and version, empty if numpy does not expose them
+    """
+    try:
+        blas = np.show_config(mode="dicts")["Build Dependencies"]["blas"]
+    except (TypeError, KeyError):
+        return {}
+    return {"name": blas.get("name"), "version": blas.get("version")}
+
+
+def collect_environment(threads: Optional[int] = None) -> dict:
+    """
+    Function to collect the metadata needed to reproduce or compare a benchmark run.
+    :param threads: thread count the run was pinned to, None if it was not pinned
+    :return: dict of environment metadata
+    """
+    env = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "blas": blas_info(),
+        "pinned_threads": threads,
+        "thread_variables": {name: os.environ[name] for name in THREAD_VARIABLES if name in os.environ},
+    }
+
+    if threadpool_info is not None:
+        env["threadpools"] = [
+            {key: pool.get(key) for key in ("user_api", "internal_api", "version", "num_threads")}
+            for pool in threadpool_info()
+        ]
+
+    return env
+
+
+def save_environment(log_file: str, threads: Optional[int] = None) -> str:
+    """
+    Function to save the environment metadata next to a log file, with the same name and a .json extension.
+    :param log_file: path to the log file
+    :param threads: thread count the run was pinned to, None if it was not pinned
+    :return: path to the metadata file
+    """
+    path = os.path.splitext(log_file)[0] + ".json"
+    with open(path, "w") as f:
+        json.dump(collect_environment(threads), f, indent=2)
+    return path
+
+
+@contextmanager
+def pin_threads(threads: Optional[int]):
+    """
+    Context manager to pin the number of threads of the BLAS and OpenMP runtimes. The limit is applied to the
+    already loaded libraries through threadpoolctl when it is installed; the environment variables are always set, so
+    they also hold for subprocesses and for libraries loaded later.
+    :param threads: thread count to pin, None to leave the runtimes untouched
+    """
+    if threads is None:
+        yield
+        return
+
+    previous = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+    os.environ.update({name: str(threads) for name in THREAD_VARIABLES})
+
+    try:
+        if threadpool_limits is not None:
+            with threadpool_limits(limits=threads):
+                yield
+        else:
+            print("threadpoolctl is not installed: thread counts are only pinned through environment variables.")
+            yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -28,7 +28,7 @@ class PerformancePlotter:
         """
         os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
 
-        df = pd.read_csv(self.log_file)
+        df = self._load()
         sizes = df['size'].values
         df.drop(columns=['size'], inplace=True)
 
@@ -76,9 +76,161 @@ class PerformancePlotter:
         plt.grid(True, which='both', linestyle='--', alpha=0.5)
         plt.tight_layout()
 
-        file_name = "plot_" + os.path.basename(self.log_file)[:-4] + ".png"
+        file_name = "plot_" + os.path.splitext(os.path.basename(self.log_file))[0] + ".png"
         full_path = os.path.join(self.save_path, file_name)
         plt.savefig(full_path, dpi=300)
         print(f"Plot saved at: {os.path.abspath(full_path)}")
 
         plt.close()
+
+    def save_scaling_plot(self):
+        """
+        Method to save the parallel scaling plot of a log with workers and speedup columns.
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+
+        df = self._load()
+        workers = df['workers'].values
+
+        plt.figure(figsize=(10, 6))
+        plt.plot(workers, df['speedup'].values, 'o-', label='measured', linewidth=2, markersize=6)
+        plt.plot(workers, workers, '--', color='gray', label='linear')
+
+        plt.xlabel('Workers')
+        plt.ylabel('Speedup')
+        plt.title('DCT2 Compression Scaling')
+        plt.legend()
+        plt.grid(True, which='both', linestyle='--', alpha=0.5)
+        plt.tight_layout()
+
+        self._save_figure("plot_")
+
+    def save_stage_plot(self, stages: List[str]):
+        """
+        Method to save the stage breakdown plot of a pipeline log: one stacked bar per configuration, showing the
+        share of the time spent in each stage.
+        :param stages: names of the stage time columns, in pipeline order
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+
+        df = self._load()
+        labels = [f"{r.size}×{r.size}×{r.channels}\nF={r.F} d={r.d}" for r in df.itertuples()]
+        shares = df[stages].div(df[stages].sum(axis=1), axis=0) * 100
+
+        plt.figure(figsize=(max(10, len(df) * 0.5), 6))
+        bottom = np.zeros(len(df))
+        for stage in stages:
+            plt.bar(range(len(df)), shares[stage], bottom=bottom, label=stage.removesuffix('_time'))
+            bottom += shares[stage].values
+
+        plt.xticks(range(len(df)), labels, rotation=90, fontsize=7)
+        plt.ylabel('Share of the pipeline time [%]')
+        plt.title('Compression Pipeline Stage Breakdown')
+        plt.legend()
+        plt.tight_layout()
+
+        self._save_figure("stages_")
+
+    def save_throughput_plot(self, column: str = 'compress_image_mps'):
+        """
+        Method to save the throughput plot of a pipeline log: megapixels per second against image size, one line per
+        channel count and (F, d) pair.
+        :param column: name of the throughput column to plot
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+
+        df = self._load()
+
+        plt.figure(figsize=(10, 6))
+        for (channels, F, d), group in df.groupby(['channels', 'F', 'd']):
+            group = group.sort_values('megapixels')
+            plt.semilogx(group['megapixels'], group[column], 'o-', label=f"c={channels} F={F} d={d}", markersize=4)
+
+        plt.xlabel('Image Size [MP]')
+        plt.ylabel('Throughput [MP/s]')
+        plt.title('DCT2 Compression Throughput')
+        plt.legend(fontsize=7, ncol=2)
+        plt.grid(True, which='both', linestyle='--', alpha=0.5)
+        plt.tight_layout()
+
+        self._save_figure("throughput_")
+
+    def _load(self, **csv_options) -> pd.DataFrame:
+        """
+        Method to load the log file, from its columns directly for the .npz and .parquet logs of CSVLogger.
+        :param csv_options: options passed to pandas.read_csv for .csv logs
+        :return: DataFrame of the log
+        """
+        extension = os.path.splitext(self.log_file)[1]
+        if extension == '.npz':
+            with np.load(self.log_file) as columns:
+                return pd.DataFrame({name: columns[name] for name in columns.files})
+        if extension == '.parquet':
+            return pd.read_parquet(self.log_file)
+        return pd.read_csv(self.log_file, **csv_options)
+
+    def _save_figure(self, prefix: str):
+        """
+        Method to save and close the current figure, named after the log file.
+        :param prefix: file name prefix telling apart the plots of the same log
+        """
+        file_name = prefix + os.path.splitext(os.path.basename(self.log_file))[0] + ".png"
+        full_path = os.path.join(self.save_path, file_name)
+        plt.savefig(full_path, dpi=300)
+        print(f"Plot saved at: {os.path.abspath(full_path)}")
+
+        plt.close()
+
+    def save_diff_plot(self):
+        """
+        Method to save the diff plot of a comparison log: the speedup of every configuration of the candidate run over
+        the baseline one, colored by status, with the noise threshold of each configuration.
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+
+        df = self._load(keep_default_na=False)
+        labels = [f"{r.function} {r.size} {r.params}".strip() for r in df.itertuples()]
+        colors = df['status'].map({'regression': 'tab:red', 'improvement': 'tab:green'}).fillna('tab:gray')
+
+        plt.figure(figsize=(max(10, len(df) * 0.4), 6))
+        x = np.arange(len(df))
+        plt.bar(x, df['speedup'] - 1, bottom=1, color=colors)
+        plt.plot(x, 1 + df['threshold'], '_', color='black', markersize=10, label='noise threshold')
+        plt.plot(x, 1 / (1 + df['threshold']), '_', color='black', markersize=10)
+        plt.axhline(1, color='black', linewidth=0.8)
+
+        plt.xticks(x, labels, rotation=90, fontsize=7)
+        plt.yscale('log')
+        plt.ylabel('Speedup over baseline')
+        plt.title('Benchmark Comparison')
+        plt.legend()
+        plt.grid(True, axis='y', which='both', linestyle='--', alpha=0.5)
+        plt.tight_layout()
+
+        self._save_figure("diff_")
+
+    def save_trend_plot(self, runs: List[pd.DataFrame]):
+        """
+        Method to save the trend plot of a series of runs in the results store schema: the median time of every
+        configuration run after run. The plot is named after the log file of the plotter.
+        :param runs: runs in the stable schema, oldest first
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+
+        df = pd.concat(runs, ignore_index=True)
+        order = {run_id: i for i, run_id in enumerate(dict.fromkeys(df['run_id']))}
+        df['run'] = df['run_id'].map(order)
+
+        plt.figure(figsize=(10, 6))
+        for (function, size, params), group in df.groupby(['function', 'size', 'params']):
+            plt.semilogy(group['run'], group['median'], 'o-', label=f"{function} {size} {params}".strip(),
+                         markersize=4)
+
+        plt.xticks(list(order.values()), list(order.keys()), rotation=45, ha='right', fontsize=7)
+        plt.ylabel('Median Time [s]')
+        plt.title('Benchmark Trend')
+        plt.legend(fontsize=6, ncol=2)
+        plt.grid(True, which='both', linestyle='--', alpha=0.5)
+        plt.tight_layout()
+
+        self._save_figure("trend_")
@@ -0,0 +1,178 @@
+import os
+import subprocess
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from dct2_performance.utils.environment import save_environment
+
+# Bump when the columns of the stored results change
+SCHEMA_VERSION: int = 1
+
+# Columns of a stored run, in order. A configuration is identified by suite, function, size and params
+RESULT_FIELDS = ["schema_version", "run_id", "commit", "suite", "function", "size", "params",
+                 "min", "median", "p95", "stddev", "repeats"]
+
+# Columns identifying a configuration across runs
+KEY_FIELDS = ["suite", "function", "size", "params"]
+
+
+def current_commit() -> str:
+    """
+    Function to get the git commit the benchmarks run on.
+    :return: short commit hash, empty if it is not available
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def normalize_log(path: str, suite: str = "dct2") -> pd.DataFrame:
+    """
+    Function to load a benchmark log of any of the known layouts into the stable schema: a stored run, a DCTRunner
+    statistics log, a DCTRunner log with one time column per function, or the legacy Custom/SciPy log.
+    :param path: path to the CSV log
+    :param suite: suite name given to logs that do not carry one
+    :return: DataFrame with the RESULT_FIELDS columns
+    """
+    df = pd.read_csv(path)
+    run_id = os.path.splitext(os.path.basename(path))[0]
+
+    if "schema_version" in df.columns:
+        if (df["schema_version"] > SCHEMA_VERSION).any():
+            raise ValueError(f"{path} was written by a newer results schema.")
+        return _with_key_strings(df.reindex(columns=RESULT_FIELDS))
+
+    if "Size" in df.columns:
+        df = df.rename(columns={"Size": "size", "Custom Time (s)": "dct2_separable", "SciPy Time (s)": "dct2_scipy"})
+        df = df.drop(columns=["Speedup"], errors="ignore")
+        df = df.melt(id_vars="size", var_name="function", value_name="median")
+    elif "function" not in df.columns:
+        df = df.melt(id_vars="size", var_name="function", value_name="median")
+
+    df = df.dropna(subset=["median"])
+    df["schema_version"] = SCHEMA_VERSION
+    df["run_id"] = run_id
+    df["suite"] = suite
+    return _with_key_strings(df.reindex(columns=RESULT_FIELDS))
+
+
+def _with_key_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Function to turn the missing text fields read back from a CSV into empty strings, so that configurations without
+    params still match across runs.
+    :param df: DataFrame with the RESULT_FIELDS columns
+    :return: the same DataFrame
+    """
+    for column in ("commit", "params"):
+        df[column] = df[column].fillna("").astype(str)
+    return df
+
+
+class ResultsStore:
+    """
+    Class to keep benchmark runs in one stable schema, one CSV per run with its environment metadata next to it,
+    so that any two runs can be compared.
+    """
+    def __init__(self, directory: str = "results/") -> None:
+        """
+        ResultsStore constructor.
+        :param directory: folder holding the runs
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def save_run(self, rows: Iterable[dict], suite: str, threads: Optional[int] = None) -> str:
+        """
+        Method to store a run.
+        :param rows: dicts with the function, size and timing statistics of each configuration, plus optional params
+        :param suite: name of the benchmark suite
+        :param threads: thread count the run was pinned to, saved with the environment metadata
+        :return: run id
+        """
+        run_id = f"{suite}_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}"
+        df = pd.DataFrame(list(rows))
+        df["schema_version"] = SCHEMA_VERSION
+        df["run_id"] = run_id
+        df["commit"] = current_commit()
+        df["suite"] = suite
+        if "params" not in df.columns:
+            df["params"] = ""
+
+        path = self.run_path(run_id)
+        df.reindex(columns=RESULT_FIELDS).to_csv(path, index=False)
+        save_environment(path, threads)
+        print(f"Run {run_id} stored at: {os.path.abspath(path)}")
+
+        return run_id
+
+    def run_path(self, run_id: str) -> str:
+        """
+        Method to get the path of a run.
+        :param run_id: run id
+        :return: path to the run CSV
+        """
+        return os.path.join(self.directory, run_id + ".csv")
+
+    def list_runs(self, suite: Optional[str] = None) -> List[str]:
+        """
+        Method to list the stored runs, oldest first.
+        :param suite: only list the runs of this suite
+        :return: run ids
+        """
+        runs = sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".csv"))
+        return [run for run in runs if suite is None or run.rsplit("_", 4)[0] == suite]
+
+    def load(self, ref: str, suite: Optional[str] = None) -> pd.DataFrame:
+        """
+        Method to load a run in the stable schema.
+        :param ref: path to a CSV log of any known layout, a run id, or "latest"/"previous" for the last two runs
+        :param suite: suite used to resolve "latest"/"previous" and to name logs that do not carry one
+        :return: DataFrame with the RESULT_FIELDS columns
+        """
+        if os.path.isfile(ref):
+            return normalize_log(ref, suite or "dct2")
+
+        if ref in ("latest", "previous"):
+            runs = self.list_runs(suite)
+            index = -1 if ref == "latest" else -2
+            if len(runs) < -index:
+                raise ValueError(f"Not enough stored runs to resolve '{ref}'.")
+            ref = runs[index]
+
+        if not os.path.isfile(self.run_path(ref)):
+            raise ValueError(f"Unknown run: {ref}")
+        return normalize_log(self.run_path(ref))
+
+
+def compare_runs(baseline: pd.DataFrame, candidate: pd.DataFrame, min_threshold: float = 0.05,
+                 noise_factor: float = 3.0) -> pd.DataFrame:
+    """
+    Function to compare the configurations two runs have in common. The threshold of each configuration grows with
+    the measured noise of both runs, so that a noisy configuration has to move more to be flagged.
+    :param baseline: baseline run in the stable schema
+    :param candidate: candidate run in the stable schema
+    :param min_threshold: smallest relative change flagged as a regression or an improvement
+    :param noise_factor: number of combined relative standard errors a change must exceed
+    :return: DataFrame with the key columns, both medians, speedup, threshold and status per configuration
+    """
+    columns = KEY_FIELDS + ["median", "stddev", "repeats"]
+    merged = baseline[columns].merge(candidate[columns], on=KEY_FIELDS, suffixes=("_baseline", "_candidate"))
+
+    # Relative standard error of each median, zero for logs without statistics
+    errors = [
+        (merged[f"stddev_{run}"] / np.sqrt(merged[f"repeats_{run}"]) / merged[f"median_{run}"]).fillna(0)
+        for run in ("baseline", "candidate")
+    ]
+    merged["threshold"] = np.maximum(min_threshold, noise_factor * np.sqrt(errors[0] ** 2 + errors[1] ** 2))
+    merged["speedup"] = merged["median_baseline"] / merged["median_candidate"]
+
+    merged["status"] = "unchanged"
+    merged.loc[merged["speedup"] < 1 / (1 + merged["threshold"]), "status"] = "regression"
+    merged.loc[merged["speedup"] > 1 + merged["threshold"], "status"] = "improvement"
+
+    return merged.drop(columns=["stddev_baseline", "stddev_candidate", "repeats_baseline", "repeats_candidate"])
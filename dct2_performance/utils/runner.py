@@ -1,26 +1,45 @@
-from typing import Collection, Callable
+from typing import Collection, Callable, Optional, Union
 
 import numpy as np
 import time
 
+from scipy import stats
+
+from compression_tool.backends import get_backend
 from dct2_performance.utils.CSVLogger import CSVLogger
-from dct2_performance.utils.constants import ITERATIONS
+from dct2_performance.utils.constants import (
+    CONFIDENCE, MAX_REPEATS, MAX_TIME, MIN_REPEATS, MIN_SAMPLE_TIME, SEED, TARGET_CI, WARMUP_RUNS
+)
+from dct2_performance.utils.environment import pin_threads, save_environment
+from dct2_performance.utils.results import ResultsStore
 
 
 class DCTRunner:
     """
-    Class to easily run benchmarks on dct2 functions.
+    Class to easily run benchmarks on dct2 functions. Every function is warmed up, then timed repeatedly until the
+    confidence interval of its mean time is narrow enough. The median times are logged one column per function, the
+    full statistics to a second log, and the environment metadata to a .json file next to the first log. The
+    statistics can also be saved as a run of a ResultsStore, to be compared with later runs.
     """
-    def __init__(self, functions: Collection[Callable], benchmark_sizes: Collection[int], logs_path: str = ".\\"):
+    def __init__(self, functions: Collection[Union[Callable, str]], benchmark_sizes: Collection[int],
+                 logs_path: str = ".\\", threads: Optional[int] = None, store: Optional[ResultsStore] = None,
+                 suite: str = "dct2"):
         """
         DCTRunner constructor
-        :param functions: list of callables to test
+        :param functions: list of callables to test, or names of backends registered in compression_tool.backends
         :param benchmark_sizes: sizes to run the benchmark on
         :param logs_path: path to save the logs to
+        :param threads: number of BLAS and OpenMP threads to pin the run to, None to leave them untouched
+        :param store: optional ResultsStore to save the run to
+        :param suite: suite name of the run in the store
         """
         self.functions = functions
         self.benchmark_sizes = benchmark_sizes
+        self.threads = threads
+        self.store = store
+        self.suite = suite
         self.logger = CSVLogger("benchmark", logs_path)
+        self.stats_logger = CSVLogger("benchmark_stats", logs_path)
 
     def run(self) -> str:
         """
@@ -29,36 +48,146 @@ class DCTRunner:
         """
         print("Starting benchmark...")
 
-        results = {}
-        for N in self.benchmark_sizes:
-            results["size"] = N
-            for func in self.functions:
-                results[func.__name__] = self._run_single(func, N)
+        run_rows = []
+        with pin_threads(self.threads), self.logger, self.stats_logger:
+            save_environment(self.logger.log_file, self.threads)
+
+            for N in self.benchmark_sizes:
+                matrix = np.random.default_rng(SEED).random((N, N)) * 255
+
+                results = {"size": N}
+                for func in self.functions:
+                    if isinstance(func, str):
+                        name, timing = func, self._run_backend(func, matrix)
+                    else:
+                        name, timing = func.__name__, self._run_single(func, matrix)
+
+                    results[name] = timing["median"] if timing else float("nan")
+                    if timing:
+                        self.stats_logger.write_row({"size": N, "function": name, **timing})
+                        run_rows.append({"size": N, "function": name, **timing})
 
-            self.logger.write_row(results)
+                self.logger.write_row(results)
+
+        if self.store is not None:
+            self.store.save_run(run_rows, self.suite, self.threads)
 
         print("Benchmark completed.")
 
         return self.logger.log_file
 
-    def _run_single(self, func: Callable, N: int) -> float:
+    def _run_backend(self, name: str, matrix: np.ndarray) -> Optional[dict]:
+        """
+        Method to test the forward transform of a registered dct2 backend on a matrix
+        :param name: backend name
+        :param matrix: input matrix
+        :return: timing statistics, None if the backend does not support the size
         """
-        Method to test a single function with a specified size
+        N = matrix.shape[0]
+        try:
+            backend = get_backend(name, N)
+        except ValueError:
+            print(f"Skipping backend: {name} with size {N}")
+            return None
+
+        return self._run_single(backend.forward, matrix, name)
+
+    def _run_single(self, func: Callable, matrix: np.ndarray, name: str = None) -> dict:
+        """
+        Method to test a single function on a matrix, see time_call.
         :param func: callable to test
-        :param N: size to test
-        :return: total test time
+        :param matrix: input matrix, the same for every function of a size
+        :param name: name to report, the function name by default
+        :return: timing statistics of one call, in seconds
         """
-        print(f"Running function: {func.__name__} with size {N}")
+        print(f"Running function: {name or func.__name__} with size {matrix.shape[0]}")
+        return time_call(lambda: func(matrix))
+
+
+def time_call(call: Callable[[], object]) -> dict:
+    """
+    Function to time a call: it is warmed up, then timed repeatedly until the confidence interval of its mean time
+    is narrow enough. The MAX_TIME budget covers the warm-up, the calibration and the samples: slow calls get fewer
+    warm-up runs and samples, and a call whose first run exceeds the budget is only timed once, its confidence
+    interval being NaN.
+    :param call: callable without arguments
+    :return: timing statistics of one call, in seconds
+    """
+    start = time.perf_counter()
+    deadline = start + MAX_TIME
+    call()
+    first_call = time.perf_counter() - start
+    if first_call >= MAX_TIME:
+        print(f"First call took {first_call:.1f}s, over the {MAX_TIME}s budget: timed once")
+        return _statistics([first_call], 1)
 
-        matrix = np.random.rand(N, N) * 255
-        tot_time = 0
+    # The first call is a warm-up; the others only run if the minimum samples still fit in the budget
+    if first_call * (WARMUP_RUNS + MIN_REPEATS) <= MAX_TIME:
+        for _ in range(WARMUP_RUNS - 1):
+            call()
 
-        for _ in range(ITERATIONS):
-            start = time.perf_counter()
-            func(matrix)
-            end = time.perf_counter()
+    loops = _calibrate(call) if first_call < MIN_SAMPLE_TIME else 1
+    samples = []
 
-            tot_time += end - start
+    while len(samples) < MAX_REPEATS:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        end = time.perf_counter()
+        samples.append((end - start) / loops)
 
-        return tot_time / ITERATIONS
+        if len(samples) >= MIN_REPEATS and _relative_ci(samples) <= TARGET_CI:
+            break
+        # Stop once the next sample would end past the budget, even below MIN_REPEATS
+        if end + (end - start) > deadline:
+            break
 
+    return _statistics(samples, loops)
+
+
+def _statistics(samples, loops: int) -> dict:
+    """
+    Function to summarize the timed samples of a call
+    :param samples: time of one call in each sample, in seconds
+    :param loops: number of calls per sample
+    :return: timing statistics, stddev and ci being NaN for a single sample
+    """
+    samples = np.array(samples)
+    single = len(samples) < 2
+    return {
+        "min": samples.min(),
+        "median": np.median(samples),
+        "p95": np.percentile(samples, 95),
+        "stddev": float("nan") if single else samples.std(ddof=1),
+        "mean": samples.mean(),
+        "ci": float("nan") if single else _relative_ci(samples),
+        "repeats": len(samples),
+        "loops": loops,
+    }
+
+
+def _calibrate(call: Callable[[], object]) -> int:
+    """
+    Function to find how many calls make up one sample, so that fast calls are not lost in the timer resolution
+    :param call: callable without arguments
+    :return: number of calls per sample
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        if time.perf_counter() - start >= MIN_SAMPLE_TIME:
+            return loops
+        loops *= 2
+
+
+def _relative_ci(samples) -> float:
+    """
+    Function to compute the half width of the confidence interval of the mean, relative to the mean
+    :param samples: timed samples
+    :return: relative half width, Student's t based
+    """
+    n = len(samples)
+    half_width = stats.t.ppf((1 + CONFIDENCE) / 2, n - 1) * np.std(samples, ddof=1) / np.sqrt(n)
+    return half_width / np.mean(samples)
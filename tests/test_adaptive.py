@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from compression_tool.adaptive import _pick, choose_cutoffs, compress_image_adaptive, cutoff_costs, \
+    kept_coefficients
+from compression_tool.blocks import forward_blocks
+from compression_tool.main import dct2_compress
+
+
+def sample_image():
+    y, x = np.mgrid[:96, :128]
+    noise = np.random.default_rng(0).normal(0, 20, (96, 128))
+    planes = [128 + 60 * np.sin(x / 7) + 40 * np.cos(y / 5), x + y, 100 + noise]
+    return np.clip(np.stack(planes, axis=-1), 0, 255).astype(np.uint8)
+
+
+def psnr(original, compressed):
+    mse = np.mean((original[:compressed.shape[0], :compressed.shape[1]].astype(np.float64) - compressed) ** 2)
+    return 10 * np.log10(255 ** 2 / mse)
+
+
+@pytest.mark.parametrize("budget", [576, 5000, 20000])
+def test_coefficient_budget_is_met(budget):
+    d_map = choose_cutoffs(forward_blocks(sample_image(), 8), max_coefficients=budget)
+
+    assert d_map.min() >= 1 and d_map.max() <= 15
+    assert 0.95 * budget <= kept_coefficients(8, d_map) <= budget
+
+
+def test_budget_over_every_coefficient_keeps_the_best_quality():
+    coeffs = forward_blocks(sample_image(), 8)
+    errors, _ = cutoff_costs(coeffs)
+
+    d_map = choose_cutoffs(coeffs, max_coefficients=coeffs.size)
+
+    assert kept_coefficients(8, d_map) <= coeffs.size
+    assert np.take_along_axis(errors, d_map[..., None] - 1, axis=-1).sum() <= 1e-6 * errors[..., 0].sum()
+
+
+def test_budget_below_one_coefficient_per_block_is_refused():
+    with pytest.raises(ValueError, match="DC coefficient"):
+        choose_cutoffs(forward_blocks(sample_image(), 8), max_coefficients=575)
+
+
+@pytest.mark.parametrize("target", [30, 35, 40])
+def test_psnr_target_is_met(target):
+    img = sample_image()
+
+    compressed, _ = compress_image_adaptive(img, 8, target_psnr=target)
+
+    assert psnr(img, compressed) >= target - 0.1
+
+
+def test_choices_are_monotonic_in_the_multiplier():
+    errors, counts = cutoff_costs(forward_blocks(sample_image(), 8))
+
+    choices = [_pick(errors, counts, lagrange) for lagrange in np.logspace(-3, 6, 40)]
+
+    for smaller, larger in zip(choices, choices[1:]):
+        assert np.all(larger <= smaller)
+    kept = [counts[choice].sum() for choice in choices]
+    error = [np.take_along_axis(errors, choice[..., None], axis=-1).sum() for choice in choices]
+    assert kept == sorted(kept, reverse=True) and error == sorted(error)
+
+
+def test_dct2_compress_adaptive(tmp_path):
+    img = sample_image()
+    Image.fromarray(img).save(tmp_path / "image.bmp")
+
+    output, quality = dct2_compress(str(tmp_path / "image.bmp"), 8, None, str(tmp_path), show_img=False,
+                                    target_psnr=35, return_metrics=True)
+
+    assert output.endswith("image_compressed_F8_psnr35.bmp")
+    assert quality["psnr"] >= 34.9 and 0 < quality["kept_ratio"] < 1
+    with pytest.raises(ValueError, match="Adaptive"):
+        dct2_compress(str(tmp_path / "image.bmp"), 8, None, str(tmp_path), show_img=False, target_psnr=35,
+                      fmt="dct2")
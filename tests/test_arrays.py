@@ -0,0 +1,57 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from compression_tool.arrays import Workspace, compress_array
+from compression_tool.main import compress_image
+
+# Bytes a steady-state call may allocate at its peak (Python objects, never a frame sized array)
+ALLOCATION_LIMIT = 16 * 1024
+
+# Calls measured after the warm-up one
+CALLS = 5
+
+
+def frame(shape):
+    return np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+
+
+def allocations(function):
+    function()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(CALLS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+@pytest.mark.parametrize("shape", [(240, 320), (480, 640, 3)])
+@pytest.mark.parametrize("F, d", [(8, 3), (8, 10), (16, 12), (32, 20)])
+@pytest.mark.parametrize("precision", ["float32", "float64"])
+def test_steady_state_calls_allocate_no_frame(shape, F, d, precision):
+    img = frame(shape)
+    workspace = Workspace()
+    out = np.empty_like(img[:shape[0] // F * F, :shape[1] // F * F])
+
+    peak, retained = allocations(lambda: compress_array(img, F, d, out=out, workspace=workspace, precision=precision))
+
+    assert peak <= ALLOCATION_LIMIT
+    assert retained <= ALLOCATION_LIMIT
+
+
+def test_first_call_fills_the_workspace():
+    img = frame((240, 320, 3))
+    workspace = Workspace()
+
+    out = compress_array(img, 8, 10, workspace=workspace, precision="float64")
+
+    assert workspace.nbytes == 2 * img.size * 8
+    assert np.abs(out.astype(int) - compress_image(img, 8, 10)).max() <= 1
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+import pytest
+
+from scipy.fft import dctn, idctn
+
+from compression_tool import backends
+from compression_tool.transform import get_plan
+
+
+@pytest.mark.parametrize("dtype, tolerance", [(np.float64, 1e-9), (np.float32, 1e-3)])
+@pytest.mark.parametrize("d", [0, 3, 8, 15])
+def test_butterfly8_matches_scipy(dtype, tolerance, d):
+    blocks = (np.random.default_rng(0).random((2, 5, 7, 8, 8)) * 255).astype(dtype)
+    backend = backends.BACKENDS["butterfly8"]
+
+    coeffs = dctn(blocks, type=2, norm='ortho', axes=(-2, -1))
+    expected = idctn(coeffs * get_plan(8, dtype).mask(d), type=2, norm='ortho', axes=(-2, -1))
+
+    assert np.abs(backend.forward(blocks) - coeffs).max() <= tolerance * 255
+    assert np.abs(backend.inverse(coeffs) - blocks).max() <= tolerance * 255
+    restored = backend.reconstruct(blocks.copy(), d)
+    assert restored.dtype == dtype
+    assert np.abs(restored - expected).max() <= tolerance * 255
+
+
+def test_auto_choices_persist_only_when_asked(tmp_path, monkeypatch):
+    monkeypatch.setattr(backends, "_auto_choices", {})
+    monkeypatch.setattr(backends, "benchmark_backends", lambda F: {"matrix": 1.0, "scipy": 2.0})
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv(backends.AUTO_CACHE_ENV, raising=False)
+
+    assert backends.select_backend(8) == "matrix"
+    assert not any(tmp_path.iterdir())
+
+    path = tmp_path / "backends.json"
+    monkeypatch.setattr(backends, "_auto_choices", {})
+    monkeypatch.setenv(backends.AUTO_CACHE_ENV, str(path))
+
+    assert backends.select_backend(8) == "matrix"
+    assert json.loads(path.read_text()) == {"8": "matrix"}
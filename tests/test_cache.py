@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from compression_tool.blocks import CompressionCancelled
+from compression_tool.cache import CompressionCache
+from compression_tool.main import compress_image, dct2_compress
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    img = np.random.default_rng(0).integers(0, 256, (203, 157, 3), dtype=np.uint8)
+    path = tmp_path / "image.bmp"
+    Image.fromarray(img).save(path)
+    return str(path), img
+
+
+def test_cached_compress_reports_progress_and_cancels(image_file, tmp_path):
+    path, img = image_file
+    cache = CompressionCache(str(tmp_path / "cache"))
+
+    # Cancel as soon as the first band is done: nothing is saved and no result is cached
+    cancel = threading.Event()
+    calls = []
+
+    def cancel_after_first(done, total):
+        calls.append((done, total))
+        cancel.set()
+
+    with pytest.raises(CompressionCancelled):
+        dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache, progress=cancel_after_first,
+                      cancel=cancel)
+    assert len(calls) == 1
+    assert cache.stats["result_hits"] == 0
+
+    # Coefficient and result misses: forward and inverse bands are both reported, up to the total
+    calls = []
+    output = dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache,
+                           progress=lambda done, total: calls.append((done, total)), cancel=threading.Event())
+    assert len(calls) > 2
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+    assert calls[-1][0] == calls[-1][1]
+    assert np.array_equal(np.array(Image.open(output)), compress_image(img, 8, 6))
+
+    # Coefficient hit with another d: only the inverse bands are reported
+    calls = []
+    dct2_compress(path, 8, 3, str(tmp_path / "out"), show_img=False, cache=cache,
+                  progress=lambda done, total: calls.append((done, total)))
+    assert len(calls) > 1
+    assert calls[-1][0] == calls[-1][1]
+    assert cache.stats["coeff_hits"] == 1
+
+
+def test_cached_compress_dct2_reports_progress(image_file, tmp_path):
+    path, _ = image_file
+    cache = CompressionCache(str(tmp_path / "cache"))
+
+    calls = []
+    dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, fmt="dct2", cache=cache,
+                  progress=lambda done, total: calls.append((done, total)))
+    assert len(calls) > 1
+    assert calls[-1][0] == calls[-1][1]
+
+    dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, fmt="dct2", cache=cache)
+    assert cache.stats["result_hits"] == 1
+
+
+@pytest.mark.parametrize("precision, backend", [("int", "scipy"), ("float32", "scipy"), ("float64", "matrix")])
+def test_cache_is_bypassed_for_other_precisions_and_backends(image_file, tmp_path, precision, backend):
+    path, img = image_file
+    cache = CompressionCache(str(tmp_path / "cache"))
+
+    output = dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache, precision=precision,
+                           backend=backend)
+
+    expected = compress_image(img, 8, 6, backend=backend, precision=precision)
+    assert np.array_equal(np.array(Image.open(output)), expected)
+    assert cache.stats["result_misses"] == 0
+
+
+def test_cached_compress_uses_workers(image_file, tmp_path):
+    path, img = image_file
+
+    outputs = [dct2_compress(path, 8, 6, str(tmp_path / f"out{workers}"), show_img=False, workers=workers,
+                             cache=CompressionCache(str(tmp_path / f"cache{workers}"))) for workers in (1, 4)]
+
+    assert np.array_equal(np.array(Image.open(outputs[0])), np.array(Image.open(outputs[1])))
+
+
+def test_results_are_keyed_by_content(image_file, tmp_path):
+    path, img = image_file
+    cache = CompressionCache(str(tmp_path / "cache"))
+    first = dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache)
+
+    # Same bytes under another name: result hit, same output
+    copy = tmp_path / "copy.bmp"
+    copy.write_bytes(open(path, "rb").read())
+    second = dct2_compress(str(copy), 8, 6, str(tmp_path / "out"), show_img=False, cache=cache)
+    assert cache.stats["result_hits"] == 1
+    assert open(first, "rb").read() == open(second, "rb").read()
+
+    # Other parameters or other content: misses
+    dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache, padding="edge")
+    changed = img.copy()
+    changed[0, 0] ^= 1
+    Image.fromarray(changed).save(path)
+    output = dct2_compress(path, 8, 6, str(tmp_path / "out"), show_img=False, cache=cache)
+    assert cache.stats["result_hits"] == 1 and cache.stats["result_misses"] == 3
+    assert np.array_equal(np.array(Image.open(output)), compress_image(changed, 8, 6))
+
+
+def test_eviction_keeps_the_cache_within_its_bound(image_file, tmp_path):
+    path, _ = image_file
+    cache = CompressionCache(str(tmp_path / "cache"), max_bytes=400 * 1024)
+
+    for d in range(1, 8):
+        dct2_compress(path, 8, d, str(tmp_path / "out"), show_img=False, cache=cache)
+
+    assert sum(entry.stat().st_size for entry in (tmp_path / "cache").iterdir()) <= 400 * 1024
+    assert cache.stats["evictions"] > 0
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from compression_tool.cli import main
+
+
+@pytest.mark.parametrize("args, message", [
+    (["-F", "0", "-d", "0"], "F must be at least 1"),
+    (["-F", "8", "-d", "500"], "0 <= d < 2F - 1 = 15"),
+    (["-F", "8", "-d", "-1"], "0 <= d < 2F - 1 = 15"),
+    (["-F", "8", "-d", "5", "--ycbcr", "4:2:0", "--d-chroma", "15"], "--d-chroma"),
+])
+def test_out_of_range_arguments_are_usage_errors(tmp_path, capsys, args, message):
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_path / "missing.bmp"), "-o", str(tmp_path)] + args)
+
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+def test_largest_cutoff_is_accepted(tmp_path):
+    Image.fromarray(np.zeros((16, 16, 3), dtype=np.uint8)).save(tmp_path / "image.bmp")
+
+    assert main([str(tmp_path / "image.bmp"), "-F", "8", "-d", "14", "-o", str(tmp_path)]) == 0
+    assert (tmp_path / "image_compressed_F8_d14.bmp").exists()
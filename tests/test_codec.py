@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from compression_tool.codec import decode, encode, load_encoded_image
+from compression_tool.main import compress_image, dct2_compress, encode_image
+
+
+@pytest.mark.parametrize("shape", [(64, 48), (61, 50, 3)])
+@pytest.mark.parametrize("padding", ["crop", "edge"])
+def test_round_trip_without_coefficients(shape, padding):
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+
+    decoded = decode(encode(img, 8, 0, padding=padding))
+
+    expected_shape = shape if padding != "crop" else (shape[0] // 8 * 8, shape[1] // 8 * 8) + shape[2:]
+    assert decoded.shape == expected_shape
+    assert not decoded.any()
+
+
+@pytest.mark.parametrize("d", [0, 1, 6, 14])
+def test_round_trip_matches_compress_image(d):
+    img = np.random.default_rng(1).integers(0, 256, (64, 40, 3), dtype=np.uint8)
+
+    decoded = decode(encode(img, 8, d)).astype(int)
+
+    assert np.abs(decoded - compress_image(img, 8, d)).max() <= 1
+
+
+@pytest.mark.parametrize("padding", ["crop", "edge"])
+def test_banded_encoding_matches_encode(padding):
+    img = np.random.default_rng(2).integers(0, 256, (61, 50, 3), dtype=np.uint8)
+
+    assert encode_image(img, 8, 6, workers=2, padding=padding) == encode(img, 8, 6, padding=padding)
+
+
+def test_dct2_compress_reports_progress_and_honors_precision(tmp_path):
+    img = np.random.default_rng(3).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+    Image.fromarray(img).save(tmp_path / "image.bmp")
+    reports = []
+
+    output = dct2_compress(str(tmp_path / "image.bmp"), 8, 6, str(tmp_path), show_img=False, fmt="dct2",
+                           precision="int", progress=lambda done, total: reports.append((done, total)))
+
+    assert reports[-1][0] == reports[-1][1] == 3 * 8 * 6
+    assert np.abs(load_encoded_image(output).astype(int) - decode(encode(img, 8, 6))).max() <= 1
+
+
+def test_dct2_format_cannot_stream(tmp_path):
+    Image.fromarray(np.zeros((16, 16, 3), dtype=np.uint8)).save(tmp_path / "image.bmp")
+
+    with pytest.raises(ValueError, match="Streaming"):
+        dct2_compress(str(tmp_path / "image.bmp"), 8, 6, str(tmp_path), show_img=False, fmt="dct2", stream=True)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from compression_tool.main import compress_image_ycbcr
+
+
+def gradient(h, w):
+    y, x = np.mgrid[:h, :w]
+    return np.stack([2 * x, 2 * y, x + y], axis=-1).astype(np.uint8)
+
+
+@pytest.mark.parametrize("F", [8, 16, 32])
+@pytest.mark.parametrize("padding", ["crop", "edge"])
+@pytest.mark.parametrize("subsampling", ["4:2:0", "4:2:2"])
+def test_chroma_covers_the_bottom_and_right_strips(F, padding, subsampling):
+    img = gradient(120, 120)
+
+    compressed = compress_image_ycbcr(img, F, 2 * F - 2, subsampling=subsampling, padding=padding).astype(int)
+
+    h, w = compressed.shape[:2]
+    expected = img[:h, :w].astype(int)
+    # The last 2F - 2 rows and columns are the ones a chroma cropped to whole blocks left uncovered
+    strip = np.ones((h, w), dtype=bool)
+    strip[:h - 2 * F, :w - 2 * F] = False
+    assert np.abs(compressed - expected)[strip].max() <= 3
+
+
+@pytest.mark.parametrize("shape", [(16, 16), (16, 16, 1), (16, 16, 4)])
+def test_rejects_images_without_three_channels(shape):
+    with pytest.raises(ValueError, match="RGB image"):
+        compress_image_ycbcr(np.zeros(shape, dtype=np.uint8), 8, 5)
@@ -0,0 +1,39 @@
+import csv
+import os
+import subprocess
+import sys
+
+from compression_tool import instrument
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_csv_sink_writes_the_summary(tmp_path):
+    with instrument.profiling(instrument.sink_from_spec(f"csv:{tmp_path}"), trace_memory=False):
+        with instrument.span("work"):
+            instrument.count("blocks", 3)
+
+    (path,) = tmp_path.glob("profile_*.csv")
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == instrument.ROW_FIELDS
+    assert [(row["kind"], row["name"]) for row in rows] == [("span", "work"), ("counter", "blocks")]
+    assert rows[1]["value"] == "3"
+
+
+def test_bad_profile_variable_only_warns():
+    code = "import compression_tool.main, compression_tool.instrument as i; print(i._profiler is None)"
+    result = subprocess.run([sys.executable, "-W", "always", "-c", code], capture_output=True, text=True,
+                            env={**os.environ, "DCT2_PROFILE": "cvs:out"}, cwd=ROOT)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True"
+    assert "Unknown profile sink" in result.stderr
+
+
+def test_core_package_does_not_import_the_benchmarks(tmp_path):
+    code = "import sys, compression_tool.main; print(any(m.startswith('dct2_performance') for m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env={**os.environ, "DCT2_PROFILE": f"csv:{tmp_path}"}, cwd=ROOT)
+
+    assert result.stdout.strip() == "False", result.stderr
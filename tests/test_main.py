@@ -0,0 +1,52 @@
+import threading
+
+import numpy as np
+import pytest
+
+from compression_tool.blocks import CompressionCancelled
+from compression_tool.main import compress_image, compress_image_blockwise
+
+
+def image(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("shape", [(64, 48, 3), (67, 53, 1), (130, 70, 3)])
+@pytest.mark.parametrize("F, d", [(8, 3), (8, 10), (16, 5), (5, 4)])
+def test_banded_engine_matches_blockwise(shape, F, d):
+    img = image(shape)
+
+    # Progress reporting splits the image in PROGRESS_BANDS bands
+    banded = compress_image(img, F, d, progress=lambda done, total: None)
+
+    assert np.array_equal(banded, compress_image_blockwise(img, F, d))
+    assert np.array_equal(compress_image(img, F, d), banded)
+
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+@pytest.mark.parametrize("padding", ["crop", "edge"])
+def test_workers_match_serial(workers, padding):
+    img = image((203, 97, 3), seed=1)
+    reports = []
+    lock = threading.Lock()
+
+    def progress(done, total):
+        with lock:
+            reports.append((done, total))
+
+    parallel = compress_image(img, 8, 6, workers=workers, padding=padding, progress=progress)
+
+    assert np.array_equal(parallel, compress_image(img, 8, 6, padding=padding))
+    blocks = 3 * (203 // 8) * (97 // 8) if padding == "crop" else 3 * -(-203 // 8) * -(-97 // 8)
+    done = [report[0] for report in reports]
+    assert done == sorted(done) and done[-1] == reports[-1][1] == blocks
+
+
+def test_cancel_stops_the_workers():
+    cancel = threading.Event()
+
+    def progress(done, total):
+        cancel.set()
+
+    with pytest.raises(CompressionCancelled):
+        compress_image(image((256, 64, 3)), 8, 6, workers=2, progress=progress, cancel=cancel)
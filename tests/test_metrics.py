@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from compression_tool.main import compress_image
+from compression_tool.metrics import SSIM_C1, SSIM_C2, QualityMetrics, block_ssim, image_metrics, kept_ratio
+
+
+def image(shape=(48, 40, 3), seed=0):
+    return np.random.default_rng(seed).integers(20, 230, shape, dtype=np.uint8)
+
+
+def ssim(x, y):
+    x, y = x.astype(np.float64), y.astype(np.float64)
+    cov = np.mean((x - x.mean()) * (y - y.mean()))
+    return ((2 * x.mean() * y.mean() + SSIM_C1) * (2 * cov + SSIM_C2) /
+            ((x.mean() ** 2 + y.mean() ** 2 + SSIM_C1) * (x.var() + y.var() + SSIM_C2)))
+
+
+def test_identical_images():
+    img = image()
+
+    metrics = image_metrics(img, img, 8, 15)
+
+    assert metrics["mse"] == 0 and metrics["psnr"] == float("inf")
+    assert metrics["ssim"] == pytest.approx(1)
+    assert metrics["kept_ratio"] == 1
+
+
+def test_psnr_of_a_known_error():
+    img = image()
+
+    metrics = image_metrics(img, img + 5, 8, 3)
+
+    assert metrics["mse"] == pytest.approx(25)
+    assert metrics["psnr"] == pytest.approx(10 * np.log10(255 ** 2 / 25))
+    assert metrics["kept_ratio"] == pytest.approx(6 / 64)
+
+
+def test_block_ssim_matches_the_formula():
+    original = image()
+    compressed = compress_image(original, 8, 4)
+
+    scores = block_ssim(original, compressed, 8)
+
+    assert scores.shape == (6, 5, 3)
+    for i, j, c in [(0, 0, 0), (2, 3, 1), (5, 4, 2)]:
+        expected = ssim(original[i * 8:(i + 1) * 8, j * 8:(j + 1) * 8, c],
+                        compressed[i * 8:(i + 1) * 8, j * 8:(j + 1) * 8, c])
+        assert scores[i, j, c] == pytest.approx(expected)
+
+
+def test_bands_add_up_to_the_whole_image():
+    original = image((61, 45, 3))
+    compressed = compress_image(original, 8, 6, padding="edge")
+    banded = QualityMetrics(8, 6)
+
+    for top in range(0, 61, 16):
+        banded.update(original[top:top + 16], compressed[top:top + 16])
+
+    whole = image_metrics(original, compressed, 8, 6)
+    diff = original.astype(np.float64) - compressed
+    assert banded.result()["mse"] == pytest.approx(np.mean(diff ** 2))
+    assert banded.result()["psnr"] == pytest.approx(whole["psnr"])
+    assert banded.result()["ssim"] == pytest.approx(whole["ssim"])
+
+
+def test_compression_metrics_match_a_second_pass():
+    original = image((64, 56, 3), seed=2)
+    quality = QualityMetrics(8, 5)
+
+    compressed = compress_image(original, 8, 5, workers=3, metrics=quality)
+
+    assert quality.result() == pytest.approx(image_metrics(original, compressed, 8, 5))
+
+
+@pytest.mark.parametrize("F, d, kept", [(8, 0, 0), (8, 1, 1), (8, 3, 6), (8, 8, 36), (8, 15, 64), (4, 5, 13)])
+def test_kept_ratio(F, d, kept):
+    assert kept_ratio(F, d) == pytest.approx(kept / F ** 2)
@@ -0,0 +1,64 @@
+import csv
+import time
+
+import numpy as np
+
+from dct2_performance.utils import runner
+from dct2_performance.utils.runner import DCTRunner, time_call
+
+
+def test_fast_calls_are_warmed_up_calibrated_and_repeated():
+    calls = []
+
+    timing = time_call(lambda: calls.append(time.perf_counter()))
+
+    assert timing["loops"] > 1
+    assert runner.MIN_REPEATS <= timing["repeats"] <= runner.MAX_REPEATS
+    assert len(calls) >= runner.WARMUP_RUNS + timing["repeats"] * timing["loops"]
+    assert timing["min"] <= timing["median"] <= timing["p95"]
+    assert timing["ci"] <= runner.TARGET_CI or timing["repeats"] == runner.MAX_REPEATS
+
+
+def test_sleeps_are_measured_with_a_confidence_interval():
+    timing = time_call(lambda: time.sleep(0.002))
+
+    assert 0.002 <= timing["median"] < 0.02
+    assert timing["repeats"] >= runner.MIN_REPEATS and not np.isnan(timing["ci"])
+
+
+def test_the_time_budget_is_enforced(monkeypatch):
+    monkeypatch.setattr(runner, "MAX_TIME", 0.1)
+
+    start = time.perf_counter()
+    timing = time_call(lambda: time.sleep(0.03))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.1 + 0.03 + 0.02
+    assert 1 <= timing["repeats"] < runner.MIN_REPEATS
+
+
+def test_a_first_call_over_the_budget_is_timed_once(monkeypatch):
+    monkeypatch.setattr(runner, "MAX_TIME", 0.02)
+    calls = []
+
+    timing = time_call(lambda: (calls.append(1), time.sleep(0.03)))
+
+    assert len(calls) == 1 and timing["repeats"] == 1
+    assert np.isnan(timing["ci"]) and np.isnan(timing["stddev"])
+
+
+def test_runner_logs_medians_and_statistics(tmp_path):
+    def dct2_copy(matrix):
+        return matrix.copy()
+
+    log_file = DCTRunner([dct2_copy, "matrix", "butterfly8"], [8, 16], logs_path=str(tmp_path)).run()
+
+    with open(log_file, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["size"] for row in rows] == ["8", "16"]
+    assert float(rows[0]["butterfly8"]) > 0 and rows[1]["butterfly8"] == "nan"
+    (stats_file,) = tmp_path.glob("benchmark_stats_*.csv")
+    with open(stats_file, newline="") as f:
+        stats = list(csv.DictReader(f))
+    assert {row["function"] for row in stats} == {"dct2_copy", "matrix", "butterfly8"}
+    assert all(int(row["repeats"]) >= runner.MIN_REPEATS for row in stats)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from compression_tool.main import compress_image
+from compression_tool.sequence import SequenceEncoder
+
+
+def frame(seed=0, shape=(32, 48, 3)):
+    return np.random.default_rng(seed).integers(10, 240, shape, dtype=np.uint8)
+
+
+def test_first_frame_is_a_keyframe():
+    encoder = SequenceEncoder(8, 6)
+    img = frame()
+
+    compressed, blocks, skipped, keyframe = encoder.encode(img)
+
+    assert keyframe and blocks == 4 * 6 and skipped == 0
+    assert np.array_equal(compressed, compress_image(img, 8, 6))
+
+
+def test_only_changed_blocks_are_transformed():
+    encoder = SequenceEncoder(8, 6, threshold=2)
+    img = frame()
+    encoder.encode(img)
+
+    # Block (1, 2) moves past the threshold, block (3, 5) stays within it on one channel only
+    moved = img.copy()
+    moved[8:16, 16:24] += 10
+    moved[24:32, 40:48, 1] += 2
+    compressed, blocks, skipped, keyframe = encoder.encode(moved)
+
+    assert not keyframe and skipped == blocks - 1
+    expected = compress_image(img, 8, 6)
+    expected[8:16, 16:24] = compress_image(moved, 8, 6)[8:16, 16:24]
+    assert np.array_equal(compressed, expected)
+
+
+def test_identical_frame_skips_every_block():
+    encoder = SequenceEncoder(8, 6)
+    encoder.encode(frame())
+
+    _, blocks, skipped, keyframe = encoder.encode(frame())
+
+    assert not keyframe and skipped == blocks
+
+
+def test_drift_is_measured_from_the_last_transform():
+    encoder = SequenceEncoder(8, 6, threshold=2)
+    img = frame()
+    encoder.encode(img)
+
+    # Two steps of 2 stay within the threshold each, but the second is 4 away from the transformed pixels
+    assert encoder.encode(img + 2)[2] == 24
+    assert encoder.encode(img + 4)[2] == 0
+
+
+def test_negative_threshold_transforms_every_block():
+    encoder = SequenceEncoder(8, 6, threshold=-1)
+    encoder.encode(frame())
+
+    assert encoder.encode(frame())[2] == 0
+
+
+def test_keyframe_interval_and_size_changes():
+    encoder = SequenceEncoder(8, 6, keyframe_interval=3)
+
+    keyframes = [encoder.encode(frame())[3] for _ in range(7)]
+    assert keyframes == [True, False, False, True, False, False, True]
+
+    assert encoder.encode(frame(shape=(40, 48, 3)))[3]
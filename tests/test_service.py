@@ -0,0 +1,70 @@
+import asyncio
+import numpy as np
+import pytest
+
+from compression_tool.main import compress_image
+from compression_tool.service import CompressionJob, CompressionService, ServiceError, _run_batch, decode_image, \
+    encode_image
+
+
+def encoded(h, w, seed):
+    return encode_image(np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8), "png")
+
+
+def test_bad_job_does_not_fail_its_batch():
+    data = [encoded(64, 64, 0), encoded(64, 64, 1), encoded(4, 4, 2)]
+    jobs = [CompressionJob(body, 8, 6, "png", "crop", None) for body in data]
+
+    results = _run_batch(jobs)
+
+    for body, result in zip(data[:2], results[:2]):
+        assert np.array_equal(decode_image(result), compress_image(decode_image(body), 8, 6))
+    assert isinstance(results[2], ServiceError) and results[2].status == 500
+
+
+def test_service_rejects_images_without_whole_blocks():
+    async def run():
+        async with CompressionService(port=0, workers=1, batch_window=0.05) as service:
+            return await asyncio.gather(
+                service.compress(encoded(64, 64, 0), 8, 6, "png"),
+                service.compress(encoded(4, 4, 2), 8, 6, "png"),
+                service.compress(encoded(64, 64, 1), 8, 6, "png"),
+                service.compress(encoded(4, 4, 2), 8, 6, "png", padding="edge"),
+                return_exceptions=True)
+
+    first, small, second, padded = asyncio.run(run())
+    assert isinstance(small, ServiceError) and small.status == 400
+    assert decode_image(first).shape == decode_image(second).shape == (64, 64, 3)
+    assert decode_image(padded).shape == (4, 4, 3)
+
+
+def test_service_rejects_undecodable_bodies():
+    async def run():
+        async with CompressionService(port=0, workers=1) as service:
+            await service.compress(b"not an image", 8, 6)
+
+    with pytest.raises(ServiceError) as error:
+        asyncio.run(run())
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize("F, d, padding", [(65, 10, "crop"), (4096, 10, "edge"), (70000, 10, "edge"), (0, 0, "crop")])
+def test_service_rejects_block_sizes_over_the_limit(F, d, padding):
+    async def run():
+        async with CompressionService(port=0, workers=1) as service:
+            await service.compress(encoded(64, 64, 0), F, d, "dct2", padding=padding)
+
+    with pytest.raises(ServiceError) as error:
+        asyncio.run(run())
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize("d", [-1, 15, 70000])
+def test_service_rejects_cutoffs_out_of_range(d):
+    async def run():
+        async with CompressionService(port=0, workers=1) as service:
+            await service.compress(encoded(64, 64, 0), 8, d, "dct2")
+
+    with pytest.raises(ServiceError) as error:
+        asyncio.run(run())
+    assert error.value.status == 400
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from compression_tool.blocks import PADDING_MODES
+from compression_tool.main import compress_image
+from compression_tool.metrics import QualityMetrics
+from compression_tool.streaming import stream_compress
+
+
+@pytest.mark.parametrize("padding", sorted(PADDING_MODES))
+@pytest.mark.parametrize("shape", [(61, 45, 3), (40, 37), (64, 48, 3)])
+def test_stream_matches_in_memory(tmp_path, padding, shape):
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    Image.fromarray(img).save(tmp_path / "image.bmp")
+    reports = []
+
+    output = stream_compress(str(tmp_path / "image.bmp"), str(tmp_path / "out.bmp"), 8, 6, padding=padding,
+                             progress=lambda done, total: reports.append((done, total)))
+
+    expected = compress_image(img.reshape(shape[:2] + (-1,)), 8, 6, padding=padding)
+    streamed = np.array(Image.open(output))
+    assert np.array_equal(streamed.reshape(expected.shape), expected)
+    assert reports[-1][0] == reports[-1][1]
+
+
+@pytest.mark.parametrize("padding", ["crop", "symmetric"])
+def test_stream_metrics_match_in_memory(tmp_path, padding):
+    img = np.random.default_rng(1).integers(0, 256, (61, 45, 3), dtype=np.uint8)
+    Image.fromarray(img).save(tmp_path / "image.bmp")
+    streamed, in_memory = QualityMetrics(8, 6), QualityMetrics(8, 6)
+
+    stream_compress(str(tmp_path / "image.bmp"), str(tmp_path / "out.bmp"), 8, 6, padding=padding,
+                    metrics=streamed)
+    compress_image(img, 8, 6, padding=padding, metrics=in_memory)
+
+    assert streamed.result() == pytest.approx(in_memory.result())